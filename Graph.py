@@ -1,87 +1,172 @@
-import os
-from dotenv import load_dotenv
+import asyncio
+import weakref
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.postgres import PostgresSaver
-from psycopg_pool import ConnectionPool
 
-from nodes.chat import chat_node
+from nodes.chat import chat_node, achat_node
 from nodes.human_assistance import human_assistance_node
-from nodes.check_db_node import check_db_node
-from nodes.scrape_with_jina import scrape_with_jina_node
-from nodes.summarization import summarize
-from nodes.generate_post import generate_post_node
-from nodes.evaluate_post import evaluate_post_node
+from nodes.check_db_node import check_db_node, acheck_db_node
+from nodes.scrape_with_jina import scrape_with_jina_node, ascrape_with_jina_node
+from nodes.summarization import summarize, asummarize
+from nodes.generate_post import generate_post_node, agenerate_post_node
+from nodes.evaluate_post import evaluate_post_node, aevaluate_post_node
 from nodes.human_review import human_review_node
-from nodes.save_post import save_post_node
+from nodes.save_post import save_post_node, asave_post_node
 
 from routes.route_intake import route_intake
 from routes.internal_route import route_internal
 from routes.route_human import route_human
-from routes.db_route import route_based_on_timestamp
+from routes.db_route import route_stale_urls
 from state import State
-from db.db import create_tables
-
-load_dotenv(override=True)
-
-# Database Setup
-DATABASE_URL = os.getenv('DATABASE_URL')
-create_tables(DATABASE_URL)
-pool = ConnectionPool(conninfo=DATABASE_URL, max_size=20)
-checkpointer = PostgresSaver(pool)
-checkpointer.setup()
-
-workflow = StateGraph(State)
-
-workflow.add_node("Chat_node", chat_node)
-workflow.add_node("human_assistance", human_assistance_node)
-workflow.add_node("check_db_node", check_db_node)
-workflow.add_node("scrape_with_jina", scrape_with_jina_node)
-workflow.add_node("Summarize", summarize)
-workflow.add_node("generate_post", generate_post_node)
-workflow.add_node("evaluate_post", evaluate_post_node)
-workflow.add_node("human_review", human_review_node)
-workflow.add_node("save_post", save_post_node)
-
-
-workflow.add_edge(START, "Chat_node")
-
-workflow.add_conditional_edges(
-    "Chat_node", route_intake,
-    {"check_db_node": "check_db_node", "human_assistance": "human_assistance"}
-)
-workflow.add_edge("human_assistance", "Chat_node")
-
-workflow.add_conditional_edges(
-    "check_db_node", route_based_on_timestamp,
-    {"Scrape_with_jina": "scrape_with_jina", "generate_post": "generate_post"}
-)
-
-workflow.add_edge("scrape_with_jina", "Summarize")
-workflow.add_edge("Summarize", "generate_post")
-
-workflow.add_edge("generate_post", "evaluate_post")
-
-workflow.add_conditional_edges(
-    "evaluate_post",
-    route_internal,
-    {
-        "human_review": "human_review",
-        "regenerate": "generate_post"
-    }
-)
-
-workflow.add_conditional_edges(
-    "human_review",
-    route_human,
-    {
-        "save": "save_post",
-        "regenerate": "generate_post"
-    }
-)
-
-workflow.add_edge("save_post", END)
-
-agent = workflow.compile(
-    checkpointer=checkpointer,
-    interrupt_before=["human_review", "human_assistance"]
-)
+from db.db import create_tables, acreate_tables
+from utils import deadline
+from utils.metrics import instrument_node, instrument_route
+from utils.resources import env, registry
+
+INTERRUPT_BEFORE = ["human_review", "human_assistance"]
+
+
+def _node(name, func, afunc=None):
+    """
+    Wraps a node so the same graph runs under both invoke/stream and ainvoke/astream.
+    Pass-through nodes without an async version run in the executor when driven async.
+    Both paths record per-node wall time (utils/metrics.py) and run under the run's deadline (utils/deadline.py).
+    """
+    return RunnableLambda(
+        instrument_node(name, deadline.bind(name, func)),
+        afunc=instrument_node(name, deadline.bind(name, afunc)) if afunc else None,
+        name=name,
+    )
+
+
+def build_workflow() -> StateGraph:
+    workflow = StateGraph(State)
+
+    workflow.add_node("Chat_node", _node("Chat_node", chat_node, achat_node))
+    workflow.add_node("human_assistance", _node("human_assistance", human_assistance_node))
+    workflow.add_node("check_db_node", _node("check_db_node", check_db_node, acheck_db_node))
+    workflow.add_node("scrape_with_jina", _node("scrape_with_jina", scrape_with_jina_node, ascrape_with_jina_node))
+    workflow.add_node("Summarize", _node("Summarize", summarize, asummarize))
+    workflow.add_node("generate_post", _node("generate_post", generate_post_node, agenerate_post_node))
+    workflow.add_node("evaluate_post", _node("evaluate_post", evaluate_post_node, aevaluate_post_node))
+    workflow.add_node("human_review", _node("human_review", human_review_node))
+    workflow.add_node("save_post", _node("save_post", save_post_node, asave_post_node))
+
+    workflow.add_edge(START, "Chat_node")
+
+    workflow.add_conditional_edges(
+        "Chat_node", instrument_route("route_intake", route_intake),
+        {"check_db_node": "check_db_node", "human_assistance": "human_assistance"}
+    )
+    workflow.add_edge("human_assistance", "Chat_node")
+
+    # Stale URLs fan out into one scrape branch each (Send); Summarize runs once all branches are done.
+    workflow.add_conditional_edges(
+        "check_db_node", instrument_route("route_stale_urls", route_stale_urls),
+        ["scrape_with_jina", "generate_post"]
+    )
+
+    workflow.add_edge("scrape_with_jina", "Summarize")
+    workflow.add_edge("Summarize", "generate_post")
+
+    workflow.add_edge("generate_post", "evaluate_post")
+
+    workflow.add_conditional_edges(
+        "evaluate_post",
+        instrument_route("route_internal", route_internal),
+        {
+            "human_review": "human_review",
+            "regenerate": "generate_post"
+        }
+    )
+
+    workflow.add_conditional_edges(
+        "human_review",
+        instrument_route("route_human", route_human),
+        {
+            "save": "save_post",
+            "regenerate": "generate_post"
+        }
+    )
+
+    workflow.add_edge("save_post", END)
+
+    return workflow
+
+
+# --- SYNC GRAPH ---
+# Nothing touches the database at import time; the first get_agent() does the setup.
+def _build_agent():
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    # Database Setup
+    create_tables(env("DATABASE_URL"))
+    checkpointer = PostgresSaver(registry.get("pool"))
+    checkpointer.setup()
+
+    return build_workflow().compile(
+        checkpointer=checkpointer,
+        interrupt_before=INTERRUPT_BEFORE
+    )
+
+
+registry.register("agent", _build_agent)
+
+
+def get_agent():
+    """Returns the graph compiled against the sync PostgresSaver, building it on first use."""
+    return registry.get("agent")
+
+
+def __getattr__(name):
+    # Keeps `from Graph import agent` working without building the graph on import.
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# --- ASYNC GRAPH ---
+# AsyncPostgresSaver needs a pool opened on the running loop, so the async agent is built lazily per loop.
+_async_agents = weakref.WeakKeyDictionary()
+_async_locks = weakref.WeakKeyDictionary()
+
+
+async def aget_agent():
+    """
+    Returns the graph compiled against AsyncPostgresSaver for the current event loop.
+    Drive it with ainvoke/astream/aget_state/aupdate_state; many threads can run concurrently
+    on one loop since nodes only await LLM, HTTP and DB I/O.
+    """
+    loop = asyncio.get_running_loop()
+    async_agent = _async_agents.get(loop)
+    if async_agent is not None:
+        return async_agent
+
+    lock = _async_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        async_agent = _async_agents.get(loop)
+        if async_agent is None:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+            from psycopg.rows import dict_row
+            from psycopg_pool import AsyncConnectionPool
+
+            database_url = env("DATABASE_URL")
+            await acreate_tables(database_url)
+            async_pool = AsyncConnectionPool(
+                conninfo=database_url,
+                max_size=20,
+                open=False,
+                kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+            )
+            await async_pool.open()
+            async_checkpointer = AsyncPostgresSaver(async_pool)
+            await async_checkpointer.setup()
+
+            async_agent = build_workflow().compile(
+                checkpointer=async_checkpointer,
+                interrupt_before=INTERRUPT_BEFORE
+            )
+            _async_agents[loop] = async_agent
+
+    return async_agent
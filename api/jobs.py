@@ -0,0 +1,261 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from utils import cassette, deadline
+from utils.fanout import FANOUT_NODE, aseed_post_threads, child_thread_ids
+from utils.resources import env
+
+# Per-thread statuses
+RUNNING = "running"
+QUEUED = "queued"
+RESUMING = "resuming"  # a human decision is being applied
+AWAITING_REVIEW = "awaiting_review"
+AWAITING_INPUT = "awaiting_input"
+FORKED = "forked"
+COMPLETED = "completed"
+FAILED = "failed"
+# Statuses a thread never leaves.
+TERMINAL = {FORKED, COMPLETED, FAILED}
+
+# Finished jobs are kept for API_JOB_RETENTION_SECONDS, and at most API_JOB_HISTORY of them.
+DEFAULT_JOB_RETENTION_SECONDS = 3600
+DEFAULT_JOB_HISTORY = 1000
+
+
+@dataclass
+class Job:
+    job_id: str
+    query: str
+    num_posts: int
+    created_at: float = field(default_factory=time.time)
+    deadline_seconds: Optional[float] = None  # budget per stretch of automated work (utils/deadline.py)
+    threads: Dict[str, str] = field(default_factory=dict)  # thread_id -> status
+    shared_thread_id: Optional[str] = None
+    errors: Dict[str, str] = field(default_factory=dict)
+    events: List[dict] = field(default_factory=list)
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether every thread has completed, failed or forked; nothing about the job changes after that."""
+        return bool(self.threads) and set(self.threads.values()) <= TERMINAL
+
+    @property
+    def post_threads(self) -> List[str]:
+        return [t for t in self.threads if t != self.shared_thread_id]
+
+    @property
+    def status(self) -> str:
+        statuses = set(self.threads.values())
+        if FAILED in statuses:
+            return FAILED
+        if statuses & {RUNNING, QUEUED, RESUMING}:
+            return RUNNING
+        if statuses & {AWAITING_REVIEW, AWAITING_INPUT}:
+            return "waiting"
+        return COMPLETED
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "query": self.query,
+            "num_posts": self.num_posts,
+            "status": self.status,
+            "threads": self.threads,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "deadline_seconds": self.deadline_seconds,
+        }
+
+
+@dataclass
+class WorkItem:
+    job_id: str
+    thread_id: str
+    input: Optional[dict] = None
+    interrupt_before: Optional[List[str]] = None
+    deadline: Optional[float] = None
+
+
+class JobManager:
+    """
+    Runs graph threads on a bounded pool of asyncio workers.
+    A thread runs until it finishes or hits an interrupt; HTTP calls resolve the interrupt
+    with aupdate_state(..., as_node=...) and put the thread back on the queue.
+    """
+
+    def __init__(self, get_agent, num_workers: int = 8):
+        self._get_agent = get_agent
+        self.num_workers = num_workers
+        self.jobs: Dict[str, Job] = {}
+        self._thread_jobs: Dict[str, str] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+
+    # --- LIFECYCLE ---
+    async def start(self):
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"graph-worker-{i}") for i in range(self.num_workers)
+        ]
+        print(f"🧵 Started {self.num_workers} graph workers.")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # --- SUBMISSION ---
+    async def submit(self, query: str, num_posts: int = 1, deadline_seconds: Optional[float] = None) -> Job:
+        """
+        Queues a job. Its deadline (deadline_seconds, default RUN_DEADLINE_SECONDS) covers the shared thread
+        and every post thread it forks; time spent waiting for a human is not charged to it.
+        """
+        from Graph import INTERRUPT_BEFORE
+
+        self._evict_finished()
+        job_id = str(uuid.uuid4())
+        job = Job(job_id=job_id, query=query, num_posts=num_posts, deadline_seconds=deadline_seconds)
+        self.jobs[job_id] = job
+        run_deadline = deadline.after(deadline_seconds)
+
+        initial_input = {"messages": [HumanMessage(content=query)]}
+
+        if num_posts <= 1:
+            thread_id = f"{job_id}_post_1"
+            await self._enqueue(job, WorkItem(job_id, thread_id, initial_input, deadline=run_deadline))
+        else:
+            # Shared context is resolved once, then fanned out per post (see utils/fanout.py).
+            thread_id = f"{job_id}_shared"
+            job.shared_thread_id = thread_id
+            await self._enqueue(
+                job, WorkItem(job_id, thread_id, initial_input, [FANOUT_NODE] + INTERRUPT_BEFORE, run_deadline)
+            )
+
+        return job
+
+    async def resume(self, thread_id: str, values: dict, as_node: str, expected_status: str):
+        """Applies a human decision to a waiting thread and queues it to continue."""
+        from Graph import INTERRUPT_BEFORE
+
+        job = self.job_for_thread(thread_id)
+        if job is None:
+            raise KeyError(thread_id)
+        if job.threads.get(thread_id) != expected_status:
+            raise ValueError(f"Thread {thread_id} is '{job.threads.get(thread_id)}', not '{expected_status}'.")
+        # Claimed before the first await, so a second decision for the same thread fails the check above.
+        await self._set_status(job, thread_id, RESUMING)
+
+        try:
+            agent = await self._get_agent()
+            config = {"configurable": {"thread_id": thread_id}}
+            await cassette.anote_update(config, values, as_node)
+            await agent.aupdate_state(config, values, as_node=as_node)
+        except BaseException:
+            await self._set_status(job, thread_id, expected_status)
+            raise
+
+        interrupt_before = [FANOUT_NODE] + INTERRUPT_BEFORE if thread_id == job.shared_thread_id else None
+        # The human may have taken any amount of time; the rest of the run gets a fresh budget.
+        await self._enqueue(
+            job, WorkItem(job.job_id, thread_id, None, interrupt_before, deadline.after(job.deadline_seconds))
+        )
+
+    # --- QUERIES ---
+    def job_for_thread(self, thread_id: str) -> Optional[Job]:
+        job_id = self._thread_jobs.get(thread_id)
+        return self.jobs.get(job_id) if job_id else None
+
+    def _evict_finished(self):
+        """Forgets finished jobs older than the retention period, and the oldest ones beyond the history cap."""
+        cutoff = time.time() - float(env("API_JOB_RETENTION_SECONDS", DEFAULT_JOB_RETENTION_SECONDS))
+        finished = sorted((j for j in self.jobs.values() if j.finished_at is not None), key=lambda j: j.finished_at)
+        excess = len(finished) - int(env("API_JOB_HISTORY", DEFAULT_JOB_HISTORY))
+        for i, job in enumerate(finished):
+            if i >= excess and job.finished_at > cutoff:
+                break
+            del self.jobs[job.job_id]
+            for thread_id in job.threads:
+                self._thread_jobs.pop(thread_id, None)
+
+    def threads_with_status(self, status: str) -> List[tuple]:
+        return [
+            (job, thread_id)
+            for job in self.jobs.values()
+            for thread_id, thread_status in job.threads.items()
+            if thread_status == status
+        ]
+
+    # --- INTERNALS ---
+    async def _enqueue(self, job: Job, item: WorkItem):
+        self._thread_jobs[item.thread_id] = job.job_id
+        await self._set_status(job, item.thread_id, QUEUED)
+        await self._queue.put(item)
+
+    async def _set_status(self, job: Job, thread_id: str, status: str, **extra):
+        job.threads[thread_id] = status
+        if job.finished:
+            job.finished_at = time.time()
+        await self._emit(job, {"type": "status", "thread_id": thread_id, "status": status, **extra})
+
+    async def _emit(self, job: Job, event: dict):
+        event["ts"] = time.time()
+        async with job.changed:
+            job.events.append(event)
+            job.changed.notify_all()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            item = await self._queue.get()
+            job = self.jobs[item.job_id]
+            try:
+                await self._run_thread(job, item)
+            except Exception as e:
+                print(f"❌ Worker {worker_id}: thread {item.thread_id} failed: {e}")
+                job.errors[item.thread_id] = str(e)
+                await self._set_status(job, item.thread_id, FAILED)
+            finally:
+                self._queue.task_done()
+
+    async def _run_thread(self, job: Job, item: WorkItem):
+        agent = await self._get_agent()
+        config = {"configurable": {"thread_id": item.thread_id}}
+        await self._set_status(job, item.thread_id, RUNNING)
+        await cassette.anote_run(config, item.input, item.interrupt_before)
+
+        async for update in agent.astream(
+                item.input, deadline.with_deadline(config, item.deadline), stream_mode="updates",
+                interrupt_before=item.interrupt_before
+        ):
+            for node_name in update:
+                await self._emit(job, {"type": "node", "thread_id": item.thread_id, "node": node_name})
+
+        snapshot = await agent.aget_state(config)
+
+        if not snapshot.next:
+            await self._set_status(job, item.thread_id, COMPLETED, post_heading=snapshot.values.get("post_heading"))
+            return
+
+        next_node = snapshot.next[0]
+        if next_node == "human_review":
+            await self._set_status(job, item.thread_id, AWAITING_REVIEW)
+        elif next_node == "human_assistance":
+            await self._set_status(job, item.thread_id, AWAITING_INPUT)
+        elif next_node == FANOUT_NODE and item.thread_id == job.shared_thread_id:
+            configs = await aseed_post_threads(agent, config, child_thread_ids(job.job_id, job.num_posts))
+            # Children run concurrently on the worker pool, under the deadline of the stretch that forked them
+            # (a fresh one when the shared thread was resumed from human_assistance). They are queued before
+            # the shared thread turns FORKED, so the job never looks finished in between.
+            for child_config in configs:
+                await self._enqueue(job, WorkItem(
+                    job.job_id, child_config["configurable"]["thread_id"], deadline=item.deadline
+                ))
+            await self._set_status(job, item.thread_id, FORKED)
+        else:
+            raise RuntimeError(f"Thread stopped at unexpected node '{next_node}'")
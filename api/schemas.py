@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class JobRequest(BaseModel):
+    query: str = Field(description="Topic, University Name, or URL.")
+    num_posts: int = Field(default=1, ge=1, le=50, description="How many posts to generate.")
+    deadline_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Time budget for the job's automated work; defaults to RUN_DEADLINE_SECONDS."
+    )
+
+
+class ReviewDecision(BaseModel):
+    approved: bool = Field(description="True to save the post, False to send it back to the generator.")
+    feedback: Optional[str] = Field(default=None, description="What to change when the post is rejected.")
+
+
+class AssistanceReply(BaseModel):
+    content: str = Field(description="The user's answer to the intake question (usually a URL).")
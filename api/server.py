@@ -0,0 +1,167 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from langchain_core.messages import HumanMessage
+
+from api.jobs import JobManager, AWAITING_REVIEW, AWAITING_INPUT
+from api.schemas import JobRequest, ReviewDecision, AssistanceReply
+from db import university_cache
+from Graph import aget_agent
+from utils.metrics import metrics
+from utils.resources import env
+
+manager = JobManager(aget_agent, num_workers=int(env("API_WORKERS", "8")))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await aget_agent()  # fail fast if the checkpointer can't be reached
+    await manager.start()
+    yield
+    await manager.stop()
+
+
+app = FastAPI(title="Lumina Agent", lifespan=lifespan)
+
+
+def _get_job(job_id: str):
+    job = manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return job
+
+
+def _check_thread(thread_id: str):
+    # Checked up front: a KeyError from inside resume (e.g. a missing blob) is a server error, not a 404.
+    if manager.job_for_thread(thread_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown thread '{thread_id}'")
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Node, LLM, DB and HTTP timings plus token, route and retry counters in Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats/university-cache")
+async def university_cache_stats():
+    """Hits, misses, hit rate and size of this worker's university row cache (UNIVERSITY_CACHE=1)."""
+    return university_cache.stats()
+
+
+# --- JOBS ---
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    job = await manager.submit(request.query, request.num_posts, request.deadline_seconds)
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-sent events: node completions and thread status changes, starting from the first event.
+    The stream ends after the status event that finishes the job (every thread completed, failed or forked).
+    """
+    job = _get_job(job_id)
+
+    async def event_stream():
+        sent = 0
+        while True:
+            async with job.changed:
+                if sent >= len(job.events):
+                    if job.finished:
+                        return
+                    try:
+                        await asyncio.wait_for(job.changed.wait(), timeout=15)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                pending = job.events[sent:]
+            for event in pending:
+                yield f"data: {json.dumps(event)}\n\n"
+            sent += len(pending)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# --- HUMAN IN THE LOOP ---
+@app.get("/reviews")
+async def list_pending_reviews():
+    """Threads stopped before human_review, with the draft to approve."""
+    agent = await aget_agent()
+    pending = []
+    for job, thread_id in manager.threads_with_status(AWAITING_REVIEW):
+        snapshot = await agent.aget_state({"configurable": {"thread_id": thread_id}})
+        values = snapshot.values
+        pending.append({
+            "job_id": job.job_id,
+            "thread_id": thread_id,
+            "topic": values.get("topic"),
+            "university_name": values.get("university_name"),
+            "post_heading": values.get("post_heading"),
+            "post_content": values.get("post_content"),
+            "relevant_url": values.get("relevant_url"),
+            "timestamp": values.get("timestamp"),
+        })
+    return pending
+
+
+@app.get("/questions")
+async def list_pending_questions():
+    """Threads stopped before human_assistance, with the question the intake node asked."""
+    agent = await aget_agent()
+    pending = []
+    for job, thread_id in manager.threads_with_status(AWAITING_INPUT):
+        snapshot = await agent.aget_state({"configurable": {"thread_id": thread_id}})
+        messages = snapshot.values.get("messages", [])
+        pending.append({
+            "job_id": job.job_id,
+            "thread_id": thread_id,
+            "question": messages[-1].content if messages else None,
+        })
+    return pending
+
+
+@app.post("/threads/{thread_id}/review", status_code=202)
+async def submit_review(thread_id: str, decision: ReviewDecision):
+    if decision.approved:
+        update_data = {"approved": True, "human_feedback": None}
+    else:
+        update_data = {"approved": False, "human_feedback": decision.feedback or "General refinement needed."}
+
+    _check_thread(thread_id)
+    try:
+        await manager.resume(thread_id, update_data, as_node="human_review", expected_status=AWAITING_REVIEW)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"thread_id": thread_id, "status": "queued"}
+
+
+@app.post("/threads/{thread_id}/messages", status_code=202)
+async def submit_assistance(thread_id: str, reply: AssistanceReply):
+    update_data = {"messages": [HumanMessage(content=reply.content)]}
+    _check_thread(thread_id)
+    try:
+        await manager.resume(thread_id, update_data, as_node="human_assistance", expected_status=AWAITING_INPUT)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"thread_id": thread_id, "status": "queued"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=env("API_HOST", "0.0.0.0"), port=int(env("API_PORT", "8000")))
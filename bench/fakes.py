@@ -0,0 +1,184 @@
+"""
+Deterministic stand-ins for the LLM clients and the SQL agent, used by the offline benchmark.
+Each fake sleeps for a fixed latency and answers in the shape the real node expects to parse.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Callable
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+URL_PATTERN = re.compile(r"https?://[^\s\"']+")
+
+SUMMARY_TEXT = (
+    "University Name: Bench University\n"
+    "Important Dates: Fall admissions open on 1 July; the entry test is held on 15 August; "
+    "the first merit list is announced on 1 September.\n"
+    "Announcements: Need-based scholarships are available for all undergraduate programs.\n"
+    "Events: Orientation week starts on 20 September.\n"
+    "Policies/Guidelines: Applicants must submit attested documents before the deadline.\n"
+) * 3
+
+
+def _text(messages) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+def _first_url(text: str):
+    match = URL_PATTERN.search(text)
+    return match.group(0).rstrip(".,)") if match else None
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that waits `latency` seconds and replies with respond(messages)."""
+
+    role: str
+    respond: Callable
+    latency: float = 0.0
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake"
+
+    def _result(self, messages) -> ChatResult:
+        content = self.respond(messages)
+        prompt_tokens = len(_text(messages)) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        return self | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+
+# --- RESPONDERS (one per registry client) ---
+def intake_responder(messages) -> str:
+    url = _first_url(_text(m for m in messages if m.type == "human"))
+    return json.dumps({"university_name": "Bench University", "topic": "Admissions", "url": url})
+
+
+FACT_SHEET = {"facts": [
+    {"kind": "deadline", "label": "Fall admissions open", "value": "1 July"},
+    {"kind": "date", "label": "Entry test", "value": "15 August"},
+    {"kind": "announcement", "label": "First merit list", "value": "1 September"},
+    {"kind": "scholarship", "label": "Need-based scholarships", "value": "All undergraduate programs"},
+    {"kind": "event", "label": "Orientation week", "value": "Starts 20 September"},
+    {"kind": "policy", "label": "Attested documents", "value": "Submit before the deadline"},
+]}
+
+
+def summary_responder(messages) -> str:
+    # The same client extracts fact sheets (utils/facts.py) from summaries.
+    if "FACT SHEET" in str(messages[0].content):
+        return json.dumps(FACT_SHEET)
+    return SUMMARY_TEXT
+
+
+def post_responder(messages) -> str:
+    url = _first_url(_text(messages)) or "https://bench.edu.pk"
+    return json.dumps({
+        "university_name": "Bench University",
+        "post_heading": "Fall Admissions Now Open at Bench University",
+        "post_content": "Admissions for the fall semester are open until 1 July. "
+                        "The entry test is on 15 August. For details, refer to the official website.",
+        "relevant_url": url,
+        "timestamp": "1 July",
+    })
+
+
+def make_grade_responder(bad_rate: float, seed: int = 7):
+    """Rejects roughly `bad_rate` of drafts so runs exercise the generate/evaluate loop."""
+    rng = random.Random(seed)
+
+    def respond(messages) -> str:
+        if rng.random() < bad_rate:
+            return json.dumps({"grade": "bad", "feedback": "Missing the application deadline."})
+        return json.dumps({"grade": "good", "feedback": None})
+
+    return respond
+
+
+def knowledge_responder(messages) -> str:
+    return json.dumps({
+        "found": True,
+        "official_name": "Bench University",
+        "official_url": "https://bench.edu.pk",
+        "key_info": "Bench University is a public university.",
+    })
+
+
+def build_fake_llms(latency: float, bad_rate: float = 0.0, small_latency: float = None) -> dict:
+    """
+    Registry name -> fake client, mirroring utils.resources.LLM_SPECS.
+    Small-tier clients answer like their large counterpart, after `small_latency` (default latency / 3).
+    """
+    from utils.metrics import MetricsCallback
+    from utils.resources import LLM_SPECS
+
+    small_latency = latency / 3 if small_latency is None else small_latency
+
+    responders = {
+        "intake": intake_responder,
+        "sql_agent": intake_responder,
+        "summarizer": summary_responder,
+        "generator": post_responder,
+        "evaluator": make_grade_responder(bad_rate),
+        "rag_reader": knowledge_responder,
+    }
+    fakes = {}
+    for name in LLM_SPECS:
+        base = name.removesuffix("_small")
+        fakes[name] = FakeChatModel(role=name, respond=responders[base],
+                                    latency=small_latency if name != base else latency,
+                                    model_name=f"fake-{name}", callbacks=[MetricsCallback(name)])
+    return fakes
+
+
+class FakeSqlAgent:
+    """
+    Stands in for the SQL sub-agent: one lookup in the local university store,
+    answered in the JSON block check_db_node parses. `latency` covers the agent's own LLM round trips.
+    """
+
+    def __init__(self, store, latency: float):
+        self.store = store
+        self.latency = latency
+
+    def _answer(self, payload) -> dict:
+        url = _first_url(_text(payload["messages"]))
+        row = self.store.lookup(url)
+        if row is None:
+            body = {"status": "not_found", "data": None}
+        else:
+            body = {"status": "success", "data": row}
+        return {"messages": [AIMessage(content=json.dumps(body))]}
+
+    def invoke(self, payload, config=None):
+        time.sleep(self.latency)
+        return self._answer(payload)
+
+    async def ainvoke(self, payload, config=None):
+        await asyncio.sleep(self.latency)
+        return self._answer(payload)
@@ -0,0 +1,76 @@
+"""
+Re-runs a recorded thread offline from its cassette (see utils/cassette.py) and prints where the time went.
+
+Record first, with the normal drivers:
+    CASSETTE_MODE=record python main.py
+
+Then replay as often as needed:
+    python -m bench.replay <thread_id>                 # recorded latencies
+    python -m bench.replay <thread_id> --zero-latency  # pure in-process cost
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from bench.run import build_agent
+
+
+async def replay(thread_id: str) -> float:
+    from utils import cassette
+
+    steps = cassette.get_cassette(thread_id).driver_steps()
+    if not steps:
+        raise SystemExit(f"No recorded driver steps in {cassette.cassette_path(thread_id)}")
+
+    agent = await build_agent("memory")
+    config = {"configurable": {"thread_id": thread_id}}
+
+    started = time.perf_counter()
+    for step in steps:
+        fields = cassette.decode(step["result"])
+        if step["kind"] == cassette.UPDATE:
+            await agent.aupdate_state(config, fields["values"], as_node=fields["as_node"])
+        else:
+            await agent.ainvoke(fields["values"], config, interrupt_before=fields.get("interrupt_before"))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded thread offline.")
+    parser.add_argument("thread_id")
+    parser.add_argument("--zero-latency", action="store_true", help="Serve recorded calls instantly.")
+    parser.add_argument("--dir", help="Cassette directory (default CASSETTE_DIR or ./cassettes).")
+    args = parser.parse_args()
+
+    from utils import cassette
+    from utils.metrics import print_run_summary
+    from utils.resources import ensure_env
+
+    ensure_env()  # load .env first so it can't override the settings below
+    blob_dir = tempfile.TemporaryDirectory(prefix="lumina-replay-blobs-")
+    os.environ.update({
+        "CASSETTE_MODE": cassette.REPLAY,
+        "CASSETTE_LATENCY": "zero" if args.zero_latency else "original",
+        "BLOB_STORE_BACKEND": "file",
+        "BLOB_STORE_DIR": blob_dir.name,
+    })
+    if args.dir:
+        os.environ["CASSETTE_DIR"] = args.dir
+
+    seconds = asyncio.run(replay(args.thread_id))
+    print(f"\n⏪ Replayed {args.thread_id} in {seconds:.3f}s")
+
+    leftover = [e for e in cassette.get_cassette(args.thread_id).entries
+                if e["kind"] not in (cassette.RUN, cassette.UPDATE) and not e.get("used")]
+    if leftover:
+        print(f"⚠️ {len(leftover)} recorded interactions were not requested; "
+              "the replay diverged from the recording.")
+
+    print_run_summary(args.thread_id)
+    blob_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
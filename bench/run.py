@@ -0,0 +1,265 @@
+"""
+Offline end-to-end throughput benchmark for the compiled graph.
+
+Every external dependency is replaced by a local stand-in (bench/stubs.py), so runs are repeatable
+and cost nothing. Results are stored per commit under bench/results/ and can be compared.
+
+Usage:
+    python -m bench.run run --concurrency 1 4 16 --runs 40 --llm-latency 0.2
+    python -m bench.run run --checkpointer postgres      # AsyncPostgresSaver on DATABASE_URL
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.run run --firestore-emulator
+    python -m bench.run compare <commit_a> <commit_b>
+    python -m bench.run list
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+from langchain_core.messages import HumanMessage
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# --- DRIVING THE GRAPH ---
+async def build_agent(checkpointer: str):
+    from Graph import INTERRUPT_BEFORE, aget_agent, build_workflow
+
+    if checkpointer == "postgres":
+        return await aget_agent()
+
+    from langgraph.checkpoint.memory import InMemorySaver
+    return build_workflow().compile(checkpointer=InMemorySaver(), interrupt_before=INTERRUPT_BEFORE)
+
+
+async def run_one(agent, url: str) -> str:
+    """One full thread: query -> ... -> human_review (auto-approved) -> save_post."""
+    thread_id = f"bench-{uuid.uuid4()}"
+    config = {"configurable": {"thread_id": thread_id}}
+    graph_input = {"messages": [HumanMessage(content=f"Latest admissions news from Bench University {url}")]}
+
+    while True:
+        await agent.ainvoke(graph_input, config)
+        snapshot = await agent.aget_state(config)
+        if not snapshot.next:
+            return thread_id
+
+        graph_input = None
+        if "human_review" in snapshot.next:
+            await agent.aupdate_state(config, {"approved": True, "human_feedback": None}, as_node="human_review")
+        elif "human_assistance" in snapshot.next:
+            await agent.aupdate_state(config, {"messages": [HumanMessage(content=url)]}, as_node="human_assistance")
+        else:
+            raise RuntimeError(f"Unexpected stop before {snapshot.next}")
+
+
+async def run_level(agent, concurrency: int, runs: int, url_pool: int, measure_memory: bool) -> dict:
+    from utils.metrics import metrics
+
+    semaphore = asyncio.Semaphore(concurrency)
+    # The stand-in DB outlives a level; URLs unique to this level keep earlier levels' rows from turning
+    # its runs into DB hits that skip the scrape and the summary.
+    level_id = uuid.uuid4().hex[:8]
+    urls = [f"https://bench{(i % url_pool) if url_pool else i}-{level_id}.edu.pk/admissions" for i in range(runs)]
+    run_seconds, thread_ids, failures = [], [], []
+
+    async def guarded(url):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                thread_ids.append(await run_one(agent, url))
+                run_seconds.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append(repr(e))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(guarded(url) for url in urls))
+    wall = time.perf_counter() - started
+
+    node_times = {}
+    for thread_id in thread_ids:
+        for (category, name), row in metrics.run_summary(thread_id).items():
+            if category == "node":
+                node_times.setdefault(name, []).append(row["seconds"])
+
+    result = {
+        "runs": runs,
+        "completed": len(thread_ids),
+        "failures": len(failures),
+        "wall_seconds": round(wall, 3),
+        "runs_per_sec": round(len(thread_ids) / wall, 3) if wall else 0.0,
+        "run_p50": round(percentile(run_seconds, 0.5), 4),
+        "run_p95": round(percentile(run_seconds, 0.95), 4),
+        "nodes": {
+            name: {"p50": round(percentile(v, 0.5), 4), "p95": round(percentile(v, 0.95), 4), "count": len(v)}
+            for name, v in sorted(node_times.items())
+        },
+    }
+    if failures:
+        result["first_failure"] = failures[0]
+
+    from utils.tiering import escalation_rates
+    result["escalation_rates"] = {f"{task}@{node}": round(rate, 3)
+                                  for (task, node), rate in escalation_rates().items()}
+
+    if measure_memory:
+        # A separate pass, so tracemalloc overhead doesn't distort the timings above.
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await asyncio.gather(*(run_one(agent, f"https://bench-mem{i}-{level_id}.edu.pk") for i in range(concurrency)))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result["memory_kb_per_run"] = round((peak - baseline) / 1024 / concurrency, 1)
+
+    return result
+
+
+async def run_benchmark(args) -> dict:
+    from bench.stubs import offline_environment
+
+    with offline_environment(
+        llm_latency=args.llm_latency,
+        jina_latency=args.jina_latency,
+        db_latency=args.db_latency,
+        firestore_latency=args.firestore_latency,
+        page_size=args.page_size,
+        bad_rate=args.bad_rate,
+        firestore_emulator=args.firestore_emulator,
+    ):
+        agent = await build_agent(args.checkpointer)
+        levels = {}
+        for concurrency in args.concurrency:
+            # Node code prints progress on every step; keep the report readable unless asked.
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                levels[str(concurrency)] = await run_level(
+                    agent, concurrency, args.runs, args.url_pool, not args.no_memory
+                )
+            print_level(concurrency, levels[str(concurrency)])
+    return levels
+
+
+# --- RESULTS ---
+def current_commit() -> dict:
+    def git(*cmd):
+        return subprocess.run(["git", *cmd], capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain"))}
+
+
+def save_results(params: dict, levels: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    info = current_commit()
+    record = {**info, "recorded_at": datetime.now(timezone.utc).isoformat(), "params": params, "levels": levels}
+    path = os.path.join(RESULTS_DIR, f"{info['commit']}{'-dirty' if info['dirty'] else ''}.json")
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    return path
+
+
+def load_results(ref: str) -> dict:
+    path = ref if os.path.exists(ref) else None
+    if path is None and os.path.isdir(RESULTS_DIR):
+        matches = sorted(f for f in os.listdir(RESULTS_DIR) if f.startswith(ref))
+        path = os.path.join(RESULTS_DIR, matches[0]) if matches else None
+    if path is None:
+        raise SystemExit(f"No stored results for '{ref}'")
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_level(concurrency: int, level: dict):
+    print(f"\n🏁 CONCURRENCY {concurrency}: {level['completed']}/{level['runs']} runs, "
+          f"{level['runs_per_sec']} runs/s, run p50 {level['run_p50']}s p95 {level['run_p95']}s"
+          + (f", {level['memory_kb_per_run']} KB/run" if "memory_kb_per_run" in level else ""))
+    if level["failures"]:
+        print(f"   ❌ {level['failures']} failed, first: {level.get('first_failure')}")
+    print(f"   {'NODE':<20}{'P50':>10}{'P95':>10}{'COUNT':>8}")
+    for name, row in level["nodes"].items():
+        print(f"   {name:<20}{row['p50']:>10.4f}{row['p95']:>10.4f}{row['count']:>8}")
+
+
+def compare(ref_a: str, ref_b: str):
+    a, b = load_results(ref_a), load_results(ref_b)
+    if a["params"] != b["params"]:
+        print("⚠️ Benchmark parameters differ; deltas may not be meaningful.")
+
+    def delta(old, new):
+        return f"{((new - old) / old * 100):+.1f}%" if old else "n/a"
+
+    print(f"\n📊 {a['commit']} -> {b['commit']}")
+    for level in sorted(set(a["levels"]) & set(b["levels"]), key=int):
+        la, lb = a["levels"][level], b["levels"][level]
+        print(f"\nCONCURRENCY {level}")
+        print(f"  {'METRIC':<28}{'BEFORE':>10}{'AFTER':>10}{'DELTA':>10}")
+        for key in ("runs_per_sec", "run_p50", "run_p95", "memory_kb_per_run"):
+            if key in la and key in lb:
+                print(f"  {key:<28}{la[key]:>10}{lb[key]:>10}{delta(la[key], lb[key]):>10}")
+        for node in sorted(set(la["nodes"]) | set(lb["nodes"])):
+            old = la["nodes"].get(node, {}).get("p95", 0)
+            new = lb["nodes"].get(node, {}).get("p95", 0)
+            print(f"  {node + ' p95':<28}{old:>10}{new:>10}{delta(old, new):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the Lumina graph.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmark and store results for the current commit.")
+    run_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    run_parser.add_argument("--runs", type=int, default=40, help="Threads per concurrency level.")
+    run_parser.add_argument("--url-pool", type=int, default=0,
+                            help="Distinct URLs to cycle through (0 = a new URL per run, so every run scrapes).")
+    run_parser.add_argument("--llm-latency", type=float, default=0.2)
+    run_parser.add_argument("--jina-latency", type=float, default=0.3)
+    run_parser.add_argument("--db-latency", type=float, default=0.005)
+    run_parser.add_argument("--firestore-latency", type=float, default=0.02)
+    run_parser.add_argument("--firestore-emulator", action="store_true",
+                            help="Write posts to the Firestore emulator at FIRESTORE_EMULATOR_HOST.")
+    run_parser.add_argument("--page-size", type=int, default=20000, help="Characters per scraped page.")
+    run_parser.add_argument("--bad-rate", type=float, default=0.0, help="Share of drafts the evaluator rejects.")
+    run_parser.add_argument("--checkpointer", choices=["memory", "postgres"], default="memory")
+    run_parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass.")
+    run_parser.add_argument("--no-save", action="store_true")
+    run_parser.add_argument("--verbose", action="store_true", help="Show node output.")
+
+    compare_parser = sub.add_parser("compare", help="Compare stored results of two commits.")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    sub.add_parser("list", help="List stored results.")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        levels = asyncio.run(run_benchmark(args))
+        if not args.no_save:
+            params = {k: v for k, v in vars(args).items() if k not in ("command", "no_save", "verbose", "no_memory")}
+            print(f"\n💾 Saved {save_results(params, levels)}")
+
+    elif args.command == "compare":
+        compare(args.before, args.after)
+
+    else:
+        if os.path.isdir(RESULTS_DIR):
+            for name in sorted(os.listdir(RESULTS_DIR)):
+                print(name)
+
+
+if __name__ == "__main__":
+    main()
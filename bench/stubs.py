@@ -0,0 +1,180 @@
+"""
+Local stand-ins for Jina, the university table and Firestore, plus offline_environment()
+which swaps them (and the fake LLMs) into a process for the duration of a benchmark.
+"""
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from bench.fakes import FakeSqlAgent, build_fake_llms
+from db import university_cache
+from db.operations import canonical_url
+
+
+# --- JINA READER ---
+def start_jina_stub(latency: float, page_size: int):
+    """Serves a synthetic page for any path, after `latency` seconds. Returns (server, reader prefix)."""
+    page = ("Bench University admissions notice. The entry test is held on 15 August. " * (page_size // 70 + 1))
+    body = page[:page_size].encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="jina-stub", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+# --- UNIVERSITY TABLE ---
+class SqliteUniversityStore:
+    """The `university` table in SQLite, with the same upsert semantics and signature as db.operations."""
+
+    def __init__(self, path: str = ":memory:", latency: float = 0.0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS university (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uni_name TEXT, url TEXT UNIQUE, summary TEXT, time_stamp TEXT, facts TEXT
+            )
+        """)
+
+    def insert(self, uni_name: str, url: str, summary: str, time_stamp=None, facts=None) -> int:
+        time_stamp = (time_stamp or datetime.now(timezone.utc)).isoformat()
+        facts = json.dumps(facts) if facts is not None else None
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO university (uni_name, url, summary, time_stamp, facts) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET uni_name = excluded.uni_name, summary = excluded.summary, "
+                "time_stamp = excluded.time_stamp, facts = excluded.facts RETURNING id",
+                (uni_name, canonical_url(url), summary, time_stamp, facts),
+            )
+            inserted_id = cur.fetchone()[0]
+            self._conn.commit()
+        university_cache.invalidate(url)
+        return inserted_id
+
+    def lookup(self, url: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uni_name, url, summary, time_stamp FROM university WHERE url = ?",
+                (canonical_url(url),),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("uni_name", "url", "summary", "time_stamp"), row))
+
+    def facts(self, url: str):
+        with self._lock:
+            row = self._conn.execute("SELECT facts FROM university WHERE url = ?", (canonical_url(url),)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    async def ainsert_university(self, database_url, uni_name, url, summary, time_stamp=None, facts=None):
+        await asyncio.sleep(self.latency)
+        return self.insert(uni_name, url, summary, time_stamp, facts)
+
+    async def afetch_university_facts(self, database_url, url):
+        await asyncio.sleep(self.latency)
+        return self.facts(url)
+
+
+# --- FIRESTORE ---
+class FirestoreStub:
+    """Collects saved posts in memory instead of writing to 'university_updates'."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.documents = {}
+        self._ids = itertools.count(1)
+
+    async def asave_post_to_firestore(self, post_data: dict, doc_id: Optional[str] = None):
+        await asyncio.sleep(self.latency)
+        doc_id = doc_id or f"bench-{next(self._ids)}"
+        self.documents[doc_id] = dict(post_data)
+        return doc_id
+
+
+# --- WIRING ---
+@contextmanager
+def offline_environment(llm_latency: float = 0.2, jina_latency: float = 0.3, db_latency: float = 0.005,
+                        firestore_latency: float = 0.02, page_size: int = 20000, bad_rate: float = 0.0,
+                        firestore_emulator: bool = False):
+    """
+    Points every external dependency of the graph at a local stand-in:
+    fake LLM clients and SQL agent through the resource registry, the Jina reader through JINA_READER_URL,
+    blobs to a temp directory, and the university/Firestore writes to in-process stores.
+    With firestore_emulator=True posts go to the Firestore emulator at FIRESTORE_EMULATOR_HOST instead.
+    Yields a dict with the stores so callers can inspect what was written.
+    """
+    from utils.resources import ensure_env, registry
+    import nodes.check_db_node
+    import nodes.save_post
+    import nodes.summarization
+
+    ensure_env()  # load .env first so it can't override the settings below
+
+    jina_server, reader_prefix = start_jina_stub(jina_latency, page_size)
+    blob_dir = tempfile.TemporaryDirectory(prefix="lumina-bench-blobs-")
+    store = SqliteUniversityStore(latency=db_latency)
+    firestore = FirestoreStub(latency=firestore_latency)
+
+    env_overrides = {
+        "JINA_READER_URL": reader_prefix,
+        "JINA_API_KEY": os.environ.get("JINA_API_KEY") or "bench",
+        "BLOB_STORE_BACKEND": "file",
+        "BLOB_STORE_DIR": blob_dir.name,
+        "DATABASE_URL": os.environ.get("DATABASE_URL") or "sqlite://bench",
+    }
+    saved_env = {k: os.environ.get(k) for k in env_overrides}
+    os.environ.update(env_overrides)
+
+    if firestore_emulator and not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        raise EnvironmentError("firestore_emulator needs FIRESTORE_EMULATOR_HOST (e.g. localhost:8080)")
+
+    saved_functions = (nodes.summarization.ainsert_university, nodes.save_post.asave_post_to_firestore,
+                       nodes.check_db_node.afetch_university_facts)
+    nodes.summarization.ainsert_university = store.ainsert_university
+    nodes.check_db_node.afetch_university_facts = store.afetch_university_facts
+    if not firestore_emulator:
+        nodes.save_post.asave_post_to_firestore = firestore.asave_post_to_firestore
+
+    for name, fake in build_fake_llms(llm_latency, bad_rate).items():
+        registry.override(f"llm:{name}", fake)
+    # The real agent makes ~3 LLM round trips (list tables, query, answer).
+    registry.override("sql_agent", FakeSqlAgent(store, latency=3 * llm_latency + db_latency))
+    registry.override("sql_agent_small", FakeSqlAgent(store, latency=llm_latency + db_latency))
+
+    try:
+        yield {"store": store, "firestore": None if firestore_emulator else firestore}
+    finally:
+        registry.reset()
+        university_cache.clear()
+        (nodes.summarization.ainsert_university, nodes.save_post.asave_post_to_firestore,
+         nodes.check_db_node.afetch_university_facts) = saved_functions
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        jina_server.shutdown()
+        blob_dir.cleanup()
@@ -7,6 +7,9 @@ from typing import List
 from google import genai
 from chromadb import PersistentClient
 
+from utils.rate_limit import get_governor
+from utils.resources import BATCH
+
 
 def get_or_create_knowledge_base(
         excel_path: str,
@@ -88,7 +91,11 @@ def get_or_create_knowledge_base(
     print(f"Generating embeddings for {len(docs)} chunks...")
     embeddings = []
 
+    # Ingestion shares the Gemini quota with the RAG tool, at batch priority.
+    governor = get_governor("GOOGLE_API_KEY")
+
     for text in docs:
+        governor.acquire(len(text) / 4 + 1, BATCH)
         result = genai_client.models.embed_content(
             model="gemini-embedding-001",
             contents=text
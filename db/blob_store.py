@@ -0,0 +1,199 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+import psycopg
+from psycopg.rows import tuple_row
+
+from db.pool import get_async_pool
+from utils.metrics import atimed, timed
+from utils.resources import env
+
+# Large state fields (scraped Content, summaries) are stored once, compressed and keyed by content hash.
+# Checkpointed state only carries the short reference string below.
+BLOB_REF_PREFIX = "blob:sha256:"
+
+
+PUT_BLOB_QUERY = """
+INSERT INTO state_blobs (hash, data, raw_size)
+VALUES (%s, %s, %s)
+ON CONFLICT (hash) DO UPDATE SET last_used_at = NOW();
+"""
+
+GET_BLOB_QUERY = "SELECT data FROM state_blobs WHERE hash = %s;"
+
+
+class _LRUCache:
+    """Small thread-safe LRU of decompressed blobs, so repeated resolves skip the round trip."""
+
+    def __init__(self, max_items: int = 64):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+_cache = _LRUCache()
+
+
+def _backend() -> str:
+    return env("BLOB_STORE_BACKEND", "postgres")  # "postgres" or "file"
+
+
+def _store_dir() -> str:
+    return env("BLOB_STORE_DIR", "./blob_store")
+
+
+def _min_size() -> int:
+    return int(env("BLOB_MIN_SIZE", "2048"))  # values shorter than this stay inline
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+
+def _encode(text: str):
+    raw = text.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    return digest, zlib.compress(raw, 6), len(raw)
+
+
+def _decode(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(_store_dir(), digest[:2], f"{digest}.z")
+
+
+def _write_file(digest: str, data: bytes):
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_file(digest: str) -> bytes:
+    with open(_blob_path(digest), "rb") as f:
+        return f.read()
+
+
+def _should_offload(value) -> bool:
+    return isinstance(value, str) and not is_blob_ref(value) and len(value) >= _min_size()
+
+
+# --- SYNC API ---
+def put_blob(value: Optional[str]) -> Optional[str]:
+    """
+    Stores a large string and returns its reference. Short values and existing refs are returned unchanged.
+    """
+    if not _should_offload(value):
+        return value
+
+    digest, data, raw_size = _encode(value)
+
+    if _backend() == "file":
+        _write_file(digest, data)
+    else:
+        with timed("db", "put_blob"), psycopg.connect(env("DATABASE_URL"), row_factory=tuple_row) as conn:
+            with conn.cursor() as cur:
+                cur.execute(PUT_BLOB_QUERY, (digest, data, raw_size))
+            conn.commit()
+
+    _cache.put(digest, value)
+    return f"{BLOB_REF_PREFIX}{digest}"
+
+
+def resolve_blob(value: Optional[str]) -> Optional[str]:
+    """
+    Returns the original string for a blob reference. Non-reference values pass through unchanged.
+    """
+    if not is_blob_ref(value):
+        return value
+
+    digest = value[len(BLOB_REF_PREFIX):]
+    cached = _cache.get(digest)
+    if cached is not None:
+        return cached
+
+    if _backend() == "file":
+        data = _read_file(digest)
+    else:
+        with timed("db", "get_blob"), psycopg.connect(env("DATABASE_URL"), row_factory=tuple_row) as conn:
+            with conn.cursor() as cur:
+                cur.execute(GET_BLOB_QUERY, (digest,))
+                row = cur.fetchone()
+        if row is None:
+            raise KeyError(f"Blob not found: {value}")
+        data = row[0]
+
+    text = _decode(data)
+    _cache.put(digest, text)
+    return text
+
+
+# --- ASYNC API ---
+async def aput_blob(value: Optional[str]) -> Optional[str]:
+    """Async version of put_blob."""
+    if not _should_offload(value):
+        return value
+
+    digest, data, raw_size = _encode(value)
+
+    if _backend() == "file":
+        _write_file(digest, data)
+    else:
+        pool = await get_async_pool(env("DATABASE_URL"))
+        async with atimed("db", "put_blob"), pool.connection() as conn:
+            async with conn.cursor(row_factory=tuple_row) as cur:
+                await cur.execute(PUT_BLOB_QUERY, (digest, data, raw_size))
+
+    _cache.put(digest, value)
+    return f"{BLOB_REF_PREFIX}{digest}"
+
+
+async def aresolve_blob(value: Optional[str]) -> Optional[str]:
+    """Async version of resolve_blob."""
+    if not is_blob_ref(value):
+        return value
+
+    digest = value[len(BLOB_REF_PREFIX):]
+    cached = _cache.get(digest)
+    if cached is not None:
+        return cached
+
+    if _backend() == "file":
+        data = _read_file(digest)
+    else:
+        pool = await get_async_pool(env("DATABASE_URL"))
+        async with atimed("db", "get_blob"), pool.connection() as conn:
+            async with conn.cursor(row_factory=tuple_row) as cur:
+                await cur.execute(GET_BLOB_QUERY, (digest,))
+                row = await cur.fetchone()
+        if row is None:
+            raise KeyError(f"Blob not found: {value}")
+        data = row[0]
+
+    text = _decode(data)
+    _cache.put(digest, text)
+    return text
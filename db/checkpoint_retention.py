@@ -0,0 +1,304 @@
+"""
+Retention for the LangGraph Postgres checkpointer.
+
+- Completed threads are compacted down to their latest checkpoint.
+- Threads that never completed and have been idle longer than the TTL are deleted.
+- Deletes run in small autocommit batches so autovacuum can keep up.
+
+Usage:
+    python -m db.checkpoint_retention report
+    python -m db.checkpoint_retention prune --ttl-days 14 --batch-size 500 [--dry-run] [--vacuum]
+"""
+import argparse
+import re
+
+import psycopg
+from psycopg.rows import tuple_row
+
+from utils.resources import env
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes", "state_blobs")
+
+TABLE_REPORT_QUERY = """
+SELECT c.relname,
+       c.reltuples::BIGINT,
+       pg_total_relation_size(c.oid)
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname = ANY(%s) AND n.nspname = current_schema()
+ORDER BY pg_total_relation_size(c.oid) DESC;
+"""
+
+# A thread is completed when its latest root checkpoint starts no further task (what get_state reports as an empty
+# `next`): no node is triggered (branch:to:* holds a value), no Send was just queued and no task left pending writes.
+LIST_THREADS_QUERY = """
+WITH latest AS (
+    SELECT DISTINCT ON (thread_id) thread_id, checkpoint_ns, checkpoint_id, checkpoint
+    FROM checkpoints
+    WHERE checkpoint_ns = ''
+    ORDER BY thread_id, checkpoint_id DESC
+),
+finished AS (
+    SELECT l.thread_id,
+           NOT EXISTS (
+               SELECT 1 FROM jsonb_object_keys(l.checkpoint->'channel_values') AS channel
+               WHERE channel LIKE 'branch:to:%%'
+           )
+           AND NOT COALESCE(l.checkpoint->'updated_channels', '[]'::JSONB) ? '__pregel_tasks'
+           AND NOT EXISTS (
+               SELECT 1 FROM checkpoint_writes w
+               WHERE w.thread_id = l.thread_id AND w.checkpoint_ns = l.checkpoint_ns
+                 AND w.checkpoint_id = l.checkpoint_id
+           ) AS completed
+    FROM latest l
+)
+SELECT c.thread_id,
+       MAX((c.checkpoint->>'ts')::TIMESTAMPTZ) AS last_ts,
+       MAX((c.checkpoint->>'ts')::TIMESTAMPTZ) < NOW() - make_interval(days => %s) AS expired,
+       COUNT(*) AS n_checkpoints,
+       COALESCE(BOOL_OR(f.completed), FALSE) AS completed
+FROM checkpoints c
+LEFT JOIN finished f USING (thread_id)
+GROUP BY c.thread_id;
+"""
+
+# Everything but the newest checkpoint per (thread, namespace). checkpoint_id is a uuid6, so MAX is the latest.
+COMPACT_CHECKPOINTS_QUERY = """
+DELETE FROM checkpoints WHERE ctid IN (
+    SELECT c.ctid FROM checkpoints c
+    WHERE c.thread_id = %(thread_id)s
+      AND c.checkpoint_id < (
+          SELECT MAX(l.checkpoint_id) FROM checkpoints l
+          WHERE l.thread_id = c.thread_id AND l.checkpoint_ns = c.checkpoint_ns
+      )
+    LIMIT %(batch_size)s
+);
+"""
+
+# Pending writes of checkpoints that no longer exist.
+COMPACT_WRITES_QUERY = """
+DELETE FROM checkpoint_writes WHERE ctid IN (
+    SELECT w.ctid FROM checkpoint_writes w
+    WHERE w.thread_id = %(thread_id)s
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns
+            AND c.checkpoint_id = w.checkpoint_id
+      )
+    LIMIT %(batch_size)s
+);
+"""
+
+# Channel values whose version is not referenced by any remaining checkpoint.
+COMPACT_BLOBS_QUERY = """
+DELETE FROM checkpoint_blobs WHERE ctid IN (
+    SELECT b.ctid FROM checkpoint_blobs b
+    WHERE b.thread_id = %(thread_id)s
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint->'channel_versions'->>b.channel = b.version
+      )
+    LIMIT %(batch_size)s
+);
+"""
+
+DELETE_THREAD_QUERY = """
+DELETE FROM {table} WHERE ctid IN (
+    SELECT ctid FROM {table} WHERE thread_id = %(thread_id)s LIMIT %(batch_size)s
+);
+"""
+
+# Where a retained checkpoint can hold a blob reference (db/blob_store.py): channel values stored inline in the
+# checkpoint, serialized channel values, and pending writes. last_used_at is only bumped when a blob is written,
+# so a thread waiting days in review still needs the blobs it references.
+BLOB_REFERENCE_QUERIES = (
+    "SELECT convert_to(checkpoint::text || metadata::text, 'UTF8') FROM checkpoints "
+    "WHERE checkpoint::text || metadata::text LIKE '%blob:sha256:%'",
+    "SELECT blob FROM checkpoint_blobs WHERE position('blob:sha256:'::bytea IN blob) > 0",
+    "SELECT blob FROM checkpoint_writes WHERE position('blob:sha256:'::bytea IN blob) > 0",
+)
+
+STALE_STATE_BLOBS_QUERY = """
+SELECT hash FROM state_blobs WHERE last_used_at < NOW() - make_interval(days => %s);
+"""
+
+# last_used_at is checked again, so a blob written since the candidates were listed survives.
+DELETE_STATE_BLOBS_QUERY = """
+DELETE FROM state_blobs WHERE hash = ANY(%s) AND last_used_at < NOW() - make_interval(days => %s);
+"""
+
+BLOB_REF_PATTERN = re.compile(rb"blob:sha256:([0-9a-f]{64})")
+
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def table_report(conn) -> list:
+    """Returns [(table, approx_rows, total_bytes)] for the checkpoint tables, largest first."""
+    with conn.cursor() as cur:
+        cur.execute(TABLE_REPORT_QUERY, (list(CHECKPOINT_TABLES),))
+        return cur.fetchall()
+
+
+def print_report(rows: list, title: str):
+    print(f"\n📊 {title}")
+    print(f"{'TABLE':<22}{'ROWS (approx)':>16}{'SIZE':>12}")
+    print("-" * 50)
+    for table, n_rows, size in rows:
+        print(f"{table:<22}{max(n_rows, 0):>16,}{_format_bytes(size):>12}")
+    total = sum(r[2] for r in rows)
+    print("-" * 50)
+    print(f"{'TOTAL':<22}{'':>16}{_format_bytes(total):>12}")
+
+
+def _delete_in_batches(conn, query: str, params: dict) -> int:
+    """Repeats a LIMITed delete until it removes nothing. Each batch is its own transaction."""
+    deleted = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            n = cur.rowcount
+        deleted += n
+        if n < params["batch_size"]:
+            return deleted
+
+
+def compact_thread(conn, thread_id: str, batch_size: int) -> int:
+    """Keeps only the latest checkpoint of a thread (and the blobs/writes it references)."""
+    params = {"thread_id": thread_id, "batch_size": batch_size}
+    deleted = _delete_in_batches(conn, COMPACT_CHECKPOINTS_QUERY, params)
+    deleted += _delete_in_batches(conn, COMPACT_WRITES_QUERY, params)
+    deleted += _delete_in_batches(conn, COMPACT_BLOBS_QUERY, params)
+    return deleted
+
+
+def delete_thread(conn, thread_id: str, batch_size: int) -> int:
+    """Removes every checkpoint row of a thread."""
+    params = {"thread_id": thread_id, "batch_size": batch_size}
+    deleted = 0
+    for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+        deleted += _delete_in_batches(conn, DELETE_THREAD_QUERY.format(table=table), params)
+    return deleted
+
+
+def blob_hashes(data) -> set:
+    """Hashes of the blob references in serialized checkpoint data (bytes)."""
+    return {match.decode() for match in BLOB_REF_PATTERN.findall(bytes(data or b""))}
+
+
+def referenced_blob_hashes(conn) -> set:
+    """Hashes of every state blob a remaining checkpoint or pending write references."""
+    referenced = set()
+    for i, query in enumerate(BLOB_REFERENCE_QUERIES):
+        # Server-side cursors stream the rows; they need a transaction even on an autocommit connection.
+        with conn.transaction(), conn.cursor(name=f"blob_refs_{i}") as cur:
+            cur.execute(query)
+            for (data,) in cur:
+                referenced |= blob_hashes(data)
+    return referenced
+
+
+def prune_state_blobs(conn, days: int, batch_size: int) -> int:
+    """Deletes state blobs unused for `days` that no remaining checkpoint references."""
+    referenced = referenced_blob_hashes(conn)
+    with conn.cursor() as cur:
+        cur.execute(STALE_STATE_BLOBS_QUERY, (days,))
+        unreferenced = [row[0] for row in cur.fetchall() if row[0] not in referenced]
+
+    deleted = 0
+    for start in range(0, len(unreferenced), batch_size):
+        with conn.cursor() as cur:
+            cur.execute(DELETE_STATE_BLOBS_QUERY, (unreferenced[start:start + batch_size], days))
+            deleted += cur.rowcount
+    return deleted
+
+
+def prune(database_url: str, ttl_days: int = 14, batch_size: int = 500, dry_run: bool = False,
+          blob_ttl_days: int = None, vacuum: bool = False) -> dict:
+    """
+    Applies the retention policy and returns counters of what was (or would be) removed.
+    """
+    stats = {"compacted_threads": 0, "deleted_threads": 0, "kept_threads": 0, "deleted_rows": 0}
+
+    with psycopg.connect(database_url, row_factory=tuple_row, autocommit=True) as conn:
+        print_report(table_report(conn), "Checkpoint tables BEFORE")
+
+        with conn.cursor() as cur:
+            cur.execute(LIST_THREADS_QUERY, (ttl_days,))
+            threads = cur.fetchall()
+
+        print(f"\n🔎 Inspecting {len(threads)} threads (TTL: {ttl_days} days)...")
+
+        for thread_id, last_ts, expired, n_checkpoints, completed in threads:
+            if completed:
+                if n_checkpoints <= 1:
+                    stats["kept_threads"] += 1
+                    continue
+                stats["compacted_threads"] += 1
+                if not dry_run:
+                    stats["deleted_rows"] += compact_thread(conn, thread_id, batch_size)
+
+            elif expired:
+                # Never reached END and idle past the TTL: abandoned (includes shared fan-out parents).
+                stats["deleted_threads"] += 1
+                if not dry_run:
+                    stats["deleted_rows"] += delete_thread(conn, thread_id, batch_size)
+
+            else:
+                stats["kept_threads"] += 1
+
+        if blob_ttl_days is not None and not dry_run:
+            # After the thread deletes, so blobs only abandoned threads referenced go too.
+            stats["deleted_rows"] += prune_state_blobs(conn, blob_ttl_days, batch_size)
+
+        if vacuum and not dry_run:
+            print("\n🧹 Running VACUUM (ANALYZE)...")
+            for table in CHECKPOINT_TABLES:
+                conn.execute(f"VACUUM (ANALYZE) {table};")
+
+        print_report(table_report(conn), "Checkpoint tables AFTER")
+
+    label = "DRY RUN" if dry_run else "DONE"
+    print(f"\n✅ Retention {label}: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint retention for the Postgres checkpointer.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("report", help="Show checkpoint table sizes.")
+
+    prune_parser = sub.add_parser("prune", help="Compact completed threads and delete abandoned ones.")
+    prune_parser.add_argument("--ttl-days", type=int, default=14,
+                              help="Idle days before an unfinished thread is deleted.")
+    prune_parser.add_argument("--batch-size", type=int, default=500, help="Rows per DELETE statement.")
+    prune_parser.add_argument("--blob-ttl-days", type=int, default=None,
+                              help="Also drop state blobs unused for this long that no checkpoint references.")
+    prune_parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed.")
+    prune_parser.add_argument("--vacuum", action="store_true", help="Run VACUUM (ANALYZE) afterwards.")
+
+    args = parser.parse_args()
+
+    if args.command == "report":
+        with psycopg.connect(env("DATABASE_URL"), row_factory=tuple_row) as conn:
+            print_report(table_report(conn), "Checkpoint tables")
+    else:
+        prune(
+            env("DATABASE_URL"),
+            ttl_days=args.ttl_days,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            blob_ttl_days=args.blob_ttl_days,
+            vacuum=args.vacuum,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,112 @@
+from pathlib import Path
+
 import psycopg
 from psycopg.rows import tuple_row
 
+# The schema lives in init_db.sql, so it can also be applied by hand (psql -f db/init_db.sql).
+CREATE_TABLES_QUERY = (Path(__file__).parent / "init_db.sql").read_text()
+
 
 def create_tables(database_url: str):
     """
-    Creates required tables in PostgreSQL if they do not already exist.
-    Safe to run on every startup.
+    Creates required tables in PostgreSQL if they do not already exist, and migrates
+    an append-only `university` table to one row per URL. Safe to run on every startup.
     """
-    create_query = """
-    CREATE TABLE IF NOT EXISTS university (
-        id SERIAL PRIMARY KEY,
-        uni_name TEXT NOT NULL,
-        url TEXT NOT NULL,
-        summary TEXT NOT NULL,
-        time_stamp TIMESTAMPTZ DEFAULT NOW()
-    );
+    with psycopg.connect(database_url, row_factory=tuple_row) as conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_TABLES_QUERY)
+        conn.commit()
+
+
+async def acreate_tables(database_url: str):
     """
+    Async version of create_tables.
+    """
+    async with await psycopg.AsyncConnection.connect(database_url, row_factory=tuple_row) as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(CREATE_TABLES_QUERY)
+        await conn.commit()
+
+
+MOVE_UNIVERSITY_ROW_QUERY = """
+INSERT INTO university (uni_name, url, summary, time_stamp, facts)
+SELECT uni_name, %s, summary, time_stamp, facts FROM university WHERE id = %s
+ON CONFLICT (url) DO UPDATE
+SET uni_name = EXCLUDED.uni_name, summary = EXCLUDED.summary, time_stamp = EXCLUDED.time_stamp,
+    facts = EXCLUDED.facts
+WHERE university.time_stamp IS NULL OR university.time_stamp < EXCLUDED.time_stamp
+RETURNING id;
+"""
+
+ARCHIVE_UNIVERSITY_ROW_QUERY = """
+INSERT INTO university_history (uni_name, url, summary, time_stamp, facts)
+SELECT uni_name, %s, summary, time_stamp, facts FROM university WHERE id = %s;
+"""
+
+MOVE_TRACKED_URL_QUERY = """
+INSERT INTO tracked_urls (url, uni_name, last_requested_at)
+SELECT %s, uni_name, last_requested_at FROM tracked_urls WHERE url = %s
+ON CONFLICT (url) DO UPDATE
+SET last_requested_at = GREATEST(tracked_urls.last_requested_at, EXCLUDED.last_requested_at);
+"""
+
 
+def canonicalize_stored_urls(database_url: str) -> int:
+    """
+    Rewrites stored URLs to their canonical form (utils/normalize_urls.py). University rows that collapse
+    onto one URL are merged oldest first, so the newest summary stays current and the others go to history.
+    Returns how many university rows were moved.
+    """
+    from db.operations import canonical_url, fetchable_url
+
+    moved = 0
     with psycopg.connect(database_url, row_factory=tuple_row) as conn:
         with conn.cursor() as cur:
-            cur.execute(create_query)
+            cur.execute("SELECT id, url FROM university ORDER BY time_stamp ASC NULLS FIRST, id")
+            for row_id, url in cur.fetchall():
+                canonical = canonical_url(url)
+                if canonical == url:
+                    continue
+                cur.execute(MOVE_UNIVERSITY_ROW_QUERY, (canonical, row_id))
+                if cur.fetchone() is None:
+                    # A newer summary is already current for the canonical URL; keep this one as history.
+                    cur.execute(ARCHIVE_UNIVERSITY_ROW_QUERY, (canonical, row_id))
+                cur.execute("DELETE FROM university WHERE id = %s", (row_id,))
+                moved += 1
+
+            cur.execute("SELECT url FROM tracked_urls")
+            for (url,) in cur.fetchall():
+                if canonical_url(url) != url:
+                    cur.execute(MOVE_TRACKED_URL_QUERY, (canonical_url(url), url))
+                    cur.execute("DELETE FROM tracked_urls WHERE url = %s", (url,))
+
+            cur.execute("SELECT DISTINCT url FROM scrape_history")
+            for (url,) in cur.fetchall():
+                if canonical_url(url) != url:
+                    cur.execute("UPDATE scrape_history SET url = %s WHERE url = %s", (canonical_url(url), url))
+
+            # Alias targets are fetched, so they keep their scheme (fetchable_url), unlike the lookup keys above.
+            cur.execute("SELECT DISTINCT canonical FROM url_aliases")
+            for (url,) in cur.fetchall():
+                if fetchable_url(url) != url:
+                    cur.execute("UPDATE url_aliases SET canonical = %s WHERE canonical = %s", (fetchable_url(url), url))
         conn.commit()
+
+    return moved
+
+
+if __name__ == "__main__":
+    # python -m db.db create | canonicalize-urls
+    import argparse
+
+    from utils.resources import env
+
+    parser = argparse.ArgumentParser(description="Schema maintenance.")
+    parser.add_argument("command", choices=["create", "canonicalize-urls"])
+    args = parser.parse_args()
+
+    create_tables(env("DATABASE_URL"))
+    if args.command == "create":
+        print("✅ Tables created.")
+    else:
+        print(f"✅ Moved {canonicalize_stored_urls(env('DATABASE_URL'))} university row(s) to canonical URLs.")
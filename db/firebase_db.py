@@ -1,13 +1,42 @@
+import asyncio
+import hashlib
+import json
+import os
+import weakref
+from typing import Dict, Iterable, List, Optional
+
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
-import os
+from firebase_admin import firestore_async
+
+from utils.metrics import atimed, timed
+from utils.resources import env, registry
+
+POSTS_COLLECTION = "university_updates"
+
+# Firestore caps a WriteBatch at 500 writes.
+BATCH_LIMIT = 500
+# Batches of one bulk save committed at the same time.
+CONCURRENT_BATCHES = 4
+
+# The async client is bound to the event loop it was created on.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def emulator_host():
+    """FIRESTORE_EMULATOR_HOST (e.g. "localhost:8080") points both clients at the local emulator."""
+    return env("FIRESTORE_EMULATOR_HOST")
+
+
+def _project_id() -> str:
+    return env("FIREBASE_PROJECT_ID", "lumina-local")
 
 
 def initialize_firebase():
     # Only initialize if it hasn't been done already
     if not firebase_admin._apps:
-        cred_path = "serviceAccountKey.json"
+        cred_path = env("FIREBASE_CREDENTIALS", "serviceAccountKey.json")
 
         if not os.path.exists(cred_path):
             raise FileNotFoundError(f"❌ Missing {cred_path}. Place it in project root.")
@@ -16,20 +45,141 @@ def initialize_firebase():
         firebase_admin.initialize_app(cred)
 
 
-def save_post_to_firestore(post_data: dict):
+def _build_firestore():
+    if emulator_host():
+        # The emulator needs no service account; the client library picks the host up from the env.
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud.firestore import Client
+        return Client(project=_project_id(), credentials=AnonymousCredentials())
+
+    initialize_firebase()
+    return firestore.client()
+
+
+registry.register("firestore", _build_firestore)
+
+
+def get_async_firestore():
+    """The long-lived async client for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        if emulator_host():
+            from google.auth.credentials import AnonymousCredentials
+            from google.cloud.firestore import AsyncClient
+            client = AsyncClient(project=_project_id(), credentials=AnonymousCredentials())
+        else:
+            initialize_firebase()
+            client = firestore_async.client()
+        _async_clients[loop] = client
+    return client
+
+
+def post_doc_id(post_data: dict, thread_id: Optional[str] = None) -> str:
     """
-    Saves the specific post data to the 'university_updates' collection.
+    Deterministic document id for a post: saving it again overwrites it instead of duplicating it.
+    Given the thread that wrote the post, the id comes from thread_id + relevant_url, so a retried run that
+    regenerates the draft (new wording, new timestamp) still lands on the same document.
+    Without one, it is a hash of the post's content.
+    """
+    if thread_id:
+        source = json.dumps([thread_id, post_data.get("relevant_url")])
+    else:
+        source = json.dumps(post_data, sort_keys=True, default=str)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+def _chunks(posts: Dict[str, dict]) -> Iterable[List[tuple]]:
+    items = list(posts.items())
+    for start in range(0, len(items), BATCH_LIMIT):
+        yield items[start:start + BATCH_LIMIT]
+
+
+def save_post_to_firestore(post_data: dict, doc_id: Optional[str] = None):
+    """
+    Saves the specific post data to the 'university_updates' collection, under `doc_id`
+    (default post_doc_id(post_data)).
     """
     try:
-        initialize_firebase()
-        db = firestore.client()
+        db = registry.get("firestore")
 
-        # 1. Change Collection Name here
         # This will automatically create "university_updates" if it doesn't exist
-        update_time, post_ref = db.collection("university_updates").add(post_data)
+        doc_id = doc_id or post_doc_id(post_data)
+        with timed("db", "firestore_set"):
+            db.collection(POSTS_COLLECTION).document(doc_id).set(post_data)
+
+        print(f"✅ Database: Saved to 'university_updates' (ID: {doc_id})")
+        return doc_id
+    except Exception as e:
+        print(f"❌ Database Error: {e}")
+        raise e
+
+
+async def asave_post_to_firestore(post_data: dict, doc_id: Optional[str] = None):
+    """
+    Async version of save_post_to_firestore using the asyncio Firestore client.
+    """
+    try:
+        db = get_async_firestore()
+
+        doc_id = doc_id or post_doc_id(post_data)
+        async with atimed("db", "firestore_set"):
+            await db.collection(POSTS_COLLECTION).document(doc_id).set(post_data)
+
+        print(f"✅ Database: Saved to 'university_updates' (ID: {doc_id})")
+        return doc_id
+    except Exception as e:
+        print(f"❌ Database Error: {e}")
+        raise e
+
+
+def save_posts_to_firestore(posts) -> List[str]:
+    """
+    Writes many posts in WriteBatch chunks of up to 500. `posts` is {doc_id: post_data} or a list of posts
+    (ids then come from post_doc_id). Documents are set under their ids, so re-saving a batch is idempotent.
+    """
+    if not isinstance(posts, dict):
+        posts = {post_doc_id(p): p for p in posts}
+    try:
+        db = registry.get("firestore")
+        collection = db.collection(POSTS_COLLECTION)
+
+        for chunk in _chunks(posts):
+            batch = db.batch()
+            for doc_id, post_data in chunk:
+                batch.set(collection.document(doc_id), post_data)
+            with timed("db", "firestore_batch"):
+                batch.commit()
+
+        print(f"✅ Database: Saved {len(posts)} post(s) to 'university_updates'")
+        return list(posts)
+    except Exception as e:
+        print(f"❌ Database Error: {e}")
+        raise e
+
+
+async def asave_posts_to_firestore(posts) -> List[str]:
+    """
+    Async version of save_posts_to_firestore. Up to CONCURRENT_BATCHES chunks are committed at once.
+    """
+    if not isinstance(posts, dict):
+        posts = {post_doc_id(p): p for p in posts}
+    try:
+        db = get_async_firestore()
+        collection = db.collection(POSTS_COLLECTION)
+        slots = asyncio.Semaphore(CONCURRENT_BATCHES)
+
+        async def commit(chunk):
+            batch = db.batch()
+            for doc_id, post_data in chunk:
+                batch.set(collection.document(doc_id), post_data)
+            async with slots, atimed("db", "firestore_batch"):
+                await batch.commit()
+
+        await asyncio.gather(*(commit(chunk) for chunk in _chunks(posts)))
 
-        print(f"✅ Database: Saved to 'university_updates' (ID: {post_ref.id})")
-        return post_ref.id
+        print(f"✅ Database: Saved {len(posts)} post(s) to 'university_updates'")
+        return list(posts)
     except Exception as e:
         print(f"❌ Database Error: {e}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,146 @@
+-- Schema for the tables db/db.py creates on startup. Safe to run repeatedly.
+
+-- Workers starting together run this one at a time (the whole script is one transaction).
+SELECT pg_advisory_xact_lock(hashtextextended('lumina_init_db', 0));
+
+-- One current row per normalized URL (see db/operations.canonical_url); upserts replace it in place.
+CREATE TABLE IF NOT EXISTS university (
+    id SERIAL PRIMARY KEY,
+    uni_name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    time_stamp TIMESTAMPTZ DEFAULT NOW(),
+    facts JSONB  -- typed facts extracted from the summary (utils/facts.py), NULL when not extracted
+);
+
+-- Every summary a URL had before its current one. Append-only and ordered by time,
+-- so a BRIN index keeps time-range scans cheap at a fraction of a btree's size.
+CREATE TABLE IF NOT EXISTS university_history (
+    id BIGSERIAL PRIMARY KEY,
+    uni_name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    time_stamp TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    facts JSONB
+);
+
+ALTER TABLE university ADD COLUMN IF NOT EXISTS facts JSONB;
+ALTER TABLE university_history ADD COLUMN IF NOT EXISTS facts JSONB;
+
+CREATE INDEX IF NOT EXISTS university_history_archived_brin ON university_history USING BRIN (archived_at);
+CREATE INDEX IF NOT EXISTS university_history_url_idx ON university_history (url);
+
+-- Archive the row an upsert is about to replace.
+CREATE OR REPLACE FUNCTION university_archive() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO university_history (uni_name, url, summary, time_stamp, facts)
+    VALUES (OLD.uni_name, OLD.url, OLD.summary, OLD.time_stamp, OLD.facts);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tell other workers' caches (db/university_cache.py, UNIVERSITY_CACHE_NOTIFY=1) which URL's row changed.
+CREATE OR REPLACE FUNCTION university_notify() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('university_changed', OLD.url);
+    END IF;
+    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.url <> OLD.url) THEN
+        PERFORM pg_notify('university_changed', NEW.url);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Migration from the append-only table: add the missing scheme to URLs, keep the newest row per URL,
+-- move the rest to university_history, then enforce uniqueness. The full canonical form
+-- (utils/normalize_urls.py) is applied to stored rows by `python -m db.db canonicalize-urls`.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'university_url_key') THEN
+        LOCK TABLE university IN EXCLUSIVE MODE;
+
+        -- Rewriting URLs is not an upsert: nothing may be archived or announced. (Only databases set up by an
+        -- older version of this script can have the triggers before the migration has run.)
+        IF EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = 'university'::regclass AND NOT tgisinternal) THEN
+            ALTER TABLE university DISABLE TRIGGER USER;
+        END IF;
+
+        UPDATE university SET url = 'https://' || btrim(url)
+        WHERE btrim(url) !~* '^[a-z][a-z0-9+.-]*://';
+        UPDATE university SET url = btrim(url) WHERE url <> btrim(url);
+
+        CREATE TEMP TABLE university_superseded ON COMMIT DROP AS
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY url ORDER BY time_stamp DESC NULLS LAST, id DESC) AS rn
+            FROM university
+        ) ranked
+        WHERE rn > 1;
+
+        INSERT INTO university_history (uni_name, url, summary, time_stamp, facts)
+        SELECT uni_name, url, summary, time_stamp, facts FROM university
+        WHERE id IN (SELECT id FROM university_superseded)
+        ORDER BY time_stamp;
+
+        DELETE FROM university WHERE id IN (SELECT id FROM university_superseded);
+
+        DROP INDEX IF EXISTS university_url_time_idx;
+        CREATE UNIQUE INDEX IF NOT EXISTS university_url_key ON university (url);
+
+        ALTER TABLE university ENABLE TRIGGER USER;
+    END IF;
+END $$;
+
+-- Created once, after the migration. Dropping and recreating them on every startup would take an
+-- ACCESS EXCLUSIVE lock on university each time.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'university_archive_trigger'
+                   AND tgrelid = 'university'::regclass) THEN
+        CREATE TRIGGER university_archive_trigger
+            BEFORE UPDATE ON university
+            FOR EACH ROW EXECUTE FUNCTION university_archive();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'university_notify_trigger'
+                   AND tgrelid = 'university'::regclass) THEN
+        CREATE TRIGGER university_notify_trigger
+            AFTER INSERT OR UPDATE OR DELETE ON university
+            FOR EACH ROW EXECUTE FUNCTION university_notify();
+    END IF;
+END $$;
+
+-- Other URLs for the same page (typically ones that redirect) -> the canonical URL its data is stored under.
+-- A row whose alias equals its canonical records that the URL was checked and doesn't redirect.
+CREATE TABLE IF NOT EXISTS url_aliases (
+    alias TEXT PRIMARY KEY,
+    canonical TEXT NOT NULL,
+    resolved_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- URLs users asked about, so the refresh scheduler (workers/refresh_scheduler.py) knows what to keep warm.
+CREATE TABLE IF NOT EXISTS tracked_urls (
+    url TEXT PRIMARY KEY,
+    uni_name TEXT NOT NULL,
+    last_requested_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- One row per successful scrape; the content hash history drives the adaptive freshness TTL (utils/freshness.py).
+CREATE TABLE IF NOT EXISTS scrape_history (
+    id BIGSERIAL PRIMARY KEY,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    scraped_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS scrape_history_url_idx ON scrape_history (url, scraped_at DESC);
+CREATE INDEX IF NOT EXISTS scrape_history_domain_idx ON scrape_history (domain, scraped_at);
+
+CREATE TABLE IF NOT EXISTS state_blobs (
+    hash TEXT PRIMARY KEY,
+    data BYTEA NOT NULL,
+    raw_size INTEGER NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    last_used_at TIMESTAMPTZ DEFAULT NOW()
+);
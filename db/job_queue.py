@@ -0,0 +1,259 @@
+import json
+import random
+from typing import List, Optional
+
+from psycopg.rows import dict_row, tuple_row
+
+from db.pool import get_async_pool
+from utils.metrics import count_retry
+from utils.resources import env
+
+# Job kinds
+RUN = "run"        # start a thread from an initial query
+RESUME = "resume"  # apply a human decision (update_state as_node) and continue the thread
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+INTERRUPTED = "interrupted"  # released at human_review / human_assistance, waiting for a resume job
+DONE = "done"
+
+CREATE_QUEUE_TABLES_QUERY = """
+CREATE TABLE IF NOT EXISTS graph_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    last_error TEXT,
+    result JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Claim scans only touch runnable rows.
+CREATE INDEX IF NOT EXISTS graph_jobs_claim_idx ON graph_jobs (run_after) WHERE status IN ('queued', 'running');
+
+-- At most one active job per thread, so two workers never drive the same checkpoint.
+CREATE UNIQUE INDEX IF NOT EXISTS graph_jobs_active_thread_idx ON graph_jobs (thread_id)
+    WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS graph_jobs_interrupted_idx ON graph_jobs ((result->>'next'))
+    WHERE status = 'interrupted';
+
+CREATE TABLE IF NOT EXISTS graph_jobs_dead (
+    LIKE graph_jobs INCLUDING DEFAULTS,
+    dead_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+ENQUEUE_QUERY = """
+INSERT INTO graph_jobs (job_id, thread_id, kind, payload, max_attempts)
+VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (thread_id) WHERE status IN ('queued', 'running') DO NOTHING
+RETURNING id;
+"""
+
+# A resume closes the thread's interrupted row only when its job was actually queued. If the thread already has
+# an active job the insert does nothing, and the interrupted row is kept for the decision to be sent again.
+ENQUEUE_RESUME_QUERY = """
+WITH enqueued AS (
+    INSERT INTO graph_jobs (job_id, thread_id, kind, payload, max_attempts)
+    VALUES (%(job_id)s, %(thread_id)s, 'resume', %(payload)s, %(max_attempts)s)
+    ON CONFLICT (thread_id) WHERE status IN ('queued', 'running') DO NOTHING
+    RETURNING id
+), closed AS (
+    UPDATE graph_jobs SET status = 'done', updated_at = NOW()
+    WHERE thread_id = %(thread_id)s AND status = 'interrupted' AND EXISTS (SELECT 1 FROM enqueued)
+)
+SELECT id FROM enqueued;
+"""
+
+# Runnable = queued and due, or running with an expired lease (its worker died).
+# An expired job that already used its last attempt is dead-lettered instead of being run again.
+CLAIM_QUERY = """
+WITH expired AS (
+    DELETE FROM graph_jobs WHERE id IN (
+        SELECT id FROM graph_jobs
+        WHERE status = 'running' AND lease_expires_at < NOW() AND attempts >= max_attempts
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+), dead AS (
+    INSERT INTO graph_jobs_dead
+    SELECT expired.*, NOW() FROM expired
+)
+UPDATE graph_jobs
+SET status = 'running',
+    locked_by = %(worker_id)s,
+    lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s),
+    attempts = attempts + 1,
+    updated_at = NOW()
+WHERE id = (
+    SELECT id FROM graph_jobs
+    WHERE (status = 'queued' AND run_after <= NOW())
+       OR (status = 'running' AND lease_expires_at < NOW() AND attempts < max_attempts)
+    ORDER BY run_after
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, job_id, thread_id, kind, payload, attempts, max_attempts;
+"""
+
+HEARTBEAT_QUERY = """
+UPDATE graph_jobs
+SET lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+WHERE id = %s AND locked_by = %s AND status = 'running';
+"""
+
+FINISH_QUERY = """
+UPDATE graph_jobs
+SET status = %s, result = %s, locked_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+WHERE id = %s AND locked_by = %s;
+"""
+
+RETRY_QUERY = """
+UPDATE graph_jobs
+SET status = 'queued',
+    run_after = NOW() + make_interval(secs => %s),
+    last_error = %s,
+    locked_by = NULL,
+    lease_expires_at = NULL,
+    updated_at = NOW()
+WHERE id = %s AND locked_by = %s;
+"""
+
+DEAD_LETTER_QUERY = """
+WITH moved AS (
+    DELETE FROM graph_jobs WHERE id = %s AND locked_by = %s RETURNING *
+)
+INSERT INTO graph_jobs_dead
+SELECT moved.*, NOW() FROM moved;
+"""
+
+LIST_INTERRUPTED_QUERY = """
+SELECT job_id, thread_id, result->>'next' AS next_node, updated_at
+FROM graph_jobs
+WHERE status = 'interrupted' AND (%s::TEXT IS NULL OR result->>'next' = %s)
+ORDER BY updated_at;
+"""
+
+# The job that started a thread. Resumes carry over its fan-out settings (num_posts, interrupt_before).
+RUN_PAYLOAD_QUERY = """
+SELECT payload FROM graph_jobs WHERE thread_id = %s AND kind = 'run' ORDER BY id LIMIT 1;
+"""
+
+STATS_QUERY = """
+SELECT status, COUNT(*) FROM graph_jobs GROUP BY status
+UNION ALL
+SELECT 'dead', COUNT(*) FROM graph_jobs_dead;
+"""
+
+
+def _database_url() -> str:
+    return env("DATABASE_URL")
+
+
+def backoff_seconds(attempts: int, base: float = 5.0, cap: float = 600.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** (attempts - 1))))
+
+
+async def acreate_queue_tables():
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        await conn.execute(CREATE_QUEUE_TABLES_QUERY)
+
+
+async def aenqueue(job_id: str, thread_id: str, kind: str = RUN, payload: dict = None,
+                   max_attempts: int = 5) -> Optional[int]:
+    """
+    Adds a job for a thread. Returns the row id, or None if the thread already has an active job.
+    """
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            if kind == RESUME:
+                await cur.execute(ENQUEUE_RESUME_QUERY, {"job_id": job_id, "thread_id": thread_id,
+                                                         "payload": json.dumps(payload or {}),
+                                                         "max_attempts": max_attempts})
+            else:
+                await cur.execute(ENQUEUE_QUERY, (job_id, thread_id, kind, json.dumps(payload or {}), max_attempts))
+            row = await cur.fetchone()
+    return row[0] if row else None
+
+
+async def aclaim(worker_id: str, lease_seconds: int) -> Optional[dict]:
+    """
+    Claims one runnable job with FOR UPDATE SKIP LOCKED. Returns None when the queue is empty.
+    Expired leases on their last attempt are dead-lettered on the way.
+    """
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(CLAIM_QUERY, {"worker_id": worker_id, "lease_seconds": lease_seconds})
+            return await cur.fetchone()
+
+
+async def aheartbeat(job_row_id: int, worker_id: str, lease_seconds: int) -> bool:
+    """Extends the lease. False means the lease was lost (another worker reclaimed the job)."""
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(HEARTBEAT_QUERY, (lease_seconds, job_row_id, worker_id))
+            return cur.rowcount == 1
+
+
+async def afinish(job_row_id: int, worker_id: str, status: str, result: dict = None):
+    """Releases a job as DONE or INTERRUPTED."""
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        await conn.execute(FINISH_QUERY, (status, json.dumps(result or {}), job_row_id, worker_id))
+
+
+async def afail(job: dict, worker_id: str, error: str):
+    """Schedules a retry with backoff, or moves the job to graph_jobs_dead after max_attempts."""
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        if job["attempts"] >= job["max_attempts"]:
+            await conn.execute(DEAD_LETTER_QUERY, (job["id"], worker_id))
+            print(f"☠️ Job {job['id']} ({job['thread_id']}) dead-lettered after {job['attempts']} attempts: "
+                  f"{error}")
+        else:
+            delay = backoff_seconds(job["attempts"])
+            count_retry("job")
+            await conn.execute(RETRY_QUERY, (delay, error, job["id"], worker_id))
+            print(f"🔁 Job {job['id']} ({job['thread_id']}) retrying in {delay:.0f}s: {error}")
+
+
+async def alist_interrupted(next_node: str = None) -> List[dict]:
+    """Threads released at an interrupt, e.g. alist_interrupted('human_review')."""
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(LIST_INTERRUPTED_QUERY, (next_node, next_node))
+            return await cur.fetchall()
+
+
+async def arun_payload(thread_id: str) -> dict:
+    """Payload of the RUN job that started `thread_id`, or {} when there is none."""
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(RUN_PAYLOAD_QUERY, (thread_id,))
+            row = await cur.fetchone()
+    return (row[0] or {}) if row else {}
+
+
+async def aqueue_stats() -> dict:
+    pool = await get_async_pool(_database_url())
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(STATS_QUERY)
+            return dict(await cur.fetchall())
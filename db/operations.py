@@ -1,23 +1,283 @@
 import psycopg
 from psycopg.rows import tuple_row
+from psycopg.types.json import Jsonb
 
+from db import university_cache
+from db.pool import get_async_pool
+from utils.metrics import atimed, timed
+from utils.normalize_urls import normalize_url, url_key
 
-def insert_university(database_url: str, uni_name: str, url: str, summary:str,  time_stamp=None):
-    """
-    Inserts a row into university table.
-    time_stamp can be None → defaults to NOW().
+# One current row per URL; the row it replaces is archived to university_history by a trigger (db/init_db.sql).
+# Only a newer summary replaces the current one, so a redelivered write (same time_stamp) is a no-op;
+# then no id is returned.
+INSERT_UNIVERSITY_QUERY = """
+INSERT INTO university (uni_name, url, summary, time_stamp, facts)
+VALUES (%s, %s, %s, COALESCE(%s, NOW()), %s)
+ON CONFLICT (url) DO UPDATE
+SET uni_name = EXCLUDED.uni_name, summary = EXCLUDED.summary, time_stamp = EXCLUDED.time_stamp,
+    facts = EXCLUDED.facts
+WHERE university.time_stamp IS NULL OR university.time_stamp < EXCLUDED.time_stamp
+RETURNING id;
+"""
+
+TRACK_URL_QUERY = """
+INSERT INTO tracked_urls (url, uni_name, last_requested_at)
+VALUES (%s, %s, NOW())
+ON CONFLICT (url) DO UPDATE SET uni_name = EXCLUDED.uni_name, last_requested_at = NOW();
+"""
+
+# Tracked URLs whose newest summary is missing or older than `due_after`, stalest first.
+DUE_FOR_REFRESH_QUERY = """
+SELECT t.uni_name, t.url, u.time_stamp
+FROM tracked_urls t
+LEFT JOIN university u ON u.url = t.url
+WHERE t.last_requested_at > NOW() - %(track_for)s
+  AND (u.time_stamp IS NULL OR u.time_stamp < NOW() - %(due_after)s)
+ORDER BY u.time_stamp ASC NULLS FIRST
+LIMIT %(limit)s;
+"""
+
+# Returns the hash of the previous scrape of the same URL (NULL for the first one).
+RECORD_SCRAPE_QUERY = """
+WITH previous AS (
+    SELECT content_hash FROM scrape_history WHERE url = %(url)s ORDER BY scraped_at DESC LIMIT 1
+)
+INSERT INTO scrape_history (url, domain, content_hash)
+VALUES (%(url)s, %(domain)s, %(content_hash)s)
+RETURNING (SELECT content_hash FROM previous);
+"""
+
+# Per-URL scrape counts, content changes and observed span within the window, for the given domains.
+CHANGE_STATS_QUERY = """
+WITH ordered AS (
+    SELECT url, domain, scraped_at, content_hash,
+           LAG(content_hash) OVER (PARTITION BY url ORDER BY scraped_at) AS previous_hash
+    FROM scrape_history
+    WHERE domain = ANY(%(domains)s) AND scraped_at > NOW() - %(window)s
+)
+SELECT url, domain,
+       COUNT(*) AS scrapes,
+       COUNT(*) FILTER (WHERE previous_hash IS NOT NULL AND previous_hash <> content_hash) AS changes,
+       EXTRACT(EPOCH FROM MAX(scraped_at) - MIN(scraped_at)) AS span_seconds
+FROM ordered
+GROUP BY url, domain;
+"""
+
+SCRAPED_DOMAINS_QUERY = """
+SELECT DISTINCT domain FROM scrape_history WHERE scraped_at > NOW() - %s;
+"""
+
+URL_ALIAS_QUERY = """
+SELECT canonical FROM url_aliases WHERE alias = %s;
+"""
+
+INSERT_URL_ALIAS_QUERY = """
+INSERT INTO url_aliases (alias, canonical) VALUES (%s, %s)
+ON CONFLICT (alias) DO UPDATE SET canonical = EXCLUDED.canonical, resolved_at = NOW();
+"""
+
+LATEST_UNIVERSITY_QUERY = """
+SELECT summary, time_stamp, facts FROM university WHERE url = %s;
+"""
+
+UNIVERSITY_FACTS_QUERY = """
+SELECT facts FROM university WHERE url = %s;
+"""
+
+
+# alias -> canonical, for aliases already looked up in this process.
+_alias_cache = {}
+ALIAS_CACHE_SIZE = 10000
+
+
+def canonical_url(url: str) -> str:
+    """The form URLs are stored and looked up in (see url_key); invalid URLs are kept as given."""
+    try:
+        return url_key(url)
+    except ValueError:
+        return url.strip()
+
+
+def fetchable_url(url: str) -> str:
+    """The canonical form of `url` that is fetched (see normalize_url); invalid URLs are kept as given."""
+    try:
+        return normalize_url(url)
+    except ValueError:
+        return url.strip()
+
+
+async def aresolve_url_alias(database_url: str, url: str, resolver=None) -> str:
     """
-    insert_query = """
-    INSERT INTO university (uni_name, url, summary, time_stamp)
-    VALUES (%s, %s, %s, COALESCE(%s, NOW()))
-    RETURNING id;
+    fetchable_url(url), followed through the url_aliases table (keyed by canonical_url).
+    With `resolver` (async url -> final fetchable url, e.g. utils.scrape.aresolve_redirects), a URL
+    missing from the table is resolved once and the result remembered for every process.
     """
+    key = canonical_url(url)
+    url = fetchable_url(url)
+    cached = _alias_cache.get(key)
+    if cached is not None:
+        return cached
+
+    pool = await get_async_pool(database_url)
+    async with atimed("db", "url_alias"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(URL_ALIAS_QUERY, (key,))
+            row = await cur.fetchone()
 
-    with psycopg.connect(database_url, row_factory=tuple_row) as conn:
+    if row is not None:
+        canonical = row[0]
+    elif resolver is not None:
+        try:
+            canonical = await resolver(url)
+        except ValueError:
+            return url
+        async with atimed("db", "insert_url_alias"), pool.connection() as conn:
+            await conn.execute(INSERT_URL_ALIAS_QUERY, (key, canonical))
+    else:
+        return url  # not cached, so a resolver added later still gets to check it
+
+    if len(_alias_cache) >= ALIAS_CACHE_SIZE:
+        _alias_cache.clear()
+    _alias_cache[key] = canonical
+    return canonical
+
+
+def _facts_param(facts):
+    return Jsonb(facts) if facts is not None else None
+
+
+def insert_university(database_url: str, uni_name: str, url: str, summary:str,  time_stamp=None, facts=None):
+    """
+    Upserts the university row for `url`.
+    time_stamp can be None → defaults to NOW(). facts is the summary's fact sheet (list of dicts) or None.
+    """
+    with timed("db", "insert_university"), psycopg.connect(database_url, row_factory=tuple_row) as conn:
         with conn.cursor() as cur:
-            cur.execute(insert_query, (uni_name, url, summary, time_stamp))
-            inserted_id = cur.fetchone()[0]
+            cur.execute(INSERT_UNIVERSITY_QUERY,
+                        (uni_name, canonical_url(url), summary, time_stamp, _facts_param(facts)))
+            row = cur.fetchone()
 
         conn.commit()
 
-    return inserted_id
+    university_cache.invalidate(url)
+    return row[0] if row else None
+
+
+async def ainsert_university(database_url: str, uni_name: str, url: str, summary: str, time_stamp=None,
+                             facts=None):
+    """
+    Async version of insert_university (an upsert). Borrows a connection from the shared AsyncConnectionPool
+    instead of opening a new connection per insert.
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "insert_university"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(INSERT_UNIVERSITY_QUERY,
+                              (uni_name, canonical_url(url), summary, time_stamp, _facts_param(facts)))
+            row = await cur.fetchone()
+
+    university_cache.invalidate(url)
+    return row[0] if row else None
+
+
+async def aupsert_universities(database_url: str, rows):
+    """
+    Upserts many university rows (dicts with uni_name, url, summary, time_stamp and optionally facts)
+    in one transaction.
+    Used by the write-behind flusher (db/write_behind.py).
+    """
+    pool = await get_async_pool(database_url)
+
+    params = [(r["uni_name"], canonical_url(r["url"]), r["summary"], r["time_stamp"], _facts_param(r.get("facts")))
+              for r in rows]
+    async with atimed("db", "upsert_universities"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.executemany(INSERT_UNIVERSITY_QUERY, params)
+
+    for r in rows:
+        university_cache.invalidate(r["url"])
+
+
+async def afetch_latest_university(database_url: str, url: str):
+    """
+    Returns (summary, time_stamp, facts) of the current row for `url`, or None.
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "fetch_latest_university"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(LATEST_UNIVERSITY_QUERY, (canonical_url(url),))
+            return await cur.fetchone()
+
+
+async def afetch_university_facts(database_url: str, url: str):
+    """
+    Returns the fact sheet (list of dicts) stored with the current row for `url`, or None.
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "fetch_university_facts"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(UNIVERSITY_FACTS_QUERY, (canonical_url(url),))
+            row = await cur.fetchone()
+    return row[0] if row else None
+
+
+async def atrack_url(database_url: str, uni_name: str, url: str):
+    """
+    Marks `url` as requested just now, which keeps it on the refresh scheduler's list.
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "track_url"), pool.connection() as conn:
+        await conn.execute(TRACK_URL_QUERY, (canonical_url(url), uni_name))
+
+
+async def alist_due_for_refresh(database_url: str, due_after, track_for, limit: int):
+    """
+    Returns [(uni_name, url, time_stamp)] for tracked URLs (requested within `track_for`)
+    whose newest summary is older than `due_after` (timedeltas), stalest first.
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "list_due_for_refresh"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(DUE_FOR_REFRESH_QUERY, {"due_after": due_after, "track_for": track_for, "limit": limit})
+            return await cur.fetchall()
+
+
+async def arecord_scrape(database_url: str, url: str, domain: str, content_hash: str):
+    """
+    Appends a scrape to scrape_history. Returns the previous scrape's content hash for `url`, or None.
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "record_scrape"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(RECORD_SCRAPE_QUERY, {"url": url, "domain": domain, "content_hash": content_hash})
+            return (await cur.fetchone())[0]
+
+
+async def afetch_change_stats(database_url: str, domains, window):
+    """
+    Returns [(url, domain, scrapes, changes, span_seconds)] over the last `window` (timedelta).
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "fetch_change_stats"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(CHANGE_STATS_QUERY, {"domains": list(domains), "window": window})
+            return await cur.fetchall()
+
+
+async def alist_scraped_domains(database_url: str, window):
+    """
+    Returns the domains scraped within the last `window` (timedelta).
+    """
+    pool = await get_async_pool(database_url)
+
+    async with atimed("db", "list_scraped_domains"), pool.connection() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            await cur.execute(SCRAPED_DOMAINS_QUERY, (window,))
+            return [row[0] for row in await cur.fetchall()]
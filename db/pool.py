@@ -0,0 +1,36 @@
+import asyncio
+import weakref
+
+from psycopg_pool import AsyncConnectionPool
+
+# One pool per (event loop, database url). Async connections cannot be shared across loops.
+_pools = weakref.WeakKeyDictionary()
+_locks = weakref.WeakKeyDictionary()
+
+
+async def get_async_pool(database_url: str, max_size: int = 20, name: str = "default",
+                         **connection_kwargs) -> AsyncConnectionPool:
+    """
+    Returns an opened AsyncConnectionPool for the current event loop.
+    The pool is created on first use and reused by every later call on the same loop.
+    A different `name` gets a separate pool (e.g. autocommit connections for advisory locks).
+    """
+    loop = asyncio.get_running_loop()
+    loop_pools = _pools.setdefault(loop, {})
+    pool_key = (database_url, name)
+
+    pool = loop_pools.get(pool_key)
+    if pool is not None:
+        return pool
+
+    lock = _locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        pool = loop_pools.get(pool_key)
+        if pool is None:
+            pool = AsyncConnectionPool(
+                conninfo=database_url, max_size=max_size, open=False, kwargs=connection_kwargs or None
+            )
+            await pool.open()
+            loop_pools[pool_key] = pool
+
+    return pool
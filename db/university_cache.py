@@ -0,0 +1,185 @@
+"""
+In-process cache of university rows (UNIVERSITY_CACHE=1), in front of check_db_node's lookups.
+
+Maps a canonical URL to its stored (time_stamp, summary, facts), or to None when the URL has no row. Entries live
+UNIVERSITY_CACHE_TTL_SECONDS (capped well below the freshness threshold, so a cached row can't keep a URL
+"fresh" for long after another writer replaced it) and the least recently used ones are evicted beyond
+UNIVERSITY_CACHE_SIZE. Freshness itself is decided on every read from the cached time_stamp.
+
+Writes through db/operations drop the URL's entry. With UNIVERSITY_CACHE_NOTIFY=1 a background thread also
+LISTENs on the channel the university trigger NOTIFYs (db/init_db.sql), so upserts by other workers invalidate
+it too. Hits, misses and invalidations are counted in lumina_university_cache_total; stats() has the hit rate.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import psycopg
+
+from routes.db_route import FRESHNESS_THRESHOLD
+from utils.metrics import metrics
+from utils.normalize_urls import url_key
+from utils.resources import env
+
+NOTIFY_CHANNEL = "university_changed"
+MAX_RECONNECT_SECONDS = 60
+
+_entries = OrderedDict()  # url -> (expires_at, row)
+_generations = {}  # url -> invalidation count, so a lookup that raced a write isn't cached
+_epoch = 0  # bumped whenever _generations starts over
+_stats = {"hit": 0, "miss": 0, "invalidated": 0}
+_lock = threading.Lock()
+_listener: Optional[threading.Thread] = None
+
+
+def enabled() -> bool:
+    return env("UNIVERSITY_CACHE", "0") == "1"
+
+
+def notify_enabled() -> bool:
+    return env("UNIVERSITY_CACHE_NOTIFY", "0") == "1"
+
+
+def max_size() -> int:
+    return int(env("UNIVERSITY_CACHE_SIZE", 10000))
+
+
+def ttl_seconds() -> float:
+    return min(float(env("UNIVERSITY_CACHE_TTL_SECONDS", 300)), FRESHNESS_THRESHOLD.total_seconds() / 4)
+
+
+def _key(url: str) -> str:
+    try:
+        return url_key(url)
+    except ValueError:
+        return url.strip()
+
+
+def _count(outcome: str, value: int = 1):
+    with _lock:
+        _stats[outcome] += value
+    metrics.inc("lumina_university_cache_total", value, outcome=outcome)
+
+
+def _get(key: str):
+    """(True, row) for a live entry, else (False, None)."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= now:
+            del _entries[key]
+            return False, None
+        _entries.move_to_end(key)
+        return True, entry[1]
+
+
+def _token(key: str) -> tuple:
+    return _epoch, _generations.get(key, 0)
+
+
+def _put(key: str, row, token: tuple):
+    with _lock:
+        if _token(key) != token:
+            return  # written while the lookup ran; the row may already be outdated
+        _entries[key] = (time.monotonic() + ttl_seconds(), row)
+        _entries.move_to_end(key)
+        while len(_entries) > max_size():
+            _entries.popitem(last=False)
+
+
+async def aget(url: str, load: Callable[[], Awaitable[Optional[tuple]]]) -> Optional[tuple]:
+    """
+    The cached (time_stamp, summary, facts) for `url`, or None for a URL without a row.
+    On a miss `load()` fetches it from the database and the result is cached.
+    """
+    if not enabled():
+        return await load()
+    _ensure_listener()
+
+    key = _key(url)
+    found, row = _get(key)
+    if found:
+        _count("hit")
+        return row
+
+    _count("miss")
+    with _lock:
+        token = _token(key)
+    row = await load()
+    _put(key, row, token)
+    return row
+
+
+def invalidate(url: str):
+    """Drops `url`'s entry. Called after every write to its university row."""
+    global _epoch
+    key = _key(url)
+    with _lock:
+        _generations[key] = _generations.get(key, 0) + 1
+        if len(_generations) > 2 * max_size():
+            # Only lookups in flight right now need their generation; starting over just skips caching those.
+            _generations.clear()
+            _epoch += 1
+        dropped = _entries.pop(key, None) is not None
+    if dropped:
+        _count("invalidated")
+
+
+def clear():
+    global _epoch
+    with _lock:
+        dropped = len(_entries)
+        _entries.clear()
+        _generations.clear()
+        _epoch += 1
+    if dropped:
+        _count("invalidated", dropped)
+
+
+def stats() -> dict:
+    with _lock:
+        hits, misses, invalidated = _stats["hit"], _stats["miss"], _stats["invalidated"]
+        size = len(_entries)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "invalidated": invalidated,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "size": size,
+    }
+
+
+# --- CROSS-WORKER INVALIDATION ---
+def _listen_forever(database_url: str):
+    attempts = 0
+    while True:
+        try:
+            with psycopg.connect(database_url, autocommit=True) as conn:
+                conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Writes made while no connection was listening were missed.
+                clear()
+                attempts = 0
+                for notification in conn.notifies():
+                    invalidate(notification.payload)
+        except Exception as e:
+            attempts += 1
+            delay = min(2 ** attempts, MAX_RECONNECT_SECONDS)
+            print(f"⚠️ University cache: LISTEN {NOTIFY_CHANNEL} failed ({e}); reconnecting in {delay}s.")
+            time.sleep(delay)
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is not None or not notify_enabled():
+        return
+    with _lock:
+        if _listener is not None:
+            return
+        _listener = threading.Thread(
+            target=_listen_forever, args=(env("DATABASE_URL"),), name="university-cache-listener", daemon=True
+        )
+    _listener.start()
@@ -0,0 +1,351 @@
+"""
+Write-behind persistence (WRITE_BEHIND=1) for writes nothing downstream reads right away:
+summary upserts into `university` and approved posts going to Firestore.
+
+enqueue() appends the write to a local on-disk journal and returns. A background flusher batches the
+pending writes per kind, delivers them, and appends an ack. Failed batches are retried with exponential
+backoff, and journals left behind by a process that died are adopted by the next one to start, so
+delivery is at least once. Every write carries an idempotency key that makes redelivery harmless:
+university upserts only replace an older row, and posts are stored under a document id derived from the key.
+
+A batch that keeps failing (SPLIT_AFTER_ATTEMPTS) is delivered one write at a time, so one bad write can't hold
+back the rest. A write that fails on its own WRITE_BEHIND_MAX_ATTEMPTS times is moved to the dead-letter file;
+`requeue-dead` puts dead letters back into a journal once the cause is fixed. At exit the pending writes are
+delivered on the exiting thread for up to EXIT_FLUSH_SECONDS.
+
+Usage:
+    python -m db.write_behind status
+    python -m db.write_behind flush
+    python -m db.write_behind requeue-dead
+"""
+import argparse
+import asyncio
+import atexit
+import fcntl
+import glob
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from db.firebase_db import asave_posts_to_firestore, post_doc_id
+from db.operations import aupsert_universities, canonical_url
+from utils.metrics import count_retry, metrics
+from utils.resources import env
+
+# Write kinds
+UNIVERSITY = "university"
+POST = "post"
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 300
+EXIT_FLUSH_SECONDS = 5
+SPLIT_AFTER_ATTEMPTS = 3
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+
+def enabled() -> bool:
+    return env("WRITE_BEHIND", "0") == "1"
+
+
+def _journal_dir() -> str:
+    return env("WRITE_BEHIND_DIR", ".write_behind")
+
+
+def max_attempts() -> int:
+    return int(env("WRITE_BEHIND_MAX_ATTEMPTS", 8))
+
+
+# --- DELIVERY ---
+async def _adeliver_universities(payloads: List[dict]):
+    rows = [dict(p, time_stamp=datetime.fromisoformat(p["time_stamp"])) for p in payloads]
+    await aupsert_universities(env("DATABASE_URL"), rows)
+
+
+async def _adeliver_posts(payloads: List[dict]):
+    await asave_posts_to_firestore({p["doc_id"]: p["post"] for p in payloads})
+
+
+# kind -> async fn(list of payloads). Each call is one batch; raising leaves the whole batch pending.
+HANDLERS = {
+    UNIVERSITY: _adeliver_universities,
+    POST: _adeliver_posts,
+}
+
+
+# --- JOURNAL ---
+class _Journal:
+    """
+    Append-only JSON lines: {"t": "put", "key", "kind", "payload"} and {"t": "ack", "key"}.
+    The file is flock'ed for as long as its process lives; an unlocked journal belongs to nobody.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a+", encoding="utf-8")
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)  # BlockingIOError if another process owns it
+        self.pending: Dict[str, tuple] = {}  # key -> (kind, payload), in enqueue order
+        self.file.seek(0)
+        for line in self.file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash mid-write
+            if record["t"] == "put":
+                self.pending[record["key"]] = (record["kind"], record["payload"])
+            else:
+                self.pending.pop(record["key"], None)
+
+    def _append(self, records: List[dict]):
+        self.file.write("".join(json.dumps(r) + "\n" for r in records))
+        self.file.flush()
+        if env("WRITE_BEHIND_FSYNC", "1") == "1":
+            os.fsync(self.file.fileno())
+
+    def put(self, key: str, kind: str, payload: dict):
+        self._append([{"t": "put", "key": key, "kind": kind, "payload": payload}])
+        self.pending[key] = (kind, payload)
+
+    def ack(self, keys: List[str]):
+        for key in keys:
+            self.pending.pop(key, None)
+        if self.pending:
+            self._append([{"t": "ack", "key": key} for key in keys])
+        else:
+            # Everything delivered: start the journal over instead of letting it grow.
+            self.file.truncate(0)
+
+    def close(self, remove: bool = False):
+        if remove:
+            os.remove(self.path)
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+# --- FLUSHER ---
+class WriteBehind:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()  # one delivery round at a time (flusher thread or exit flush)
+        self._journal: Optional[_Journal] = None
+        self._backoff = {}  # kind -> (attempts, retry_at)
+        self._failures = {}  # key -> failed attempts on its own
+
+    def _start(self):
+        directory = _journal_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"journal-{socket.gethostname()}-{os.getpid()}.jsonl")
+        self._journal = _Journal(path)
+        self._adopt_orphans(directory)
+
+        threading.Thread(target=self._run, name="write-behind", daemon=True).start()
+        atexit.register(self.flush, EXIT_FLUSH_SECONDS)
+
+    def _adopt_orphans(self, directory: str):
+        for path in glob.glob(os.path.join(directory, "journal-*.jsonl")):
+            if path == self._journal.path:
+                continue
+            try:
+                orphan = _Journal(path)
+            except (BlockingIOError, OSError):
+                continue  # its process is still alive
+            for key, (kind, payload) in orphan.pending.items():
+                self._journal.put(key, kind, payload)
+            if orphan.pending:
+                print(f"📒 Write-behind: adopted {len(orphan.pending)} pending write(s) "
+                      f"from {os.path.basename(path)}.")
+            orphan.close(remove=True)
+
+    def enqueue(self, kind: str, key: str, payload: dict) -> str:
+        """Journals one write for delivery and returns its idempotency key."""
+        with self._lock:
+            if self._journal is None:
+                self._start()
+            self._journal.put(key, kind, payload)
+        metrics.inc("lumina_write_behind_total", kind=kind, outcome="queued")
+        self._wake.set()
+        return key
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._journal.pending) if self._journal else 0
+
+    def _run(self):
+        # Waits on the event directly: the default executor is already shut down while atexit handlers run.
+        loop = asyncio.new_event_loop()
+        while True:
+            self._wake.wait(FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            try:
+                with self._flush_lock:
+                    loop.run_until_complete(self.aflush_once())
+            except Exception as e:
+                print(f"⚠️ Write-behind: flush failed ({e}).")
+
+    def _dead_letter(self, key: str, kind: str, payload: dict, error: Exception):
+        path = os.path.join(_journal_dir(), DEAD_LETTER_FILE)
+        record = {"t": "put", "key": key, "kind": kind, "payload": payload, "error": str(error), "dead_at": time.time()}
+        with open(path, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._failures.pop(key, None)
+        metrics.inc("lumina_write_behind_total", kind=kind, outcome="dead_lettered")
+        print(f"☠️ Write-behind: {key} failed {max_attempts()} times on its own ({error}); moved to {path}.")
+
+    async def _adeliver_one_by_one(self, kind: str, batch: List[tuple]):
+        """Delivers each write alone. Returns (keys done with: delivered or dead-lettered, last error or None)."""
+        done, last_error = [], None
+        for key, payload in batch:
+            try:
+                await HANDLERS[kind]([payload])
+            except Exception as e:
+                last_error = e
+                self._failures[key] = self._failures.get(key, 0) + 1
+                if self._failures[key] >= max_attempts():
+                    self._dead_letter(key, kind, payload, e)
+                    done.append(key)
+                continue
+            self._failures.pop(key, None)
+            metrics.inc("lumina_write_behind_total", kind=kind, outcome="delivered")
+            done.append(key)
+        return done, last_error
+
+    async def aflush_once(self) -> int:
+        """Delivers one batch per kind that isn't backing off. Returns how many writes were delivered."""
+        with self._lock:
+            batches = {}
+            for key, (kind, payload) in (self._journal.pending.items() if self._journal else []):
+                batch = batches.setdefault(kind, [])
+                if len(batch) < BATCH_SIZE:
+                    batch.append((key, payload))
+
+        delivered = 0
+        now = time.monotonic()
+        for kind, batch in batches.items():
+            attempts, retry_at = self._backoff.get(kind, (0, 0.0))
+            if now < retry_at:
+                continue
+            error = None
+            if attempts >= SPLIT_AFTER_ATTEMPTS:
+                # The same batch keeps failing; find out which writes are bad instead of retrying it whole.
+                done, error = await self._adeliver_one_by_one(kind, batch)
+            else:
+                try:
+                    await HANDLERS[kind]([payload for _, payload in batch])
+                    done = [key for key, _ in batch]
+                    metrics.inc("lumina_write_behind_total", len(batch), kind=kind, outcome="delivered")
+                except Exception as e:
+                    done, error = [], e
+
+            if done:
+                with self._lock:
+                    self._journal.ack(done)
+                delivered += len(done)
+            if error is None:
+                self._backoff.pop(kind, None)
+                continue
+            attempts += 1
+            delay = min(2 ** attempts, MAX_BACKOFF_SECONDS)
+            self._backoff[kind] = (attempts, time.monotonic() + delay)
+            failed = len(batch) - len(done)
+            print(f"⚠️ Write-behind: {failed} {kind} write(s) failed ({error}); retrying in {delay}s.")
+            count_retry("write_behind")
+        return delivered
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Delivers pending writes on the calling thread for up to `timeout` seconds. Returns whether the journal
+        drained. Runs its own event loop, so it works from atexit and CLIs but not inside a running loop.
+        """
+        deadline = time.monotonic() + timeout
+        loop = asyncio.new_event_loop()
+        try:
+            while self.pending_count():
+                left = deadline - time.monotonic()
+                if left <= 0 or not self._flush_lock.acquire(timeout=left):
+                    print(f"⚠️ Write-behind: {self.pending_count()} write(s) still pending; they stay journaled.")
+                    return False
+                try:
+                    delivered = loop.run_until_complete(
+                        asyncio.wait_for(self.aflush_once(), max(deadline - time.monotonic(), 0.01))
+                    )
+                except asyncio.TimeoutError:
+                    delivered = 0
+                finally:
+                    self._flush_lock.release()
+                if not delivered:
+                    time.sleep(min(FLUSH_INTERVAL_SECONDS, max(deadline - time.monotonic(), 0)))
+            return True
+        finally:
+            loop.close()
+
+
+write_behind = WriteBehind()
+
+
+# --- WRITES ---
+def enqueue_university(uni_name: str, url: str, summary: str, time_stamp: datetime, facts=None) -> str:
+    """Queues a university upsert. The key is url + time_stamp, which the upsert treats idempotently."""
+    url = canonical_url(url)
+    key = f"{UNIVERSITY}:{url}:{time_stamp.isoformat()}"
+    payload = {"uni_name": uni_name, "url": url, "summary": summary, "time_stamp": time_stamp.isoformat(),
+               "facts": facts}
+    return write_behind.enqueue(UNIVERSITY, key, payload)
+
+
+def enqueue_post(post_data: dict, doc_id: Optional[str] = None) -> str:
+    """
+    Queues an approved post for Firestore under `doc_id` (default post_doc_id(post_data)).
+    Returns the document id it will be stored under.
+    """
+    doc_id = doc_id or post_doc_id(post_data)
+    write_behind.enqueue(POST, f"{POST}:{doc_id}", {"doc_id": doc_id, "post": post_data})
+    return doc_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write-behind journal.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Pending writes per journal.")
+    flush_parser = sub.add_parser("flush", help="Adopt unowned journals and deliver everything pending.")
+    flush_parser.add_argument("--timeout", type=float, default=60)
+    sub.add_parser("requeue-dead", help="Move dead-lettered writes back into a journal for the next process.")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for path in sorted(glob.glob(os.path.join(_journal_dir(), "journal-*.jsonl"))):
+            try:
+                journal = _Journal(path)
+            except (BlockingIOError, OSError):
+                print(f"{os.path.basename(path)}: owned by a running process")
+                continue
+            print(f"{os.path.basename(path)}: {len(journal.pending)} pending")
+            journal.close()
+        dead_path = os.path.join(_journal_dir(), DEAD_LETTER_FILE)
+        if os.path.exists(dead_path):
+            with open(dead_path, encoding="utf-8") as f:
+                print(f"{DEAD_LETTER_FILE}: {sum(1 for _ in f)} dead-lettered")
+    elif args.command == "requeue-dead":
+        dead_path = os.path.join(_journal_dir(), DEAD_LETTER_FILE)
+        if not os.path.exists(dead_path):
+            print("No dead-lettered writes.")
+            return
+        # An unlocked journal is adopted by the next process that starts (or by `flush`).
+        requeued = os.path.join(_journal_dir(), f"journal-requeued-{int(time.time())}.jsonl")
+        os.replace(dead_path, requeued)
+        print(f"Requeued dead-lettered writes as {os.path.basename(requeued)}.")
+    else:
+        with write_behind._lock:
+            write_behind._start()
+        raise SystemExit(0 if write_behind.flush(args.timeout) else 1)
+
+
+if __name__ == "__main__":
+    main()
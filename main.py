@@ -1,10 +1,153 @@
+import importlib
+import time
 import uuid
 import sys
 from langchain_core.messages import HumanMessage
-from Graph import agent
+from utils import cassette, deadline
+from utils.fanout import FANOUT_NODE, child_thread_ids, seed_post_threads
+from utils.metrics import print_run_summary
+from utils.resources import registry, print_startup_profile
+
+# Imported in this order by --profile-startup; Graph itself is imported lazily so the report sees real costs.
+STARTUP_MODULES = [
+    "state",
+    "tools.RAG_tool",
+    "nodes.chat",
+    "nodes.check_db_node",
+    "nodes.scrape_with_jina",
+    "nodes.summarization",
+    "nodes.generate_post",
+    "nodes.evaluate_post",
+    "nodes.save_post",
+    "Graph",
+]
+
+
+def drive_thread(agent, config, current_input, label, interrupt_before=None):
+    """
+    Runs one thread until it finishes or stops at a node we don't handle here,
+    resolving human interrupts from the terminal along the way.
+    Returns the last snapshot, or None if the run failed.
+    """
+    while True:
+        try:
+            # 1. Run the Graph until it stops (End or Interrupt)
+            # Passing 'None' as input resumes from the last state/checkpoint
+            cassette.note_run(config, current_input, interrupt_before)
+            # Each stretch between human inputs gets its own RUN_DEADLINE_SECONDS budget (utils/deadline.py).
+            run_config = deadline.with_deadline(config, deadline.after())
+            events = agent.stream(current_input, run_config, stream_mode="values", interrupt_before=interrupt_before)
+
+            for event in events:
+                # Optional: specific logging could go here
+                pass
+
+            # 2. Check the status of the graph
+            snapshot = agent.get_state(config)
+
+            # CASE A: Graph Finished (No next steps)
+            if not snapshot.next:
+                return snapshot
+
+            # CASE B: Graph Interrupted (Human in the Loop)
+            next_node = snapshot.next[0]
+
+            # --- INTERRUPT: HUMAN ASSISTANCE (Missing Info) ---
+            if next_node == "human_assistance":
+                # The Chat Node asked a question. Look at the last AI message.
+                last_msg = snapshot.values['messages'][-1]
+                print(f"\n🤖 AI Question: {last_msg.content}")
+
+                user_response = input("User (Provide URL/Info): ")
+
+                # Update state with the human answer to the chat history
+                # We 'pretend' this update effectively runs the human_assistance node
+                assistance_update = {"messages": [HumanMessage(content=user_response)]}
+                cassette.note_update(config, assistance_update, "human_assistance")
+                agent.update_state(
+                    config,
+                    assistance_update,
+                    as_node="human_assistance"
+                )
+
+                print("🔄 Info received. Resuming workflow...")
+                current_input = None  # Resume with existing state
+                continue
+
+                # --- INTERRUPT: HUMAN REVIEW (Approve/Reject Post) ---
+            elif next_node == "human_review":
+                current_values = snapshot.values
+                print(f"\n" + "=" * 50)
+                print(f"👀 REVIEW REQUIRED FOR {label}")
+                print(f"=" * 50)
+                print(f"TOPIC:   {current_values.get('topic')}")
+                print(f"HEADING: {current_values.get('post_heading')}")
+                print(f"-" * 20)
+                print(f"CONTENT:\n{current_values.get('post_content')}")
+                print(f"=" * 50)
+
+                user_decision = input(">> Approve this post? (yes/no/comment): ").strip()
+
+                if user_decision.lower() in ["yes", "y", "ok"]:
+                    # Approved: Set flag to True, Clear feedback
+                    update_data = {
+                        "approved": True,
+                        "human_feedback": None
+                    }
+                    print("✅ Post Approved.")
+                else:
+                    # Rejected: Set flag to False, Add feedback text
+                    # If user typed 'no', ask for specific feedback
+                    if user_decision.lower() in ["no", "n"]:
+                        feedback_text = input(">> Please provide specific feedback: ")
+                    else:
+                        # Assume the input itself was the feedback (e.g., "Make it shorter")
+                        feedback_text = user_decision
+
+                    update_data = {
+                        "approved": False,
+                        "human_feedback": feedback_text
+                    }
+                    print("🔄 Feedback Recorded. sending back to Generator...")
+
+                # Update state and pretend 'human_review' node just finished
+                cassette.note_update(config, update_data, "human_review")
+                agent.update_state(
+                    config,
+                    update_data,
+                    as_node="human_review"
+                )
+
+                current_input = None  # Resume with existing state
+                continue
+
+            # CASE C: Stopped at a caller-requested breakpoint (e.g. the fan-out point)
+            return snapshot
+
+        except KeyboardInterrupt:
+            print("\n⚠️ Operation cancelled by user.")
+            sys.exit()
+        except Exception as e:
+            print(f"❌ Error in main loop: {e}")
+            return None
+
+
+def run_post(agent, config, current_input, current_post_num):
+    thread_id = config["configurable"]["thread_id"]
+    print(f"\n📝 STARTING POST #{current_post_num} (ID: {thread_id})")
+
+    snapshot = drive_thread(agent, config, current_input, f"POST #{current_post_num}")
+
+    if snapshot is not None and not snapshot.next:
+        print(f"\n✅ Post #{current_post_num} Completed!")
+        print(f"📌 Final Heading: {snapshot.values.get('post_heading', 'N/A')}")
+
+    print_run_summary(thread_id)
 
 
 def run_interactive_session():
+    from Graph import get_agent, INTERRUPT_BEFORE
+
     print("\n🚀 AI SOCIAL MEDIA AGENT INITIALIZED")
 
     user_query = input("Enter Topic, University Name, or URL: ").strip()
@@ -16,115 +159,62 @@ def run_interactive_session():
 
     base_session_id = str(uuid.uuid4())
 
-    for i in range(num_posts):
-        current_post_num = i + 1
-        thread_id = f"{base_session_id}_post_{current_post_num}"
-        config = {"configurable": {"thread_id": thread_id}}
-
-        print(f"\n📝 STARTING POST #{current_post_num} (ID: {thread_id})")
-
-        # Initial payload for the new post
-        # We assume the user wants the same topic for all posts, or you can ask inside the loop
-        current_input = {"messages": [HumanMessage(content=user_query)]}
-
-        while True:
-            try:
-                # 1. Run the Graph until it stops (End or Interrupt)
-                # Passing 'None' as input resumes from the last state/checkpoint
-                events = agent.stream(current_input, config, stream_mode="values")
-
-                for event in events:
-                    # Optional: specific logging could go here
-                    pass
-
-                # 2. Check the status of the graph
-                snapshot = agent.get_state(config)
-
-                # CASE A: Graph Finished (No next steps)
-                if not snapshot.next:
-                    print(f"\n✅ Post #{current_post_num} Completed!")
-                    print(f"📌 Final Heading: {snapshot.values.get('post_heading', 'N/A')}")
-                    break
-
-                # CASE B: Graph Interrupted (Human in the Loop)
-                next_node = snapshot.next[0]
-
-                # --- INTERRUPT: HUMAN ASSISTANCE (Missing Info) ---
-                if next_node == "human_assistance":
-                    # The Chat Node asked a question. Look at the last AI message.
-                    last_msg = snapshot.values['messages'][-1]
-                    print(f"\n🤖 AI Question: {last_msg.content}")
-
-                    user_response = input("User (Provide URL/Info): ")
-
-                    # Update state with the human answer to the chat history
-                    # We 'pretend' this update effectively runs the human_assistance node
-                    agent.update_state(
-                        config,
-                        {"messages": [HumanMessage(content=user_response)]},
-                        as_node="human_assistance"
-                    )
-
-                    print("🔄 Info received. Resuming workflow...")
-                    current_input = None  # Resume with existing state
-                    continue
-
-                    # --- INTERRUPT: HUMAN REVIEW (Approve/Reject Post) ---
-                elif next_node == "human_review":
-                    current_values = snapshot.values
-                    print(f"\n" + "=" * 50)
-                    print(f"👀 REVIEW REQUIRED FOR POST #{current_post_num}")
-                    print(f"=" * 50)
-                    print(f"TOPIC:   {current_values.get('topic')}")
-                    print(f"HEADING: {current_values.get('post_heading')}")
-                    print(f"-" * 20)
-                    print(f"CONTENT:\n{current_values.get('post_content')}")
-                    print(f"=" * 50)
-
-                    user_decision = input(">> Approve this post? (yes/no/comment): ").strip()
-
-                    if user_decision.lower() in ["yes", "y", "ok"]:
-                        # Approved: Set flag to True, Clear feedback
-                        update_data = {
-                            "approved": True,
-                            "human_feedback": None
-                        }
-                        print("✅ Post Approved.")
-                    else:
-                        # Rejected: Set flag to False, Add feedback text
-                        # If user typed 'no', ask for specific feedback
-                        if user_decision.lower() in ["no", "n"]:
-                            feedback_text = input(">> Please provide specific feedback: ")
-                        else:
-                            # Assume the input itself was the feedback (e.g., "Make it shorter")
-                            feedback_text = user_decision
-
-                        update_data = {
-                            "approved": False,
-                            "human_feedback": feedback_text
-                        }
-                        print("🔄 Feedback Recorded. sending back to Generator...")
-
-                    # Update state and pretend 'human_review' node just finished
-                    agent.update_state(
-                        config,
-                        update_data,
-                        as_node="human_review"
-                    )
-
-                    current_input = None  # Resume with existing state
-                    continue
-
-            except KeyboardInterrupt:
-                print("\n⚠️ Operation cancelled by user.")
-                sys.exit()
-            except Exception as e:
-                print(f"❌ Error in main loop: {e}")
-                # Important: Break the inner while loop to move to the next post or exit
-                break
+    # Initial payload
+    # We assume the user wants the same topic for all posts
+    current_input = {"messages": [HumanMessage(content=user_query)]}
+    agent = get_agent()
+
+    if num_posts <= 1:
+        config = {"configurable": {"thread_id": f"{base_session_id}_post_1"}}
+        run_post(agent, config, current_input, 1)
+        print("\n🎉 All requested posts processing finished.")
+        return
+
+    # Multi-post: resolve intake, freshness, scraping and summary ONCE on a shared thread,
+    # then fan out only generate/evaluate/review/save into one child thread per post.
+    shared_config = {"configurable": {"thread_id": f"{base_session_id}_shared"}}
+    print(f"\n🧭 PREPARING SHARED CONTEXT FOR {num_posts} POSTS (ID: {base_session_id}_shared)")
+
+    snapshot = drive_thread(
+        agent,
+        shared_config,
+        current_input,
+        "SHARED CONTEXT",
+        interrupt_before=[FANOUT_NODE] + INTERRUPT_BEFORE
+    )
+    print_run_summary(shared_config["configurable"]["thread_id"])
+    if snapshot is None or FANOUT_NODE not in snapshot.next:
+        print("❌ Could not prepare shared context. Aborting.")
+        return
+
+    post_configs = seed_post_threads(agent, shared_config, child_thread_ids(base_session_id, num_posts))
+
+    for i, config in enumerate(post_configs):
+        # Children are already seeded, so they resume from their checkpoint
+        run_post(agent, config, None, i + 1)
 
     print("\n🎉 All requested posts processing finished.")
 
 
+def profile_startup():
+    """Imports the graph modules, initializes every lazy resource and reports where startup time goes."""
+    import_timings = {}
+    for module in STARTUP_MODULES:
+        started = time.perf_counter()
+        importlib.import_module(module)
+        import_timings[module] = time.perf_counter() - started
+
+    for name in registry.names():
+        try:
+            registry.get(name)
+        except Exception as e:
+            print(f"⚠️ Could not initialize '{name}': {e}")
+
+    print_startup_profile(import_timings)
+
+
 if __name__ == "__main__":
-    run_interactive_session()
\ No newline at end of file
+    if "--profile-startup" in sys.argv:
+        profile_startup()
+    else:
+        run_interactive_session()
@@ -1,18 +1,14 @@
-import os
 import json
 import re
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, ToolMessage, AIMessage, HumanMessage
 from tools.RAG_tool import lookup_university_smart
 from state import State
+from utils.async_utils import run_sync
+from utils.resources import get_llm
+from utils.tiering import arun_tiered
 
-load_dotenv(override=True)
-
-api_key = os.getenv('GROQ_API_KEY')
-
-# RECOMMENDED: Use Llama 3.3 70B on Groq. It is much better at JSON than gpt-oss-120b.
-llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=api_key, temperature=0)
+# Anything in the user's messages that looks like a link the extractor should have picked up.
+URL_HINT = re.compile(r"https?://|www\.|\b[\w-]+\.(?:edu|ac|org|com|pk)\b", re.IGNORECASE)
 
 
 def extract_json_from_text(text: str):
@@ -29,13 +25,28 @@ def extract_json_from_text(text: str):
         return None
 
 
-def chat_node(state: State) -> State:
+def _extraction_problem(response, messages) -> str:
+    """Why a slot extraction can't be trusted (triggers escalation to the large model), or None."""
+    data = extract_json_from_text(response.content)
+    if not isinstance(data, dict):
+        return "parse"
+    url = data.get("url")
+    if url and url != "null":
+        return None if "." in url else "invalid_url"
+    user_text = " ".join(str(m.content) for m in messages if isinstance(m, HumanMessage))
+    return "missed_url" if URL_HINT.search(user_text) else None
+
+
+async def achat_node(state: State) -> State:
     print("\n" + "=" * 40)
     print("💬 AI INTAKE NODE RUNNING")
     print("=" * 40)
 
     messages = state.get("messages", [])
 
+    # RECOMMENDED: Use Llama 3.3 70B on Groq. It is much better at JSON than gpt-oss-120b.
+    llm = get_llm("intake")
+
     # =========================================================================
     # STEP 1: VALIDATOR (The Fix)
     # We use a standard invoke + regex parsing. This will not crash on 400 errors.
@@ -65,7 +76,12 @@ def chat_node(state: State) -> State:
                        ] + messages
 
     # Standard invocation (No tool binding forces)
-    response = llm.invoke(validator_prompt)
+    # Slot extraction starts on the small model and escalates if its JSON doesn't hold up.
+    response = await arun_tiered(
+        "intake",
+        lambda name: get_llm(name).ainvoke(validator_prompt),
+        lambda result: _extraction_problem(result, messages),
+    )
     extracted_data = extract_json_from_text(response.content)
 
     if extracted_data:
@@ -107,13 +123,13 @@ def chat_node(state: State) -> State:
     else:
         history = messages
 
-    response = llm_with_tools.invoke(history)
+    response = await llm_with_tools.ainvoke(history)
 
     if response.tool_calls:
         print(f"⚙️  AI Analyzing Docs for: {response.tool_calls[0]['args']}")
 
         for tool_call in response.tool_calls:
-            tool_result_json = lookup_university_smart.invoke(tool_call['args'])
+            tool_result_json = await lookup_university_smart.ainvoke(tool_call['args'])
             print(f"✅ RAG Result: {tool_result_json}")
 
             tool_msg = ToolMessage(tool_call_id=tool_call['id'], content=str(tool_result_json))
@@ -130,4 +146,9 @@ def chat_node(state: State) -> State:
 
     # If no tool call, just return the response (usually a question)
     print(f"🤖 AI Requesting Info: {response.content}")
-    return {"messages": [response]}
\ No newline at end of file
+    return {"messages": [response]}
+
+
+def chat_node(state: State) -> State:
+    """Sync entry point. Thin wrapper around achat_node."""
+    return run_sync(achat_node(state))
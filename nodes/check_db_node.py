@@ -1,42 +1,27 @@
-import os
+import asyncio
 import json
 import re
 from typing import Optional
 
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_community.utilities import SQLDatabase
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain.agents import create_agent
 from langchain_core.messages import HumanMessage
 
 
 # Import your State definition
 from state import State
+from utils.async_utils import run_sync
+from utils.resources import env, get_llm, registry
+from db import university_cache
+from db.blob_store import aput_blob
+from db.operations import afetch_university_facts, aresolve_url_alias, atrack_url, canonical_url, fetchable_url
+from routes.db_route import is_fresh
+from utils import cassette, deadline, facts as fact_sheets, freshness, prefetch, singleflight
+from utils.metrics import current_thread_id
+from utils.scrape import aresolve_redirects
+from utils.tiering import arun_tiered
+from utils.url_records import amerge_summaries, as_url_list
+from workers import refresh_scheduler
 
-load_dotenv(override=True)
-
-# --- 1. SETUP RESOURCES ONCE (Not inside the node) ---
-# This prevents reconnecting to DB and recompiling Graph on every request
-api_key = os.getenv('GROQ_API_KEY')
-database_url = os.getenv("DATABASE_URL")
-
-if not api_key or not database_url:
-    raise ValueError("Missing API Key or Database URL")
-
-db = SQLDatabase.from_uri(database_url)
-
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-    api_key=api_key
-)
-
-# Setup Tools
-sql_toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-tools = sql_toolkit.get_tools()
-
-# --- 2. COMPILE THE SUB-AGENT ONCE ---
+# --- 1. SUB-AGENT PROMPT ---
 system_prompt = """You are a specialized SQL Agent. 
 Your GOAL: Check if a specific URL exists in the 'university' table.
 
@@ -44,13 +29,13 @@ Schema:
     university (
         id SERIAL PRIMARY KEY,
         uni_name TEXT,
-        url TEXT,
+        url TEXT UNIQUE,  -- one row per URL, always the latest summary
         summary TEXT,
         time_stamp TIMESTAMPTZ
     );
 
 INSTRUCTIONS:
-1. Search the 'university' table for the specific URL provided.
+1. Search the 'university' table for the exact URL provided (WHERE url = '...'); there is at most one row.
 2. If found, return the uni_name, url, summary, and time_stamp.
 3. If not found, explicitly state it is not found.
 
@@ -73,73 +58,224 @@ OR if not found:
 }
 """
 
-# We compile the graph here, globally.
-# This 'sql_agent' is now a reusable Runnable.
-sql_agent = create_agent(llm, tools, system_prompt=system_prompt)
 
 
-# --- 3. THE NODE (Lightweight & Fast) ---
-def check_db_node(state: State) -> State:
-    """
-    LangGraph node that invokes the pre-compiled SQL Agent.
-    """
-    # 1. Get Input
-    urls = state.get("URL", [])
-    if not urls:
-        return {"TimeStamp": "NULL", "info": "No URL provided.", "summary": "NULL"}
+# --- 2. BUILD THE SUB-AGENT ONCE, ON FIRST USE ---
+# Reflecting the schema and compiling the agent is expensive, so it happens lazily through
+# the resource registry instead of at import time. The result is a reusable Runnable.
+def _build_sql_database():
+    from langchain_community.utilities import SQLDatabase
+
+    database_url = env("DATABASE_URL")
+    if not env("GROQ_API_KEY") or not database_url:
+        raise ValueError("Missing API Key or Database URL")
+
+    # Only the table the agent needs is reflected, not the whole schema.
+    return SQLDatabase.from_uri(database_url, include_tables=["university"])
+
 
-    target_url = urls[-1] if isinstance(urls, list) else urls
+def _build_sql_agent(llm_name: str = "sql_agent"):
+    from langchain_community.agent_toolkits import SQLDatabaseToolkit
+    from langchain.agents import create_agent
 
-    # 2. Invoke the Pre-Compiled Agent
-    query_message = f"Check database for this URL: {target_url}"
+    db = registry.get("sql_database")
+    llm = get_llm(llm_name)
+
+    # Setup Tools
+    sql_toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+    tools = sql_toolkit.get_tools()
+
+    return create_agent(llm, tools, system_prompt=system_prompt)
+
+
+registry.register("sql_database", _build_sql_database)
+registry.register("sql_agent", _build_sql_agent)
+# Same agent on the small model tier (see utils/tiering.py).
+registry.register("sql_agent_small", lambda: _build_sql_agent("sql_agent_small"))
+
+
+def parse_agent_output(last_message: str):
+    """Returns (status, data) from the JSON block the SQL agent ends its answer with."""
+    json_match = re.search(r'\{.*\}', last_message, re.DOTALL)
+    if not json_match:
+        return "parse_error", {}
+    try:
+        # Clean up potential markdown artifacts just in case
+        clean_json = json_match.group(0).replace("```json", "").replace("```", "")
+        data_dict = json.loads(clean_json)
+        return data_dict.get("status"), data_dict.get("data")
+    except json.JSONDecodeError:
+        return "json_error", {}
+
+
+def _lookup_problem(last_message: str):
+    """Why a SQL agent answer can't be used (escalates to the large model), or None."""
+    status, data = parse_agent_output(last_message)
+    if status == "not_found":
+        return None
+    if status != "success":
+        return status or "missing_status"
+    if not isinstance(data, dict) or not data.get("url") or not data.get("time_stamp"):
+        return "incomplete_row"
+    return None
+
+
+# --- 3. THE NODE (Lightweight & Fast) ---
+async def _alookup_url(target_url: str) -> dict:
+    """Freshness lookup for one URL. Returns its url_records entry."""
+    # Rows are stored under the URL's lookup key (https even for a plain-HTTP site).
+    query_message = f"Check database for this URL: {canonical_url(target_url)}"
 
     # We invoke the agent with its own internal state
     # We use a distinct thread_id if you want isolation, but for a stateless lookup, it's fine.
-    agent_result = sql_agent.invoke({"messages": [HumanMessage(content=query_message)]})
+    async def run_agent(name: str) -> str:
+        agent_result = await registry.get(name).ainvoke({"messages": [HumanMessage(content=query_message)]})
+        return agent_result["messages"][-1].content
 
-    # 3. Parse Output
-    last_message = agent_result["messages"][-1].content
+    async def tiered_lookup():
+        # The existence check starts on the small model and escalates when its answer doesn't parse.
+        return await arun_tiered("sql_agent", run_agent, _lookup_problem)
 
-    # Robust JSON Extraction
-    json_match = re.search(r'\{.*\}', last_message, re.DOTALL)
+    async def lookup():
+        # Threads checking the same URL at the same time share one agent run.
+        return await singleflight.ado(singleflight.key("lookup", target_url), tiered_lookup)
 
-    extracted_data = {}
-    status = "error"
-
-    if json_match:
-        try:
-            # Clean up potential markdown artifacts just in case
-            clean_json = json_match.group(0).replace("```json", "").replace("```", "")
-            data_dict = json.loads(clean_json)
-            status = data_dict.get("status")
-            extracted_data = data_dict.get("data")
-        except json.JSONDecodeError:
-            print(f"DEBUG: JSON Parse Error. Raw content: {last_message}")
-            status = "json_error"
-    else:
-        print(f"DEBUG: No JSON found in agent response: {last_message}")
-        status = "parse_error"
+    async def load_row():
+        last_message = await cassette.arecord_or_replay(cassette.SQL, query_message, lookup)
 
-    # 4. Return Updates to Main Graph State
-    if status == "success" and extracted_data:
-        found_url = extracted_data.get("url")
-        found_timestamp = extracted_data.get("time_stamp")
-        found_summary = extracted_data.get("summary")
+        # Robust JSON Extraction
+        status, extracted_data = parse_agent_output(last_message)
+        if status in ("parse_error", "json_error"):
+            print(f"DEBUG: {status} in agent response: {last_message}")
 
-        info_str = f"URL: {found_url}, TIME_STAMP: {found_timestamp}"
+        if status == "success" and extracted_data:
+            # The fact sheet is read directly; having the agent echo JSON back would cost tokens and fidelity.
+            facts = None
+            if fact_sheets.enabled():
+                async def fetch_facts():
+                    return await afetch_university_facts(env("DATABASE_URL"), target_url)
 
+                facts = await cassette.arecord_or_replay(
+                    cassette.DB, {"op": "university_facts", "url": target_url}, fetch_facts
+                )
+            # The summary is cached as its blob reference, so a cache hit doesn't store it again.
+            return str(extracted_data.get("time_stamp")), await aput_blob(extracted_data.get("summary")), facts
+        return None
+
+    # With UNIVERSITY_CACHE=1 repeated URLs are answered from memory; freshness is still judged per call.
+    row = await university_cache.aget(target_url, load_row)
+    if row is not None:
+        found_timestamp, summary_ref, facts = row
         return {
-            "TimeStamp": str(found_timestamp),
-            "info": info_str,
-            "summary": found_summary,
-            "URL_info": state.get("URL_info", []) + [info_str]
+            "time_stamp": found_timestamp,
+            "summary": summary_ref,
+            "facts": facts,
+            "content": None,
+            "stale": not await freshness.ais_fresh(target_url, found_timestamp),
         }
+    return {"time_stamp": "NULL", "summary": None, "facts": None, "content": None, "stale": True}
+
+
+async def _acanonical_urls(urls) -> list:
+    """
+    Canonical (fetchable) form of each URL, deduplicated in order by lookup key, so http and https spellings
+    of one page count once. URL_ALIASES=1 also follows the url_aliases table;
+    CANONICAL_RESOLVE_REDIRECTS=1 resolves unknown URLs' redirects once and records them there.
+    """
+    if env("URL_ALIASES", "0") == "1" or env("CANONICAL_RESOLVE_REDIRECTS", "0") == "1":
+        resolver = aresolve_redirects if env("CANONICAL_RESOLVE_REDIRECTS", "0") == "1" else None
+        canonical = await asyncio.gather(*(aresolve_url_alias(env("DATABASE_URL"), u, resolver) for u in urls))
     else:
-        # Default fallback
-        null_str = "URL: NULL, TIME_STAMP: NULL"
-        return {
-            "TimeStamp": "NULL",
-            "summary": None,
-            "info": null_str,
-            "URL_info": state.get("URL_info", []) + [null_str]
-        }
\ No newline at end of file
+        canonical = [fetchable_url(u) for u in urls]
+    by_key = {}
+    for url in canonical:
+        by_key.setdefault(canonical_url(url), url)
+    return list(by_key.values())
+
+
+async def _atrack_and_revalidate(uni_name: str, urls, records: dict):
+    """
+    REFRESH_TRACKING=1 puts every requested URL on the refresh scheduler's list.
+    STALE_WHILE_REVALIDATE=1 serves a stale-but-recent stored summary now and refreshes it in the background.
+    """
+    if refresh_scheduler.tracking_enabled():
+        async def track(url):
+            return await atrack_url(env("DATABASE_URL"), uni_name, url)
+
+        await asyncio.gather(*(
+            cassette.arecord_or_replay(cassette.DB, {"op": "track_url", "url": url}, lambda url=url: track(url))
+            for url in urls
+        ))
+
+    if not refresh_scheduler.swr_enabled():
+        return
+    for url in urls:
+        record = records[url]
+        if record["stale"] and record["summary"] and is_fresh(record["time_stamp"], refresh_scheduler.swr_max_stale()):
+            print(f"Serving stored summary of {url} ({record['time_stamp']}) while it refreshes in the background.")
+            record.update(stale=False, revalidating=True)
+            refresh_scheduler.schedule_refresh(uni_name, url)
+
+
+def _serve_stored_when_short(urls, records: dict):
+    """Close to the run's deadline, stale URLs with a stored summary are served as they are instead of re-scraped."""
+    if not deadline.short():
+        return
+    for url in urls:
+        record = records[url]
+        if record["stale"] and record["summary"]:
+            print(f"Run deadline is close; serving the stored summary of {url} ({record['time_stamp']}).")
+            record.update(stale=False, degraded=True)
+            deadline.degrade("stored_summary")
+
+
+async def acheck_db_node(state: State) -> State:
+    """
+    LangGraph node that looks up every URL's stored record through the pre-compiled SQL Agent, in parallel.
+    Freshness is tracked per URL; route_stale_urls then sends only the stale ones to be scraped.
+    With SPECULATIVE_SCRAPE=1 the scrapes start alongside the lookups and are kept only for stale URLs.
+    With STALE_WHILE_REVALIDATE=1 recently stale URLs are served from the DB and refreshed in the background;
+    close to the run's deadline (utils/deadline.py) any stale URL with a stored summary is served from the DB.
+    """
+    # 1. Get Input, in canonical form so cosmetic variants share one record, scrape and summary
+    urls = await _acanonical_urls(as_url_list(state.get("URL")))
+    if not urls:
+        return {"TimeStamp": "NULL", "info": "No URL provided.", "summary": "NULL"}
+
+    # 2. Invoke the Pre-Compiled Agent, once per URL
+    thread_id = current_thread_id.get()
+    prefetch.start(thread_id, urls)
+    try:
+        looked_up = await asyncio.gather(*(_alookup_url(url) for url in urls))
+    except BaseException:
+        prefetch.discard(thread_id)
+        raise
+
+    records = dict(zip(urls, looked_up))
+    await _atrack_and_revalidate(state.get("UniversityName") or "", urls, records)
+    _serve_stored_when_short(urls, records)
+    fresh_urls = [url for url in urls if not records[url]["stale"]]
+    prefetch.discard(thread_id, fresh_urls)
+
+    # 3. Return Updates to Main Graph State
+    info_lines = [
+        f"URL: {url}, TIME_STAMP: {records[url]['time_stamp']}" if records[url]["time_stamp"] != "NULL"
+        else "URL: NULL, TIME_STAMP: NULL"
+        for url in urls
+    ]
+    all_fresh = len(fresh_urls) == len(urls)
+
+    return {
+        # Oldest stored timestamp when everything is fresh; "NULL" as soon as one URL needs scraping.
+        "TimeStamp": min(records[url]["time_stamp"] for url in urls) if all_fresh else "NULL",
+        "info": "; ".join(info_lines),
+        "summary": await aput_blob(await amerge_summaries(urls, records)) if all_fresh else None,
+        "URL": urls,
+        "URL_info": state.get("URL_info", []) + info_lines,
+        "url_records": records,
+    }
+
+
+def check_db_node(state: State) -> State:
+    """Sync entry point. Thin wrapper around acheck_db_node."""
+    return run_sync(acheck_db_node(state))
@@ -1,26 +1,32 @@
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from state import State
 from utils.BaseModels import Feedback
+from utils.async_utils import run_sync
+from db.blob_store import aresolve_blob
+from utils.resources import get_llm
+from utils.tiering import arun_tiered
+from utils import facts as fact_sheets
+from utils.url_records import as_url_list
 
-load_dotenv(override=True)
 
-api_key = os.getenv('EVALUATOR_API_KEY')
+def grade_problem(feedback: Feedback):
+    """
+    Why a tier's grade can't be final (see utils/tiering.arun_tiered); None when it can.
+    The small model may reject a draft on its own, but only the large one approves it: a wrong "good"
+    goes straight to the reviewer, while a wrong "bad" costs one regeneration.
+    """
+    if feedback.grade not in ("good", "bad"):
+        return "invalid_grade"
+    if feedback.grade == "bad" and not feedback.feedback:
+        return "missing_feedback"
+    if feedback.grade == "good":
+        return "unconfirmed_good"
+    return None
 
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0.1,  # Low temp for strict grading
-    api_key=api_key
-)
 
-
-def evaluate_post_node(state: State):
+async def aevaluate_post_node(state: State):
     """Internal AI Evaluator checking for accuracy and required fields."""
-    evaluator_llm = llm.with_structured_output(Feedback)
-
     # Inputs
-    summary = state.get("summary")
+    summary = await aresolve_blob(state.get("summary"))
 
     # Generated Outputs to Grade
     uni_name = state.get("university_name")
@@ -29,12 +35,29 @@ def evaluate_post_node(state: State):
     url = state.get("relevant_url")
     timestamp = state.get("timestamp")
 
+    source_label, source = "SUMMARY", summary
+    if fact_sheets.enabled():
+        urls = as_url_list(state.get("URL"))
+        records = state.get("url_records") or {}
+        sheet = fact_sheets.collect(urls, records)
+        if sheet:
+            # Fields, disclaimer, dates and URL are checked in code; a failure skips the LLM entirely.
+            draft = {"university_name": uni_name, "post_heading": heading, "post_content": content,
+                     "relevant_url": url, "timestamp": timestamp}
+            # The generator is given the source date (TimeStamp) and may quote it; it isn't in the summary.
+            source_dates = [state.get("TimeStamp")] + [(records.get(u) or {}).get("time_stamp") for u in urls]
+            problems = fact_sheets.check_draft(draft, sheet, urls, summary, source_dates)
+            if problems:
+                return {"grade": "bad", "evaluator_feedback": [" ".join(problems)]}
+            source_label = "FACTS"
+            source = fact_sheets.format_facts(fact_sheets.relevant(sheet, state.get("topic", "")), len(urls) > 1)
+
     prompt = (
         f"### ROLE: Senior Editor\n"
-        f"You are grading a social media post against a source summary.\n\n"
+        f"You are grading a social media post against a source {source_label.lower()}.\n\n"
 
-        f"### SOURCE SUMMARY\n"
-        f"{summary}\n\n"
+        f"### SOURCE {source_label}\n"
+        f"{source}\n\n"
 
         f"### GENERATED POST\n"
         f"University: {uni_name}\n"
@@ -44,7 +67,7 @@ def evaluate_post_node(state: State):
         f"Time: {timestamp}\n\n"
 
         f"### CHECKLIST (CRITICAL)\n"
-        f"1. ACCURACY: Does the content match the summary? (No hallucinations)\n"
+        f"1. ACCURACY: Does the content match the {source_label.lower()}? (No hallucinations)\n"
         f"2. DISCLAIMER: Does the content body end with 'refer to the official website'?\n"
         f"3. COMPLETENESS: Are University Name, URL, and Date present?\n"
         f"4. TONE: Is it professional (not too many emojis)?\n\n"
@@ -52,9 +75,19 @@ def evaluate_post_node(state: State):
         f"If ANY of these fail, grade 'bad' and explain why. If all pass, grade 'good'."
     )
 
-    response = evaluator_llm.invoke(prompt)
+    # Low temp for strict grading. Rejections with feedback can stop at the small model; approvals escalate.
+    response = await arun_tiered(
+        "evaluator",
+        lambda name: get_llm(name).with_structured_output(Feedback).ainvoke(prompt),
+        grade_problem,
+    )
 
     return {
         "grade": response.grade,
         "evaluator_feedback": [response.feedback] if response.feedback else []
-    }
\ No newline at end of file
+    }
+
+
+def evaluate_post_node(state: State):
+    """Sync entry point. Thin wrapper around aevaluate_post_node."""
+    return run_sync(aevaluate_post_node(state))
@@ -1,23 +1,34 @@
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from state import State
 from utils.BaseModels import PostDraft
+from utils.async_utils import run_sync
+from db.blob_store import aresolve_blob
+from utils.resources import get_llm
+from utils import facts as fact_sheets
+from utils.url_records import as_url_list
 
-load_dotenv(override=True)
 
-api_key = os.getenv('EVALUATOR_API_KEY')
-llm = ChatGroq(model="openai/gpt-oss-120b", api_key=api_key, temperature=0.5)
+async def _acontext(state: State, topic: str):
+    """
+    ("Facts", topic-relevant fact sheet lines) with FACT_SHEETS=1 and a fact sheet for every source,
+    else ("Summary", the merged summary).
+    """
+    if fact_sheets.enabled():
+        urls = as_url_list(state.get("URL"))
+        sheet = fact_sheets.collect(urls, state.get("url_records") or {})
+        if sheet:
+            relevant = fact_sheets.relevant(sheet, topic)
+            return "Facts", "\n" + fact_sheets.format_facts(relevant, multi_source=len(urls) > 1)
+    return "Summary", await aresolve_blob(state.get("summary", "No summary provided."))
 
 
-def generate_post_node(state: State):
+async def agenerate_post_node(state: State):
     """Generates a structured post with strict adherence to the summary."""
 
-    structured_llm = llm.with_structured_output(PostDraft)
+    structured_llm = get_llm("generator").with_structured_output(PostDraft)
 
     # Extract context from state
-    summary = state.get("summary", "No summary provided.")
     topic = state.get("topic", "General Update")
+    source, context = await _acontext(state, topic)
 
     # We provide these from state to help the LLM avoid guessing
     ref_urls = ", ".join(state.get("URL", []))
@@ -33,7 +44,7 @@ def generate_post_node(state: State):
         "helpful updates to students.\n\n"
 
         "### STRICT CONTENT RULES\n"
-        "1. NO HALLUCINATION: You must ONLY use the provided Summary. Do not invent fees, dates, or programs.\n"
+        f"1. NO HALLUCINATION: You must ONLY use the provided {source}. Do not invent fees, dates, or programs.\n"
         "2. TONE: Professional, encouraging, and clear. Avoid excessive emojis (max 2-3).\n"
         "3. LENGTH: Concise (100-150 words). Not too long, not too short.\n"
         "4. DISCLAIMER: The content body MUST end with: 'Please refer to the official website for more details.'\n"
@@ -51,7 +62,7 @@ def generate_post_node(state: State):
             f"Topic: {topic}\n"
             f"Source URL: {ref_urls}\n"
             f"Source Date: {ref_time}\n"
-            f"Summary: {summary}\n"
+            f"{source}: {context}\n"
         )
         count = 0
 
@@ -67,7 +78,7 @@ def generate_post_node(state: State):
             f"Topic: {topic}\n"
             f"Source URL: {ref_urls}\n"
             f"Source Date: {ref_time}\n"
-            f"Summary: {summary}\n"
+            f"{source}: {context}\n"
         )
     else:
         print(f"\n🤖 System: Generating first draft...")
@@ -79,10 +90,10 @@ def generate_post_node(state: State):
             f"Topic: {topic}\n"
             f"Source URL: {ref_urls}\n"
             f"Source Date: {ref_time}\n"
-            f"Summary: {summary}\n"
+            f"{source}: {context}\n"
         )
 
-    response = structured_llm.invoke(prompt)
+    response = await structured_llm.ainvoke(prompt)
 
     return {
         "university_name": response.university_name,
@@ -93,4 +104,9 @@ def generate_post_node(state: State):
         "iteration_count": count + 1,
         "human_feedback": None,
         "evaluator_feedback": None
-    }
\ No newline at end of file
+    }
+
+
+def generate_post_node(state: State):
+    """Sync entry point. Thin wrapper around agenerate_post_node."""
+    return run_sync(agenerate_post_node(state))
@@ -1,8 +1,16 @@
 from state import State
-from db.firebase_db import save_post_to_firestore
+from db import write_behind
+from db.firebase_db import asave_post_to_firestore, post_doc_id
+from utils import cassette
+from utils.async_utils import run_sync
+from utils.metrics import current_thread_id
 
 
-def save_post_node(state: State):
+async def _aenqueue_post(payload: dict, doc_id: str) -> str:
+    return write_behind.enqueue_post(payload, doc_id)
+
+
+async def asave_post_node(state: State):
     """
     Extracts ONLY the required PostDraft fields and saves to Firestore.
     """
@@ -22,8 +30,25 @@ def save_post_node(state: State):
         print("⚠️ Warning: Post content is empty. Skipping save.")
         return {"info": "Skipped - Empty Content"}
 
+    # One document per thread and URL: a retried run overwrites its post even though the draft was regenerated.
+    doc_id = post_doc_id(payload, current_thread_id.get())
+
+    if write_behind.enabled():
+        # Journaled locally and delivered by the background flusher; a Firestore outage only delays it.
+        doc_id = await cassette.arecord_or_replay(
+            cassette.FIRESTORE, payload, lambda: _aenqueue_post(payload, doc_id)
+        )
+        return {"info": f"Post queued with ID: {doc_id}"}
+
     try:
-        doc_id = save_post_to_firestore(payload)
+        doc_id = await cassette.arecord_or_replay(
+            cassette.FIRESTORE, payload, lambda: asave_post_to_firestore(payload, doc_id)
+        )
         return {"info": f"Post saved with ID: {doc_id}"}
     except Exception:
-        return {"info": "Failed to save post."}
\ No newline at end of file
+        return {"info": "Failed to save post."}
+
+
+def save_post_node(state: State):
+    """Sync entry point. Thin wrapper around asave_post_node."""
+    return run_sync(asave_post_node(state))
@@ -1,32 +1,58 @@
+import asyncio
 from datetime import datetime, timezone
 
 from state import State
-from utils.scrape import scrape_urls_with_jina
+from db.blob_store import aput_blob
+from utils import freshness, prefetch
+from utils.async_utils import run_sync
+from utils.metrics import current_thread_id
+from utils.scrape import SCRAPE_ERROR_PREFIXES, ascrape_urls_with_jina
+from utils.url_records import as_url_list
 
 
-def scrape_with_jina_node(state: State) -> State:
+def failed_page(page: str) -> bool:
+    """Whether a page from ascrape_page holds a scrape error instead of the page's content."""
+    return any(f" ---\n{prefix}" in page for prefix in SCRAPE_ERROR_PREFIXES)
+
+
+async def ascrape_page(url: str) -> str:
+    """One URL's page, wrapped in the START/END markers the summarizer expects."""
+    # A speculative scrape started by check_db_node may already be done (or close to it).
+    scraped_map = await prefetch.take(current_thread_id.get(), url)
+    if scraped_map is None:
+        scraped_map = await ascrape_urls_with_jina([url])
+    page = "\n".join(f"--- START {u} ---\n{c}\n--- END {u} ---\n" for u, c in scraped_map.items())
+
+    if not any(c.startswith(SCRAPE_ERROR_PREFIXES) for c in scraped_map.values()):
+        await freshness.arecord_scrape(url, page)
+    return page
+
+
+async def ascrape_with_jina_node(state: State) -> State:
     """
-    Consumes state['URL'] (list) and returns merged 'Content' containing all scraped pages.
-    Returns partial state containing 'Content' and 'TimeStamp'.
+    Scrapes one stale URL per branch: state['scrape_url'] is sent by route_stale_urls.
+    Called without it (e.g. invoked directly) it scrapes every URL in state['URL'].
+    Returns only 'url_records' updates, since parallel branches may not write plain state keys.
     """
-    urls = state.get("URL", [])
-    if not isinstance(urls, list):
-        # normalize to list for safety
-        urls = [urls] if urls else []
+    scrape_url = state.get("scrape_url")
+    urls = [scrape_url] if scrape_url else as_url_list(state.get("URL"))
 
     current_time = datetime.now(timezone.utc)
 
     if not urls:
-        return {"Content": "", "TimeStamp": current_time.isoformat()}
+        return {"url_records": {}}
 
-    scraped_map = scrape_urls_with_jina(urls)
-    # Combine contents into single Content field (separated by markers)
-    parts = []
-    for u, c in scraped_map.items():
-        parts.append(f"--- START {u} ---\n{c}\n--- END {u} ---\n")
-    combined = "\n".join(parts)
+    pages = await asyncio.gather(*(ascrape_page(u) for u in urls))
 
+    # The raw pages are stored once in the blob store; the checkpoint only keeps the hash reference.
     return {
-        "Content": combined,
-        "TimeStamp": current_time.isoformat()
+        "url_records": {
+            u: {"content": await aput_blob(page), "scraped_at": current_time.isoformat()}
+            for u, page in zip(urls, pages)
+        }
     }
+
+
+def scrape_with_jina_node(state: State) -> State:
+    """Sync entry point. Thin wrapper around ascrape_with_jina_node."""
+    return run_sync(ascrape_with_jina_node(state))
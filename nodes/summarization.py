@@ -1,43 +1,22 @@
-import os
-
-from dotenv import load_dotenv
-
+import asyncio
 from datetime import datetime, timezone
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from state import State
-from db.operations import insert_university
-
-load_dotenv(override=True)
+from state import State, merge_url_records
+from db import write_behind
+from db.operations import afetch_latest_university, ainsert_university
+from db.blob_store import aput_blob, aresolve_blob
+from utils import cassette, deadline, facts as fact_sheets, freshness, singleflight
+from utils.async_utils import run_sync
+from utils.resources import env, get_llm
+from utils.url_records import amerge_summaries, as_url_list
 
-DATABASE_URL = os.getenv('DATABASE_URL')
+# Returned in place of a summary when the LLM call failed; such a summary is never stored.
+SUMMARY_ERROR_PREFIX = "API Error"
 
 
-def summarize(state: State) -> State:
-    """
-    Generates a structured, detailed summary from the raw content using
-    the Gemini model and a specific system prompt for extraction.
-    """
-    # 1. Retrieve the raw content from the state
-    raw_content = state.get("Content")
-
-    if not raw_content:
-        print("Warning: 'Content' field is empty. Skipping summarization.")
-        state["summary"] = "No content provided for summarization."
-        return state
-
-    # 2. Initialize the Gemini Chat Model
-    # We use 'gemini-2.5-flash' for fast, production-ready summarization,
-    # mapping the user's requested 'gemini-2.5-flash-lite' intention.
-    # Temperature is set to 0 for maximum factual accuracy and less creativity.
-    try:
-        model = ChatGroq(model="llama-3.3-70b-versatile", temperature=0)
-    except Exception as e:
-        print(f"Error initializing ChatGoogleGenerativeAI: {e}")
-        state["summary"] = f"ERROR: Model initialization failed: {str(e)}"
-        return state
-
+async def _asummarize_page(model, raw_content: str) -> str:
+    """Structured, detailed summary of one scraped page."""
     # 3. Define the detailed system prompt (provided by the user)
     system_prompt = f'''
 You are a highly precise and careful information extraction assistant. Your task is to process raw, 
@@ -108,24 +87,117 @@ Prioritize clarity and readability over brevity.'''
 
     # 5. Invoke the model to generate the summary
     try:
-        response = model.invoke(messages)
-        generated_summary = response.content
+        response = await model.ainvoke(messages)
+        return response.content
     except Exception as e:
         print(f"Error during Gemini API call: {e}")
-        generated_summary = f"API Error: Summarization failed. Details: {str(e)}"
+        return f"{SUMMARY_ERROR_PREFIX}: Summarization failed. Details: {str(e)}"
 
-    state["summary"] = generated_summary
+
+async def asummarize_url(model, uni_name: str, url: str, content_ref, current_time):
+    """
+    Summarizes one URL's page and stores the summary in the university table.
+    Returns (summary, facts); facts is the summary's fact sheet with FACT_SHEETS=1, else None.
+    """
+    # Content is usually a blob reference; only this node needs the raw text.
+    raw_content = await aresolve_blob(content_ref)
+
+    if not raw_content:
+        print(f"Warning: no content scraped for {url}. Skipping summarization.")
+        return "No content provided for summarization.", None
+
+    async def summarize_and_store():
+        generated_summary = await _asummarize_page(model, raw_content)
+        if generated_summary.startswith(SUMMARY_ERROR_PREFIX):
+            # Storing the error would replace the last good summary and pass for a fresh one.
+            print(f"Warning: summarization of {url} failed; keeping the stored summary.")
+            return generated_summary, None
+        facts = None
+        if fact_sheets.enabled():
+            if deadline.short():
+                # Generation falls back to the full summary; the facts come with the URL's next summary.
+                deadline.degrade("skip_fact_extraction")
+            else:
+                facts = await fact_sheets.aextract_facts(model, generated_summary)
+
+        async def insert():
+            if write_behind.enabled():
+                # Nothing in this run reads the row back; the flusher upserts it in the background.
+                return write_behind.enqueue_university(uni_name, url, generated_summary, current_time, facts)
+            return await ainsert_university(
+                database_url=env("DATABASE_URL"),
+                uni_name=uni_name,
+                url=url,
+                summary=generated_summary,
+                time_stamp=current_time,
+                facts=facts,
+            )
+
+        await cassette.arecord_or_replay(cassette.DB, {"op": "insert_university", "url": url}, insert)
+        return generated_summary, facts
+
+    async def stored_by_another_worker():
+        row = await afetch_latest_university(env("DATABASE_URL"), url)
+        return (row[0], row[2]) if row and await freshness.ais_fresh(url, str(row[1])) else None
+
+    # Threads that scraped the same page at the same time summarize and insert it once.
+    return await singleflight.ado(
+        singleflight.key("summarize", url, raw_content), summarize_and_store, stored_by_another_worker
+    )
+
+
+async def asummarize(state: State) -> State:
+    """
+    Joins the per-URL scrape branches: summarizes every freshly scraped page in parallel,
+    stores each URL's summary in the university table, and merges all per-URL summaries
+    (fresh ones read back by check_db_node included) into the 'summary' generation reads.
+    """
+    # 1. Collect the pages the scrape branches left in url_records
+    urls = as_url_list(state.get("URL"))
+    records = state.get("url_records") or {}
+    pending = {url: records[url]["content"] for url in urls if (records.get(url) or {}).get("content")}
+
+    if not pending and state.get("Content") and urls:
+        # Checkpoints from before per-URL records carry one combined page for the first URL.
+        pending = {urls[0]: state["Content"]}
+
+    if not pending:
+        print("Warning: no scraped content in state. Skipping summarization.")
+        return {"summary": "No content provided for summarization."}
+
+    # 2. Initialize the Gemini Chat Model
+    # We use 'gemini-2.5-flash' for fast, production-ready summarization,
+    # mapping the user's requested 'gemini-2.5-flash-lite' intention.
+    # Temperature is set to 0 for maximum factual accuracy and less creativity.
+    try:
+        model = get_llm("summarizer")
+    except Exception as e:
+        print(f"Error initializing ChatGoogleGenerativeAI: {e}")
+        return {"summary": f"ERROR: Model initialization failed: {str(e)}"}
 
     current_time = datetime.now(timezone.utc)
     uni_name = state["UniversityName"]
-    url = state["URL"][0] if isinstance(state["URL"], list) else state["URL"]
-
-    insert_university(
-        database_url=DATABASE_URL,
-        uni_name=uni_name,
-        url=url,
-        summary=generated_summary,
-        time_stamp=current_time
-    )
 
-    return state
+    results = await asyncio.gather(*(
+        asummarize_url(model, uni_name, url, content_ref, current_time) for url, content_ref in pending.items()
+    ))
+
+    updates = {
+        url: {"summary": await aput_blob(summary), "facts": facts, "content": None,
+              "time_stamp": current_time.isoformat(), "stale": False}
+        for url, (summary, facts) in zip(pending, results)
+    }
+    merged = await amerge_summaries(urls, merge_url_records(records, updates))
+
+    # Only the changed keys are returned, and the summaries themselves go out of line,
+    # so this step doesn't rewrite every channel into the checkpoint.
+    return {
+        "summary": await aput_blob(merged),
+        "url_records": updates,
+        "TimeStamp": current_time.isoformat(),
+    }
+
+
+def summarize(state: State) -> State:
+    """Sync entry point. Thin wrapper around asummarize."""
+    return run_sync(asummarize(state))
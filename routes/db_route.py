@@ -1,59 +1,51 @@
-from typing import Literal
+from typing import List, Literal, Union
 
 
 from datetime import datetime, timezone, timedelta
 import dateutil.parser
+from langgraph.types import Send
 
 
 from state import State
+from utils.url_records import as_url_list
 
+FRESHNESS_THRESHOLD = timedelta(days=2)
 
-def route_based_on_timestamp(state: State) -> Literal["Scrape_with_jina", "generate_post"]:
-    """
-    Conditional logic to determine the next step based on URL freshness.
 
-    Returns:
-        - "Scrape_with_jina": If URL is missing, NULL, or older than 2 days.
-        - "generate_post": If URL exists and is fresh (<= 2 days old).
+def is_fresh(timestamp_str, threshold: timedelta = FRESHNESS_THRESHOLD) -> bool:
+    """
+    Whether a stored record is still usable: parseable and no older than `threshold`.
+    Missing, NULL and unparseable timestamps count as stale, so the URL gets re-scraped.
     """
-
-    timestamp_str = state.get("TimeStamp")
-
-    # Condition 1: URL not found or TimeStamp is explicitly "NULL"
-    # We also check for None or empty string just to be safe
     if not timestamp_str or timestamp_str == "NULL":
-        print("Routing: URL not found or TimeStamp is NULL -> Scrape_with_jina")
-        return "Scrape_with_jina"
-
+        return False
     try:
-        # Parse the timestamp string.
-        # We use dateutil.parser because it's robust against various DB string formats.
         stored_time = dateutil.parser.parse(timestamp_str)
+    except (ValueError, TypeError, OverflowError):
+        return False
+    if stored_time.tzinfo is None:
+        stored_time = stored_time.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - stored_time <= threshold
 
-        # Ensure stored_time is timezone-aware. If it's naive, assume UTC.
-        if stored_time.tzinfo is None:
-            stored_time = stored_time.replace(tzinfo=timezone.utc)
-
-        # Get current time in UTC
-        current_time = datetime.now(timezone.utc)
 
-        # Calculate the age of the record
-        age = current_time - stored_time
+def route_stale_urls(state: State) -> Union[Literal["generate_post"], List[Send]]:
+    """
+    Conditional logic to determine the next step based on per-URL freshness (url_records from check_db_node).
 
-        # Define the threshold (2 days)
-        freshness_threshold = timedelta(days=2)
+    Returns:
+        - One Send("scrape_with_jina", {"scrape_url": url}) per URL that is missing, NULL, or older than 2 days;
+          the branches run in parallel and join again at Summarize.
+        - "generate_post": If every URL exists and is fresh (<= 2 days old).
+    """
+    records = state.get("url_records") or {}
+    urls = as_url_list(state.get("URL"))
 
-        # Condition 2: URL found but older than 2 days
-        if age > freshness_threshold:
-            print(f"Routing: Data is old ({age.days} days) -> Scrape_with_jina")
-            return "Scrape_with_jina"
+    # A URL without a record (never looked up) counts as stale.
+    stale_urls = [url for url in urls if (records.get(url) or {}).get("stale", True)]
 
-        # Condition 3: URL found and fresh
-        else:
-            print(f"Routing: Data is fresh ({age} old) -> generate_post")
-            return "generate_post"
+    if not stale_urls:
+        print(f"Routing: all {len(urls)} URL(s) fresh -> generate_post")
+        return "generate_post"
 
-    except (ValueError, TypeError) as e:
-        # Fallback: If we can't parse the date, assume we need to re-scrape
-        print(f"Routing Error: Could not parse timestamp '{timestamp_str}'. Error: {e} -> Scrape_with_jina")
-        return "Scrape_with_jina"
+    print(f"Routing: {len(stale_urls)}/{len(urls)} URL(s) stale -> scrape_with_jina")
+    return [Send("scrape_with_jina", {"scrape_url": url}) for url in stale_urls]
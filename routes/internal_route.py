@@ -1,4 +1,5 @@
 from state import State
+from utils import deadline
 
 
 def route_internal(state: State):
@@ -14,6 +15,11 @@ def route_internal(state: State):
     if grade == "good":
         print("--- Evaluator Approved. Sending to Human. ---")
         return "human_review"
+    elif deadline.short():
+        # Another generate/evaluate round would run past the deadline; the reviewer sees the feedback instead.
+        print("--- Evaluator Rejected, but the run deadline is close. Sending to Human. ---")
+        deadline.degrade("skip_regenerate", node="route_internal")
+        return "human_review"
     else:
         print("--- Evaluator Rejected. Regenerating. ---")
         return "regenerate"
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import TypedDict, List, Optional, Annotated
+from typing import TypedDict, Dict, List, Optional, Annotated
 import operator
 from langchain_core.messages import BaseMessage
 from langgraph.graph import add_messages
@@ -10,18 +10,34 @@ def add_lists_safe(existing: Optional[List[str]], new: Optional[List[str]]) -> L
     return existing + new
 
 
+def merge_url_records(existing: Optional[Dict[str, dict]], new: Optional[Dict[str, dict]]) -> Dict[str, dict]:
+    """Merges per-URL records field by field, so parallel per-URL branches can each update their own URL."""
+    merged = dict(existing or {})
+    for url, record in (new or {}).items():
+        merged[url] = {**merged.get(url, {}), **record}
+    return merged
+
+
 class State(TypedDict, total=False):
     messages: Annotated[List[BaseMessage], add_messages]
 
     UniversityName: str
     URL: List[str]
     URL_info: List[str]
+    # Content and summary may hold a "blob:sha256:..." reference (see db/blob_store.py).
+    # Resolve with aresolve_blob() only where the text is actually needed.
     Content: str
     fetched_content: str
     TimeStamp: str
     info: str
     topic: str
     summary: str
+    # url -> {"time_stamp", "summary", "facts", "content", "stale"}; freshness is tracked per URL (see check_db_node).
+    # "summary" and "content" are blob references. `summary` above is the merged text generation reads,
+    # "facts" the summary's fact sheet (utils/facts.py, FACT_SHEETS=1) or None.
+    url_records: Annotated[Dict[str, dict], merge_url_records]
+    # Payload of the per-URL scrape branch (Send from route_stale_urls); never written as a graph update.
+    scrape_url: str
 
     post_heading: str
     post_content: str
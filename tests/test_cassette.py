@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from tools import RAG_tool
+from utils import cassette
+from utils.metrics import current_thread_id
+from utils.resources import registry
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    async def aembed_query(self, query):
+        self.queries.append(query)
+        return [0.1, 0.2]
+
+
+class FakeCollection:
+    def query(self, query_embeddings, n_results):
+        return {"documents": [["University of the Punjab, pu.edu.pk", "UCP, ucp.edu.pk"]]}
+
+
+@pytest.fixture
+def thread(monkeypatch, tmp_path):
+    monkeypatch.setenv("CASSETTE_DIR", str(tmp_path))
+    monkeypatch.setenv("CASSETTE_LATENCY", "zero")
+    token = current_thread_id.set("rag-thread")
+    yield "rag-thread"
+    current_thread_id.reset(token)
+    cassette._cassettes.clear()
+    registry.reset("rag_embeddings")
+    registry.reset("chroma_collection")
+
+
+def test_rag_search_replays_without_embeddings_or_chroma(monkeypatch, thread):
+    embeddings = FakeEmbeddings()
+    registry.override("rag_embeddings", embeddings)
+    registry.override("chroma_collection", FakeCollection())
+
+    monkeypatch.setenv("CASSETTE_MODE", cassette.RECORD)
+    recorded = asyncio.run(RAG_tool._asearch("ucp lahore"))
+
+    cassette._cassettes.clear()
+    registry.override("rag_embeddings", None)
+    registry.override("chroma_collection", None)
+    monkeypatch.setenv("CASSETTE_MODE", cassette.REPLAY)
+    replayed = asyncio.run(RAG_tool._asearch("ucp lahore"))
+
+    assert replayed == recorded == ["University of the Punjab, pu.edu.pk", "UCP, ucp.edu.pk"]
+    assert embeddings.queries == ["ucp lahore"]
+
+
+def test_anote_update_resolves_blob_refs(monkeypatch, thread):
+    async def aresolve_blob(value):
+        return "full text"
+
+    monkeypatch.setattr("db.blob_store.aresolve_blob", aresolve_blob)
+    monkeypatch.setenv("CASSETTE_MODE", cassette.RECORD)
+    config = {"configurable": {"thread_id": thread}}
+    asyncio.run(cassette.anote_update(config, {"Summary": "blob:sha256:" + "0" * 64, "grade": "good"}, "seed"))
+
+    step = cassette.get_cassette(thread).driver_steps()[0]
+    assert cassette.decode(step["result"]) == {
+        "values": {"Summary": "full text", "grade": "good"}, "as_node": "seed"}
@@ -0,0 +1,163 @@
+import os
+import uuid
+from typing import TypedDict
+
+import psycopg
+import pytest
+from langgraph.graph import END, START, StateGraph
+from psycopg.conninfo import make_conninfo
+
+from db import checkpoint_retention
+from db.checkpoint_retention import LIST_THREADS_QUERY, prune
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((query, params))
+        self.rows = self.conn.threads if query == LIST_THREADS_QUERY else []
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConn:
+    """Answers the thread listing with `threads` and records every statement."""
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def deleted(self, thread_id: str) -> set:
+        """The tables a DELETE touched for `thread_id`."""
+        return {query.split()[2] for query, params in self.executed
+                if query.lstrip().startswith("DELETE") and params and params.get("thread_id") == thread_id}
+
+
+@pytest.fixture
+def pruned(monkeypatch):
+    def run(threads, **kwargs):
+        conn = FakeConn(threads)
+        monkeypatch.setattr(checkpoint_retention.psycopg, "connect", lambda *args, **kw: conn)
+        return prune("postgresql://unused", **kwargs), conn
+
+    return run
+
+
+def test_completed_thread_older_than_the_cutoff_is_compacted(pruned):
+    stats, conn = pruned([("done", None, True, 4, True)])
+
+    assert stats["compacted_threads"] == 1 and stats["deleted_threads"] == 0
+    assert conn.deleted("done") == {"checkpoints", "checkpoint_writes", "checkpoint_blobs"}
+    # Compaction keeps the latest checkpoint: the whole-thread delete never ran.
+    assert not any("SELECT ctid FROM" in query for query, _ in conn.executed)
+
+
+def test_interrupted_or_in_flight_thread_is_kept(pruned):
+    stats, conn = pruned([("waiting_review", None, False, 6, False), ("running", None, False, 2, False)])
+
+    assert stats["kept_threads"] == 2
+    assert conn.deleted("waiting_review") == conn.deleted("running") == set()
+
+
+def test_unfinished_thread_idle_past_the_ttl_is_deleted(pruned):
+    stats, conn = pruned([("abandoned", None, True, 3, False)])
+
+    assert stats["deleted_threads"] == 1
+    assert conn.deleted("abandoned") == {"checkpoints", "checkpoint_writes", "checkpoint_blobs"}
+
+
+def test_dry_run_deletes_nothing(pruned):
+    stats, conn = pruned([("done", None, True, 4, True), ("abandoned", None, True, 3, False)], dry_run=True)
+
+    assert (stats["compacted_threads"], stats["deleted_threads"]) == (1, 1)
+    assert conn.deleted("done") == conn.deleted("abandoned") == set()
+
+
+# --- AGAINST POSTGRES ---
+class Steps(TypedDict, total=False):
+    seen: str
+
+
+@pytest.fixture
+def database_url():
+    """A throwaway schema on TEST_DATABASE_URL holding a checkpointer's tables."""
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    base_url = os.environ.get("TEST_DATABASE_URL")
+    if not base_url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    schema = f"test_{uuid.uuid4().hex}"
+    with psycopg.connect(base_url, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    url = make_conninfo(base_url, options=f"-c search_path={schema}")
+    with PostgresSaver.from_conn_string(url) as saver:
+        saver.setup()
+    yield url
+    with psycopg.connect(base_url, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def run_threads(url: str):
+    """Runs `done` to END and ages it by 30 days; `waiting_review` stops before review."""
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    graph = StateGraph(Steps)
+    graph.add_node("draft", lambda state: {"seen": "draft"})
+    graph.add_node("review", lambda state: {"seen": "review"})
+    graph.add_edge(START, "draft")
+    graph.add_edge("draft", "review")
+    graph.add_edge("review", END)
+
+    with PostgresSaver.from_conn_string(url) as saver:
+        agent = graph.compile(checkpointer=saver, interrupt_before=["review"])
+        for thread_id in ("done", "waiting_review"):
+            agent.invoke({"seen": ""}, {"configurable": {"thread_id": thread_id}})
+        agent.invoke(None, {"configurable": {"thread_id": "done"}})
+
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute("UPDATE checkpoints SET checkpoint = jsonb_set(checkpoint, '{ts}', "
+                     "to_jsonb((NOW() - INTERVAL '30 days')::TEXT)) WHERE thread_id = 'done'")
+
+
+def checkpoints_per_thread(url: str) -> dict:
+    with psycopg.connect(url) as conn:
+        return dict(conn.execute("SELECT thread_id, COUNT(*) FROM checkpoints GROUP BY thread_id").fetchall())
+
+
+def test_thread_state_is_read_from_the_checkpoint_tables(database_url):
+    run_threads(database_url)
+
+    with psycopg.connect(database_url) as conn:
+        completed = {row[0]: row[4] for row in conn.execute(LIST_THREADS_QUERY, (14,)).fetchall()}
+
+    assert completed == {"done": True, "waiting_review": False}
+
+
+def test_prune_compacts_an_old_completed_thread_and_keeps_an_interrupted_one(database_url):
+    run_threads(database_url)
+
+    stats = prune(database_url, ttl_days=14)
+
+    assert (stats["compacted_threads"], stats["kept_threads"], stats["deleted_threads"]) == (1, 1, 0)
+    assert checkpoints_per_thread(database_url)["done"] == 1
+    assert checkpoints_per_thread(database_url)["waiting_review"] > 1
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from routes.internal_route import route_internal
+from utils import deadline
+from utils.metrics import instrument_node, metrics
+from utils.tiering import tiers
+
+
+class Steps(TypedDict, total=False):
+    seen: list
+
+
+@pytest.fixture
+def at():
+    """Sets the current deadline `seconds` from now for the rest of the test."""
+    tokens = []
+
+    def set_deadline(seconds: float):
+        tokens.append(deadline.current_deadline.set(time.time() + seconds))
+
+    yield set_deadline
+    for token in reversed(tokens):
+        deadline.current_deadline.reset(token)
+
+
+def degradations(node: str, outcome: str) -> float:
+    return metrics.counter_values("lumina_deadline_total").get((("node", node), ("outcome", outcome)), 0)
+
+
+def test_without_a_deadline_nothing_changes(monkeypatch):
+    monkeypatch.delenv("RUN_DEADLINE_SECONDS", raising=False)
+
+    assert deadline.after() is None
+    assert deadline.remaining() is None
+    assert deadline.timeout(30) == 30
+    assert not deadline.short()
+
+
+def test_timeout_is_cut_to_the_time_left(at):
+    at(10)
+
+    assert 9 < deadline.timeout(30) <= 10
+    assert deadline.timeout(5) == 5
+
+
+def test_timeout_never_drops_below_the_minimum(at, monkeypatch):
+    monkeypatch.setenv("DEADLINE_MIN_TIMEOUT_SECONDS", "2")
+    at(-5)
+
+    assert deadline.remaining() == 0
+    assert deadline.timeout(30) == 2
+
+
+def test_short(at, monkeypatch):
+    monkeypatch.setenv("DEADLINE_SHORT_SECONDS", "20")
+    at(60)
+    assert not deadline.short()
+    at(10)
+    assert deadline.short()
+
+
+def test_with_deadline_keeps_the_rest_of_the_config():
+    config = {"configurable": {"thread_id": "t1"}}
+
+    assert deadline.with_deadline(config, None) is config
+    assert deadline.with_deadline(config, 123.0) == {"configurable": {"thread_id": "t1", "deadline": 123.0}}
+    assert config == {"configurable": {"thread_id": "t1"}}
+
+
+def test_bind_carries_the_run_deadline_into_sync_and_async_nodes():
+    def sync_node(state):
+        return {"seen": state["seen"] + [deadline.current()]}
+
+    async def async_node(state):
+        return {"seen": state["seen"] + [deadline.current()]}
+
+    graph = StateGraph(Steps)
+    # Wrapped as Graph.py wraps every node.
+    graph.add_node("sync_node", instrument_node("sync_node", deadline.bind("sync_node", sync_node)))
+    graph.add_node("async_node", instrument_node("async_node", deadline.bind("async_node", async_node)))
+    graph.add_edge(START, "sync_node")
+    graph.add_edge("sync_node", "async_node")
+    graph.add_edge("async_node", END)
+
+    run_deadline = time.time() + 100
+    config = deadline.with_deadline({"configurable": {"thread_id": "deadline-test"}}, run_deadline)
+    result = asyncio.run(graph.compile().ainvoke({"seen": []}, config))
+
+    assert result["seen"] == [run_deadline, run_deadline]
+    assert {("budget", "sync_node"), ("budget", "async_node")} <= set(metrics.run_summary("deadline-test"))
+
+
+def test_enforced_deadline_cancels_an_overrunning_node(monkeypatch):
+    monkeypatch.setenv("DEADLINE_ENFORCE", "1")
+    monkeypatch.setenv("DEADLINE_GRACE_SECONDS", "0.05")
+    monkeypatch.setattr(deadline, "_from_config", lambda: time.time() + 0.05)
+
+    async def slow_node(state):
+        await asyncio.sleep(5)
+
+    before = degradations("slow_node", "cancelled")
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(deadline.bind("slow_node", slow_node)({}))
+
+    assert degradations("slow_node", "cancelled") == before + 1
+
+
+def test_rejected_draft_goes_to_review_when_short(at):
+    state = {"grade": "bad", "iteration_count": 1}
+    assert route_internal(state) == "regenerate"
+
+    before = degradations("route_internal", "skip_regenerate")
+    at(5)
+
+    assert route_internal(state) == "human_review"
+    assert degradations("route_internal", "skip_regenerate") == before + 1
+
+
+def test_tiered_tasks_use_only_the_small_model_when_short(at):
+    assert tiers("evaluator") == ["evaluator_small", "evaluator"]
+
+    at(5)
+
+    assert tiers("evaluator") == ["evaluator_small"]
@@ -0,0 +1,69 @@
+from utils import facts
+
+SUMMARY = "Admissions for BS programs open on 1 July 2026. The last date to apply is 2026-07-15."
+FACTS = [
+    {"kind": "deadline", "label": "Last date to apply", "value": "15 July 2026", "date": "2026-07-15"},
+    {"kind": "link", "label": "Apply online", "value": "Online portal", "url": "https://admissions.pu.edu.pk/apply"},
+]
+SOURCES = ["https://pu.edu.pk/admissions"]
+
+
+def draft(**overrides):
+    values = {
+        "university_name": "University of the Punjab",
+        "post_heading": "BS admissions open on 1 July",
+        "post_content": "Apply by 15 July 2026. Please refer to the official website for more details.",
+        "relevant_url": "https://pu.edu.pk/admissions",
+        "timestamp": "1 July 2026",
+    }
+    values.update(overrides)
+    return values
+
+
+def test_find_dates_reads_every_format():
+    assert facts.find_dates("2026-07-15") == [frozenset({(2026, 7, 15)})]
+    assert facts.find_dates("15th of July") == [frozenset({(None, 7, 15)})]
+    assert facts.find_dates("July 15, 2026") == [frozenset({(2026, 7, 15)})]
+    assert facts.find_dates("05/07/2026") == [frozenset({(2026, 7, 5), (2026, 5, 7)})]
+    assert facts.find_dates("2026-07-15T09:30:00+00:00") == [frozenset({(2026, 7, 15)})]
+    assert facts.find_dates("31/31/2026 and 32 July") == []
+
+
+def test_check_draft_accepts_a_grounded_draft():
+    assert facts.check_draft(draft(), FACTS, SOURCES, SUMMARY) == []
+
+
+def test_check_draft_accepts_the_source_date():
+    # The generator is handed the stored timestamp as "Source Date"; quoting it is not a hallucination.
+    stored = "2026-06-30 08:15:00+00:00"
+    post = draft(timestamp="2026-06-30")
+    assert facts.check_draft(post, FACTS, SOURCES, SUMMARY) != []
+    assert facts.check_draft(post, FACTS, SOURCES, SUMMARY, [stored, None, "NULL"]) == []
+
+
+def test_check_draft_rejects_unsupported_dates():
+    problems = facts.check_draft(draft(post_heading="Admissions close on 20 August"), FACTS, SOURCES, SUMMARY)
+    assert problems == ["Dates not found in the source: 20 August."]
+
+
+def test_check_draft_reports_missing_fields_and_disclaimer():
+    problems = facts.check_draft(draft(relevant_url="", post_content="Apply by 15 July."), FACTS, SOURCES, SUMMARY)
+    assert "URL is missing." in problems
+    assert any("official website" in p for p in problems)
+
+
+def test_check_draft_rejects_foreign_urls_but_allows_subdomains():
+    assert facts.check_draft(draft(relevant_url="https://admissions.pu.edu.pk/apply"), FACTS, SOURCES, SUMMARY) == []
+    problems = facts.check_draft(draft(relevant_url="https://example.com/pu"), FACTS, SOURCES, SUMMARY)
+    assert problems == ["URL https://example.com/pu does not belong to the source site."]
+
+
+def test_collect_falls_back_when_a_summary_has_no_facts():
+    records = {"a": {"summary": "s", "facts": FACTS}, "b": {"summary": "s", "facts": None}}
+    assert facts.collect(["a", "b"], records) is None
+    assert [f["source"] for f in facts.collect(["a"], records)] == ["a", "a"]
+
+
+def test_relevant_prefers_matching_facts():
+    chosen = facts.relevant(FACTS, "admission deadline")
+    assert chosen[0]["kind"] == "deadline"
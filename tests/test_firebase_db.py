@@ -0,0 +1,113 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from db import firebase_db
+from db.firebase_db import post_doc_id
+from nodes.save_post import asave_post_node
+from utils.metrics import current_thread_id
+from utils.resources import registry
+
+POST = {
+    "university_name": "University of Central Punjab",
+    "post_heading": "Admissions open",
+    "post_content": "Applications close on 15 July 2026. Please refer to the official website.",
+    "relevant_url": "https://ucp.edu.pk/admissions",
+    "timestamp": "2026-10-19",
+}
+# The same post after a retried run regenerated the draft.
+REGENERATED = {**POST, "post_heading": "Fall admissions are open", "timestamp": "2026-10-20"}
+
+emulator = pytest.mark.skipif(not os.environ.get("FIRESTORE_EMULATOR_HOST"),
+                              reason="FIRESTORE_EMULATOR_HOST is not set")
+
+
+def test_doc_id_is_stable_per_thread_and_url():
+    assert post_doc_id(POST, "job_post_1") == post_doc_id(REGENERATED, "job_post_1")
+    assert post_doc_id(POST, "job_post_1") != post_doc_id(POST, "job_post_2")
+    assert post_doc_id(POST, "job_post_1") != post_doc_id({**POST, "relevant_url": "https://ucp.edu.pk"}, "job_post_1")
+
+
+def test_doc_id_without_a_thread_hashes_the_content():
+    assert post_doc_id(dict(POST)) == post_doc_id(POST)
+    assert post_doc_id(POST) != post_doc_id(REGENERATED)
+
+
+def test_save_post_node_uses_the_thread_doc_id(monkeypatch):
+    saved = []
+
+    async def save(post_data, doc_id=None):
+        saved.append(doc_id)
+        return doc_id
+
+    monkeypatch.setattr("nodes.save_post.asave_post_to_firestore", save)
+    token = current_thread_id.set("job_post_1")
+    try:
+        asyncio.run(asave_post_node(POST))
+        asyncio.run(asave_post_node(REGENERATED))
+    finally:
+        current_thread_id.reset(token)
+
+    assert saved == [post_doc_id(POST, "job_post_1")] * 2
+
+
+# --- AGAINST THE EMULATOR ---
+@pytest.fixture
+def collection(monkeypatch):
+    """A fresh collection per test, so runs against a shared emulator don't see each other's posts."""
+    name = f"test-{uuid.uuid4().hex}"
+    monkeypatch.setattr(firebase_db, "POSTS_COLLECTION", name)
+    registry.reset("firestore")
+    yield registry.get("firestore").collection(name)
+    registry.reset("firestore")
+
+
+def count(collection) -> int:
+    return len(list(collection.list_documents()))
+
+
+def posts(n: int) -> list:
+    return [{**POST, "relevant_url": f"https://ucp.edu.pk/news/{i}"} for i in range(n)]
+
+
+@emulator
+def test_set_stores_the_post(collection):
+    doc_id = firebase_db.save_post_to_firestore(POST, post_doc_id(POST, "job_post_1"))
+
+    assert collection.document(doc_id).get().to_dict() == POST
+
+
+@emulator
+def test_async_set_stores_the_post(collection):
+    doc_id = asyncio.run(firebase_db.asave_post_to_firestore(POST))
+
+    assert collection.document(doc_id).get().to_dict() == POST
+
+
+@emulator
+def test_batch_save_beyond_one_write_batch(collection):
+    ids = firebase_db.save_posts_to_firestore(posts(firebase_db.BATCH_LIMIT * 2 + 1))
+
+    assert len(ids) == len(set(ids)) == 1001
+    assert count(collection) == 1001
+
+
+@emulator
+def test_async_batch_save_beyond_one_write_batch(collection):
+    ids = asyncio.run(firebase_db.asave_posts_to_firestore(posts(firebase_db.BATCH_LIMIT + 1)))
+
+    assert len(ids) == 501
+    assert count(collection) == 501
+
+
+@emulator
+def test_resaving_is_idempotent(collection):
+    firebase_db.save_posts_to_firestore(posts(3))
+    firebase_db.save_posts_to_firestore(posts(3))
+    doc_id = firebase_db.save_post_to_firestore(POST, post_doc_id(POST, "job_post_1"))
+    firebase_db.save_post_to_firestore(REGENERATED, post_doc_id(REGENERATED, "job_post_1"))
+
+    assert count(collection) == 4
+    assert collection.document(doc_id).get().to_dict() == REGENERATED
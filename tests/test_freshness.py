@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+import pytest
+
+from routes.db_route import FRESHNESS_THRESHOLD
+from utils import freshness
+
+DAY = 86400
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("30m", timedelta(minutes=30)),
+    (" 6H ", timedelta(hours=6)),
+    ("1.5d", timedelta(days=1.5)),
+])
+def test_parse_duration(text, expected):
+    assert freshness._parse_duration(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "  ", "h", "6", "6w", "0h", "-2d", "nand", "infh"])
+def test_parse_duration_rejects_malformed_and_non_positive(text):
+    with pytest.raises(ValueError):
+        freshness._parse_duration(text)
+
+
+def test_overrides_skip_bad_entries(monkeypatch):
+    monkeypatch.setenv("FRESHNESS_OVERRIDES", "PU.edu.pk=6h, ucp.edu.pk=,fast.edu.pk=0d,=3d,nust.edu.pk=14d,junk")
+
+    assert freshness.overrides() == {"pu.edu.pk": timedelta(hours=6), "nust.edu.pk": timedelta(days=14)}
+
+
+def test_ttl_from_history_needs_enough_samples(monkeypatch):
+    monkeypatch.setenv("FRESHNESS_MIN_SAMPLES", "3")
+
+    assert freshness.ttl_from_history(2, 1, 30 * DAY) is None
+    assert freshness.ttl_from_history(5, 1, 0) is None
+
+
+def test_ttl_from_history_is_a_fraction_of_the_change_interval(monkeypatch):
+    monkeypatch.setenv("FRESHNESS_CHANGE_FRACTION", "0.5")
+
+    # 3 changes (+1 for the open interval) over 40 days: one every 10 days.
+    assert freshness.ttl_from_history(20, 3, 40 * DAY) == timedelta(days=5)
+    # Pooled over two URLs, the unseen change is counted once per URL.
+    assert freshness.ttl_from_history(20, 2, 40 * DAY, urls=2) == timedelta(days=5)
+
+
+def test_ttl_from_history_is_clamped(monkeypatch):
+    monkeypatch.setenv("FRESHNESS_MIN_HOURS", "2")
+    monkeypatch.setenv("FRESHNESS_MAX_DAYS", "30")
+
+    assert freshness.ttl_from_history(50, 49, DAY) == timedelta(hours=2)
+    assert freshness.ttl_from_history(10, 0, 365 * DAY) == timedelta(days=30)
+
+
+def test_ttl_for_stats_prefers_override_then_url_then_domain(monkeypatch):
+    monkeypatch.setenv("FRESHNESS_OVERRIDES", "pinned.edu.pk=6h")
+    url = "https://a.edu.pk/admissions"
+    stats = {url: (10, 3, 40 * DAY), "https://a.edu.pk/news": (2, 0, DAY)}
+
+    assert freshness.ttl_for_stats(url, "pinned.edu.pk", stats) == (timedelta(hours=6), "override")
+    assert freshness.ttl_for_stats(url, "a.edu.pk", stats)[1] == "url"
+    assert freshness.ttl_for_stats("https://a.edu.pk/fees", "a.edu.pk", stats)[1] == "domain"
+    assert freshness.ttl_for_stats(url, "a.edu.pk", {}) == (FRESHNESS_THRESHOLD, "default")
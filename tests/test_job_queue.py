@@ -0,0 +1,196 @@
+import asyncio
+import os
+import uuid
+
+import psycopg
+import pytest
+from psycopg.conninfo import make_conninfo
+
+from db import job_queue
+from db.pool import get_async_pool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.conn.executed.append(query)
+
+    async def fetchone(self):
+        return (1,)
+
+
+class FakeConn:
+    def __init__(self):
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def connection(self):
+        return self
+
+    def cursor(self, row_factory=None):
+        return FakeCursor(self)
+
+    async def execute(self, query, params=None):
+        self.executed.append(query)
+
+
+@pytest.fixture
+def fake_conn(monkeypatch):
+    conn = FakeConn()
+
+    async def get_pool(database_url):
+        return conn
+
+    monkeypatch.setenv("DATABASE_URL", "postgresql://unused")
+    monkeypatch.setattr(job_queue, "get_async_pool", get_pool)
+    return conn
+
+
+def job(attempts: int, max_attempts: int = 3) -> dict:
+    return {"id": 1, "thread_id": "job_post_1", "attempts": attempts, "max_attempts": max_attempts}
+
+
+def test_resume_enqueues_and_closes_the_interrupted_row_in_one_statement(fake_conn):
+    asyncio.run(job_queue.aenqueue("job", "job_post_1", job_queue.RESUME, {"as_node": "human_review"}))
+
+    assert fake_conn.executed == [job_queue.ENQUEUE_RESUME_QUERY]
+
+
+def test_failure_below_max_attempts_is_retried(fake_conn):
+    asyncio.run(job_queue.afail(job(attempts=2), "worker", "groq is down"))
+
+    assert fake_conn.executed == [job_queue.RETRY_QUERY]
+
+
+def test_failure_on_the_last_attempt_is_dead_lettered(fake_conn):
+    asyncio.run(job_queue.afail(job(attempts=3), "worker", "groq is down"))
+
+    assert fake_conn.executed == [job_queue.DEAD_LETTER_QUERY]
+
+
+# --- AGAINST POSTGRES ---
+@pytest.fixture
+def queue(monkeypatch):
+    """A throwaway schema on TEST_DATABASE_URL with the queue tables; DATABASE_URL points at it."""
+    base_url = os.environ.get("TEST_DATABASE_URL")
+    if not base_url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    schema = f"test_{uuid.uuid4().hex}"
+    with psycopg.connect(base_url, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    url = make_conninfo(base_url, options=f"-c search_path={schema}")
+    monkeypatch.setenv("DATABASE_URL", url)
+
+    def run(body):
+        async def main():
+            await job_queue.acreate_queue_tables()
+            try:
+                return await body()
+            finally:
+                await (await get_async_pool(url)).close()
+
+        return asyncio.run(main())
+
+    yield run
+    with psycopg.connect(base_url, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def sql(query: str, *params) -> list:
+    with psycopg.connect(os.environ["DATABASE_URL"], autocommit=True) as conn:
+        cur = conn.execute(query, params)
+        return cur.fetchall() if cur.description else []
+
+
+def expire_leases():
+    sql("UPDATE graph_jobs SET lease_expires_at = NOW() - INTERVAL '1 minute' WHERE status = 'running'")
+
+
+def test_claim_takes_each_job_once(queue):
+    async def body():
+        await job_queue.aenqueue("job", "job_post_1")
+        return await job_queue.aclaim("w1", 60), await job_queue.aclaim("w2", 60)
+
+    first, second = queue(body)
+
+    assert (first["thread_id"], first["attempts"]) == ("job_post_1", 1)
+    assert second is None
+
+
+def test_failed_job_is_retried_after_a_backoff(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "backoff_seconds", lambda attempts: 3600)
+
+    async def body():
+        await job_queue.aenqueue("job", "job_post_1")
+        await job_queue.afail(await job_queue.aclaim("w1", 60), "w1", "groq is down")
+        return await job_queue.aclaim("w1", 60)
+
+    assert queue(body) is None
+    assert sql("SELECT status, attempts, last_error FROM graph_jobs") == [("queued", 1, "groq is down")]
+
+
+def test_failure_on_the_last_attempt_moves_the_job_to_the_dead_table(queue):
+    async def body():
+        await job_queue.aenqueue("job", "job_post_1", max_attempts=1)
+        await job_queue.afail(await job_queue.aclaim("w1", 60), "w1", "groq is down")
+        return await job_queue.aqueue_stats()
+
+    assert queue(body) == {"dead": 1}
+
+
+def test_expired_lease_is_reclaimed_while_attempts_remain(queue):
+    async def body():
+        await job_queue.aenqueue("job", "job_post_1", max_attempts=2)
+        await job_queue.aclaim("w1", 60)
+        expire_leases()
+        return await job_queue.aclaim("w2", 60)
+
+    reclaimed = queue(body)
+
+    assert (reclaimed["thread_id"], reclaimed["attempts"]) == ("job_post_1", 2)
+
+
+def test_expired_lease_on_the_last_attempt_is_dead_lettered_at_claim(queue):
+    async def body():
+        await job_queue.aenqueue("job", "job_post_1", max_attempts=1)
+        await job_queue.aclaim("w1", 60)
+        expire_leases()
+        return await job_queue.aclaim("w2", 60), await job_queue.aqueue_stats()
+
+    claimed, stats = queue(body)
+
+    assert claimed is None
+    assert stats == {"dead": 1}
+
+
+def test_resume_keeps_the_interrupted_row_while_the_thread_has_an_active_job(queue):
+    async def body():
+        await job_queue.aenqueue("job", "job_post_1")
+        sql("INSERT INTO graph_jobs (job_id, thread_id, kind, status) "
+            "VALUES ('job', 'job_post_1', 'run', 'interrupted')")
+        skipped = await job_queue.aenqueue("job", "job_post_1", job_queue.RESUME)
+        interrupted = sql("SELECT COUNT(*) FROM graph_jobs WHERE status = 'interrupted'")[0][0]
+        sql("UPDATE graph_jobs SET status = 'done' WHERE status = 'queued'")
+        queued = await job_queue.aenqueue("job", "job_post_1", job_queue.RESUME)
+        return skipped, interrupted, queued
+
+    skipped, interrupted, queued = queue(body)
+
+    assert skipped is None and interrupted == 1
+    assert queued is not None
+    assert sql("SELECT kind, status FROM graph_jobs ORDER BY id") == [
+        ("run", "done"), ("run", "done"), ("resume", "queued")
+    ]
@@ -0,0 +1,174 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from api import server
+from api.jobs import AWAITING_REVIEW, COMPLETED, FAILED, JobManager
+from api.schemas import ReviewDecision
+
+
+class FakeAgent:
+    """Runs every thread through one node; with `review`, each thread stops once before human_review."""
+
+    def __init__(self, review=False, update_error=None):
+        self.review = review
+        self.reviewed = set()
+        self.update_error = update_error
+
+    async def astream(self, graph_input, config, stream_mode=None, interrupt_before=None):
+        yield {"generate_post": {}}
+
+    async def aget_state(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        waiting = self.review and thread_id not in self.reviewed
+        return SimpleNamespace(values={"post_heading": "Admissions open"},
+                               next=("human_review",) if waiting else ())
+
+    async def aupdate_state(self, config, values, as_node=None):
+        if self.update_error is not None:
+            raise self.update_error
+        self.reviewed.add(config["configurable"]["thread_id"])
+
+
+def run_with_manager(agent, body, monkeypatch):
+    """Runs `body(manager)` against a started JobManager that server routes also use."""
+    async def get_agent():
+        return agent
+
+    async def run():
+        manager = JobManager(get_agent, num_workers=2)
+        monkeypatch.setattr(server, "manager", manager)
+        await manager.start()
+        try:
+            return await asyncio.wait_for(body(manager), timeout=5)
+        finally:
+            await manager.stop()
+
+    return asyncio.run(run())
+
+
+async def read_events(job_id: str) -> list:
+    response = await server.stream_job_events(job_id)
+    return [json.loads(chunk[len("data: "):]) async for chunk in response.body_iterator if chunk.startswith("data: ")]
+
+
+async def wait_for_status(job, status: str):
+    while job.status != status:
+        await asyncio.sleep(0.01)
+
+
+def test_event_stream_ends_when_the_job_finishes(monkeypatch):
+    async def body(manager):
+        job = await manager.submit("ucp.edu.pk admissions")
+        return job, await read_events(job.job_id)
+
+    job, events = run_with_manager(FakeAgent(), body, monkeypatch)
+
+    assert job.status == COMPLETED
+    assert events[-1]["type"] == "status" and events[-1]["status"] == COMPLETED
+    assert [e["node"] for e in events if e["type"] == "node"] == ["generate_post"]
+
+
+def test_event_stream_stays_open_while_a_thread_waits(monkeypatch):
+    async def body(manager):
+        job = await manager.submit("ucp.edu.pk admissions")
+        await wait_for_status(job, "waiting")
+        reader = asyncio.ensure_future(read_events(job.job_id))
+        await asyncio.sleep(0.05)
+        assert not reader.done()
+
+        await server.submit_review(f"{job.job_id}_post_1", ReviewDecision(approved=True))
+        return await reader
+
+    events = run_with_manager(FakeAgent(review=True), body, monkeypatch)
+
+    assert [e["status"] for e in events if e["type"] == "status"][-1] == COMPLETED
+    assert AWAITING_REVIEW in [e["status"] for e in events if e["type"] == "status"]
+
+
+def test_review_of_an_unknown_thread_is_a_404(monkeypatch):
+    async def body(manager):
+        with pytest.raises(HTTPException) as e:
+            await server.submit_review("nope_post_1", ReviewDecision(approved=True))
+        return e.value.status_code
+
+    assert run_with_manager(FakeAgent(), body, monkeypatch) == 404
+
+
+def test_key_error_while_resuming_is_not_reported_as_unknown_thread(monkeypatch):
+    async def body(manager):
+        job = await manager.submit("ucp.edu.pk admissions")
+        await wait_for_status(job, "waiting")
+        with pytest.raises(KeyError):
+            await server.submit_review(f"{job.job_id}_post_1", ReviewDecision(approved=True))
+        return job
+
+    job = run_with_manager(FakeAgent(review=True, update_error=KeyError("blob:sha256:missing")), body, monkeypatch)
+
+    # The decision can be sent again once the problem is fixed.
+    assert job.threads[f"{job.job_id}_post_1"] == AWAITING_REVIEW
+
+
+def test_finished_jobs_are_evicted_after_the_retention_period(monkeypatch):
+    monkeypatch.setenv("API_JOB_RETENTION_SECONDS", "0")
+
+    async def body(manager):
+        first = await manager.submit("first")
+        await wait_for_status(first, COMPLETED)
+        second = await manager.submit("second")
+        return manager, first, second
+
+    manager, first, second = run_with_manager(FakeAgent(), body, monkeypatch)
+
+    assert first.job_id not in manager.jobs
+    assert manager.job_for_thread(f"{first.job_id}_post_1") is None
+    assert second.job_id in manager.jobs
+
+
+def test_finished_jobs_beyond_the_history_cap_are_evicted_oldest_first(monkeypatch):
+    monkeypatch.setenv("API_JOB_HISTORY", "1")
+
+    async def body(manager):
+        jobs = []
+        for query in ("first", "second", "third"):
+            jobs.append(await manager.submit(query))
+            await wait_for_status(jobs[-1], COMPLETED)
+        return manager, jobs
+
+    manager, jobs = run_with_manager(FakeAgent(), body, monkeypatch)
+
+    assert [job.job_id in manager.jobs for job in jobs] == [False, True, True]
+
+
+def test_waiting_jobs_are_kept(monkeypatch):
+    monkeypatch.setenv("API_JOB_RETENTION_SECONDS", "0")
+
+    async def body(manager):
+        waiting = await manager.submit("waiting")
+        await wait_for_status(waiting, "waiting")
+        await manager.submit("next")
+        return manager, waiting
+
+    manager, waiting = run_with_manager(FakeAgent(review=True), body, monkeypatch)
+
+    assert waiting.job_id in manager.jobs
+    assert waiting.finished_at is None
+
+
+def test_failed_job_finishes_its_event_stream(monkeypatch):
+    class FailingAgent(FakeAgent):
+        async def astream(self, graph_input, config, stream_mode=None, interrupt_before=None):
+            raise RuntimeError("groq is down")
+            yield
+
+    async def body(manager):
+        job = await manager.submit("failed")
+        return job, await read_events(job.job_id)
+
+    job, events = run_with_manager(FailingAgent(), body, monkeypatch)
+
+    assert job.status == FAILED and job.finished_at is not None
+    assert events[-1]["status"] == FAILED
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from utils.metrics import instrument_node, metrics
+
+
+def count(name: str, node: str) -> float:
+    return metrics.counter_values(name).get((("node", node),), 0)
+
+
+def test_failed_node_counts_as_error():
+    async def node(state):
+        raise ValueError("bad state")
+
+    with pytest.raises(ValueError):
+        asyncio.run(instrument_node("test_failing", node)({}))
+
+    assert count("lumina_node_errors_total", "test_failing") == 1
+    assert count("lumina_node_cancelled_total", "test_failing") == 0
+
+
+def test_cancelled_node_is_not_an_error():
+    async def node(state):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(instrument_node("test_cancelled", node)({}))
+        await asyncio.sleep(0)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+
+    assert count("lumina_node_cancelled_total", "test_cancelled") == 1
+    assert count("lumina_node_errors_total", "test_cancelled") == 0
+
+
+def test_label_values_are_escaped_in_the_exposition():
+    metrics.inc("test_escaped_total", reason='bad "quote"\\path\nnext line')
+
+    line = next(line for line in metrics.render_prometheus().splitlines() if line.startswith("test_escaped_total"))
+
+    assert line == 'test_escaped_total{reason="bad \\"quote\\"\\\\path\\nnext line"} 1.0'
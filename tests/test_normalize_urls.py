@@ -0,0 +1,56 @@
+import pytest
+
+from utils.normalize_urls import normalize_url, url_key
+
+
+@pytest.mark.parametrize("url", [
+    "https://ucp.edu.pk",
+    "https://UCP.edu.pk/",
+    "www.ucp.edu.pk",
+    "ucp.edu.pk/?utm_source=x&utm_medium=y",
+    "  https://ucp.edu.pk:443/#admissions ",
+    "https://ucp.edu.pk./?gclid=abc&fbclid=def",
+])
+def test_aliases_share_one_key(url):
+    assert normalize_url(url) == "https://ucp.edu.pk"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://portal.uni.edu.pk:8080/apply", "http://portal.uni.edu.pk:8080/apply"),
+    ("http://www.uni.edu.pk:80/", "http://uni.edu.pk"),
+    ("https://uni.edu.pk:80/", "https://uni.edu.pk:80"),
+    ("http://uni.edu.pk:443", "http://uni.edu.pk:443"),
+    ("HTTPS://uni.edu.pk:443/apply", "https://uni.edu.pk/apply"),
+])
+def test_scheme_is_kept_and_only_its_default_port_dropped(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_lookup_key_folds_http_into_https():
+    assert url_key("http://www.ucp.edu.pk/") == url_key("https://ucp.edu.pk") == "https://ucp.edu.pk"
+    assert url_key("http://portal.uni.edu.pk:8080/apply") == "https://portal.uni.edu.pk:8080/apply"
+    assert url_key("https://uni.edu.pk:80") == "https://uni.edu.pk:80"
+
+
+def test_query_is_sorted_and_tracking_params_dropped():
+    url = "https://pu.edu.pk/news?page=2&UTM_Campaign=fall&id=7&ref=home"
+
+    assert normalize_url(url) == "https://pu.edu.pk/news?id=7&page=2"
+
+
+def test_path_case_and_non_default_port_are_kept():
+    assert normalize_url("https://www.pu.edu.pk:8443/Admissions/") == "https://pu.edu.pk:8443/Admissions"
+
+
+def test_idna_host():
+    assert normalize_url("https://bücher.de/") == normalize_url("https://xn--bcher-kva.de")
+
+
+def test_www_is_kept_when_it_is_the_whole_name():
+    assert normalize_url("https://www.pk") == "https://www.pk"
+
+
+@pytest.mark.parametrize("url", ["ftp://ucp.edu.pk", "https://localhost", "https://ucp.edu.pk:99999", "not a url"])
+def test_invalid_urls_raise(url):
+    with pytest.raises(ValueError):
+        normalize_url(url)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from db import job_queue
+from utils.fanout import FANOUT_NODE
+from workers import queue_worker
+
+
+class FakeAgent:
+    """Records the config of every ainvoke; the thread stops before `next_node` (None: it finished)."""
+
+    def __init__(self, next_node=None):
+        self.next_node = next_node
+        self.configs = []
+
+    async def aget_state(self, config):
+        return SimpleNamespace(values={}, next=(self.next_node,) if self.next_node else ())
+
+    async def ainvoke(self, graph_input, config, interrupt_before=None):
+        self.configs.append(config)
+
+
+def job(payload: dict, kind: str = job_queue.RUN) -> dict:
+    return {"id": 1, "job_id": "job", "thread_id": "job_post_1", "kind": kind, "payload": payload}
+
+
+def test_run_job_sets_a_deadline_from_the_payload():
+    agent = FakeAgent()
+    started = time.time()
+
+    asyncio.run(queue_worker.run_job(agent, job({"query": "ucp.edu.pk", "deadline_seconds": 60})))
+
+    assert started + 59 < agent.configs[0]["configurable"]["deadline"] <= time.time() + 60
+
+
+def test_run_job_falls_back_to_run_deadline_seconds(monkeypatch):
+    monkeypatch.setenv("RUN_DEADLINE_SECONDS", "30")
+    agent = FakeAgent()
+
+    asyncio.run(queue_worker.run_job(agent, job({"query": "ucp.edu.pk"})))
+
+    assert agent.configs[0]["configurable"]["deadline"] <= time.time() + 30
+
+
+def test_run_job_without_any_budget_has_no_deadline(monkeypatch):
+    monkeypatch.delenv("RUN_DEADLINE_SECONDS", raising=False)
+    agent = FakeAgent()
+
+    asyncio.run(queue_worker.run_job(agent, job({"query": "ucp.edu.pk"})))
+
+    assert "deadline" not in agent.configs[0]["configurable"]
+
+
+def test_fanout_children_inherit_the_forking_stretch_deadline(monkeypatch):
+    queued = []
+
+    async def aenqueue(job_id, thread_id, kind, payload):
+        queued.append((thread_id, payload))
+
+    async def aseed_post_threads(agent, config, thread_ids):
+        return []
+
+    monkeypatch.setattr(job_queue, "aenqueue", aenqueue)
+    monkeypatch.setattr(queue_worker, "aseed_post_threads", aseed_post_threads)
+    agent = FakeAgent(next_node=FANOUT_NODE)
+
+    result = asyncio.run(queue_worker.run_job(agent, job({"query": "q", "num_posts": 2, "deadline_seconds": 60})))
+
+    run_deadline = agent.configs[0]["configurable"]["deadline"]
+    assert result["forked"] == ["job_post_1", "job_post_2"]
+    assert [payload for _, payload in queued] == [{"deadline": run_deadline, "deadline_seconds": 60}] * 2
+
+
+def test_child_job_runs_under_the_inherited_deadline():
+    agent = FakeAgent()
+    inherited = time.time() + 5
+
+    asyncio.run(queue_worker.run_job(agent, job({"deadline": inherited, "deadline_seconds": 60})))
+
+    assert agent.configs[0]["configurable"]["deadline"] == inherited
+
+
+@pytest.mark.parametrize("thread_id, job_id", [("abc_shared", "abc"), ("abc_post_3", "abc")])
+def test_job_id_of(thread_id, job_id):
+    assert queue_worker.job_id_of(thread_id) == job_id
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from nodes import scrape_with_jina, summarization
+from utils.metrics import metrics
+from workers import refresh_scheduler
+
+URL = "https://ucp.edu.pk"
+
+
+class FakeModel:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def ainvoke(self, messages):
+        if self.error is not None:
+            raise self.error
+        return type("Response", (), {"content": "Admissions open until 15 July 2026."})()
+
+
+@pytest.fixture
+def refresh(monkeypatch):
+    stored = []
+
+    async def insert(**row):
+        stored.append(row)
+        return 1
+
+    def run(page: str, model: FakeModel):
+        async def scrape(urls):
+            return {url: page for url in urls}
+
+        monkeypatch.setattr(scrape_with_jina, "ascrape_urls_with_jina", scrape)
+        monkeypatch.setattr(refresh_scheduler, "get_llm", lambda name: model)
+        monkeypatch.setattr(summarization, "ainsert_university", insert)
+        return asyncio.run(refresh_scheduler.arefresh_url("UCP", URL))
+
+    return run, stored
+
+
+def failures() -> float:
+    return metrics.counter_values("lumina_refresh_total").get((("outcome", "failed"),), 0)
+
+
+def test_failed_scrape_keeps_the_stored_summary(refresh):
+    run, stored = refresh
+    before = failures()
+
+    with pytest.raises(RuntimeError, match="scrape failed"):
+        run("[JINA ERROR] 503 Service Unavailable", FakeModel())
+
+    assert stored == []
+    assert failures() == before + 1
+
+
+def test_failed_summarization_keeps_the_stored_summary(refresh):
+    run, stored = refresh
+    before = failures()
+
+    with pytest.raises(RuntimeError, match=summarization.SUMMARY_ERROR_PREFIX):
+        run("Admissions are open until 15 July 2026.", FakeModel(error=ConnectionError("reset")))
+
+    assert stored == []
+    assert failures() == before + 1
+
+
+def test_successful_refresh_stores_the_new_summary(refresh):
+    run, stored = refresh
+
+    assert run("Admissions are open until 15 July 2026.", FakeModel()) == "Admissions open until 15 July 2026."
+    assert [(row["url"], row["summary"]) for row in stored] == [(URL, "Admissions open until 15 July 2026.")]
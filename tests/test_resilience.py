@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from utils.metrics import metrics
+from utils.resilience import ahedged_call
+
+LIMIT = 0.4
+
+
+def model(answer=None, delay=0.0, error=None, calls=None, label=""):
+    async def call():
+        if calls is not None:
+            calls.append(label)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return answer
+    return call
+
+
+def outcomes(name: str) -> dict:
+    counts = {}
+    for labels, value in metrics.counter_values("lumina_llm_resilience_total").items():
+        labels = dict(labels)
+        if labels["client"] == name:
+            counts[labels["outcome"]] = value
+    return counts
+
+
+def test_fast_primary_wins_without_a_hedge():
+    calls = []
+    result = asyncio.run(ahedged_call("test_fast", model("primary", calls=calls, label="primary"),
+                                      model("secondary", calls=calls, label="secondary"), LIMIT))
+
+    assert result == "primary"
+    assert calls == ["primary"]
+    assert outcomes("test_fast") == {"primary_won": 1}
+
+
+def test_slow_primary_is_hedged_to_the_secondary():
+    result = asyncio.run(ahedged_call("test_hedge", model("primary", delay=1), model("secondary"), LIMIT))
+
+    assert result == "secondary"
+    assert outcomes("test_hedge") == {"hedged": 1, "hedge_won": 1}
+
+
+def test_hedge_goes_to_the_primary_without_a_secondary():
+    calls = []
+    result = asyncio.run(ahedged_call("test_same", model("primary", delay=0.3, calls=calls, label="primary"),
+                                      None, LIMIT))
+
+    assert result == "primary"
+    assert calls == ["primary", "primary"]
+
+
+def test_retryable_error_fails_over_at_once():
+    async def run():
+        started = asyncio.get_running_loop().time()
+        result = await ahedged_call("test_failover", model(error=ConnectionError("reset")), model("secondary"), 10)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, seconds = asyncio.run(run())
+
+    assert result == "secondary"
+    assert seconds < 1
+    assert outcomes("test_failover") == {"failover": 1, "failover_won": 1}
+
+
+def test_other_errors_are_raised():
+    with pytest.raises(ValueError):
+        asyncio.run(ahedged_call("test_raise", model(error=ValueError("bad request")), model("secondary"), LIMIT))
+
+
+def test_budget_exceeded_raises_timeout():
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(ahedged_call("test_timeout", model(delay=5), model(delay=5), LIMIT))
+
+    assert outcomes("test_timeout") == {"hedged": 1, "timeout": 1}
+
+
+def test_no_hedge_when_hedging_is_off(monkeypatch):
+    monkeypatch.setenv("LLM_HEDGING", "0")
+    calls = []
+    result = asyncio.run(ahedged_call("test_no_hedge", model("primary", delay=0.3, calls=calls, label="primary"),
+                                      model("secondary", calls=calls, label="secondary"), LIMIT))
+
+    assert result == "primary"
+    assert calls == ["primary"]
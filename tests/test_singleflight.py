@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from psycopg_pool import PoolTimeout
+
+from utils import singleflight
+
+
+class FakeConn:
+    def __init__(self):
+        self.queries = []
+        self.closed = False
+
+    async def execute(self, query, params=None):
+        self.queries.append(query.split("(")[0].split()[-1])
+
+
+class FakePool:
+    def __init__(self, exhausted=False):
+        self.conn = FakeConn()
+        self.exhausted = exhausted
+        self.returned = []
+
+    async def getconn(self, timeout=None):
+        if self.exhausted:
+            raise PoolTimeout("no connection")
+        return self.conn
+
+    async def putconn(self, conn):
+        self.returned.append(conn)
+
+
+@pytest.fixture
+def lock_pool(monkeypatch):
+    monkeypatch.setenv("SINGLEFLIGHT_PG_LOCKS", "1")
+    pool = FakePool()
+
+    async def get_pool(*args, **kwargs):
+        assert kwargs["name"] == singleflight.LOCK_POOL and kwargs["autocommit"] is True
+        return pool
+
+    monkeypatch.setattr(singleflight, "get_async_pool", get_pool)
+    return pool
+
+
+def test_concurrent_callers_share_one_computation(monkeypatch):
+    monkeypatch.setenv("SINGLEFLIGHT_PG_LOCKS", "0")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    async def main():
+        return await asyncio.gather(*(singleflight.ado("k", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["summary"] * 5
+    assert len(calls) == 1
+
+
+def test_lock_is_released_after_the_computation(lock_pool):
+    async def recheck():
+        return None
+
+    async def compute():
+        # The lock connection isn't in a transaction while the work runs; call() uses the main pool.
+        assert lock_pool.conn.queries == ["pg_advisory_lock"]
+        return "summary"
+
+    assert asyncio.run(singleflight.ado("k", compute, recheck)) == "summary"
+    assert lock_pool.conn.queries == ["pg_advisory_lock", "pg_advisory_unlock"]
+    assert lock_pool.returned == [lock_pool.conn] and not lock_pool.conn.closed
+
+
+def test_recheck_result_skips_the_computation(lock_pool):
+    async def recheck():
+        return "stored by another worker"
+
+    async def compute():
+        raise AssertionError("should not run")
+
+    assert asyncio.run(singleflight.ado("k", compute, recheck)) == "stored by another worker"
+
+
+def test_failed_unlock_closes_the_connection(lock_pool):
+    async def failing_execute(query, params=None):
+        if "unlock" in query:
+            raise OSError("connection lost")
+        lock_pool.conn.queries.append("pg_advisory_lock")
+
+    async def close():
+        lock_pool.conn.closed = True
+
+    lock_pool.conn.execute = failing_execute
+    lock_pool.conn.close = close
+
+    async def recheck():
+        return None
+
+    async def compute():
+        return "summary"
+
+    with pytest.raises(OSError):
+        asyncio.run(singleflight.ado("k", compute, recheck))
+    assert lock_pool.conn.closed and lock_pool.returned == [lock_pool.conn]
+
+
+def test_runs_unlocked_when_no_lock_connection_is_free(lock_pool):
+    lock_pool.exhausted = True
+
+    async def recheck():
+        raise AssertionError("only consulted under the lock")
+
+    async def compute():
+        return "summary"
+
+    assert asyncio.run(singleflight.ado("k", compute, recheck)) == "summary"
+    assert lock_pool.conn.queries == []
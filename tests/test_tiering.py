@@ -0,0 +1,42 @@
+import asyncio
+
+from nodes.evaluate_post import grade_problem
+from utils.BaseModels import Feedback
+from utils.tiering import arun_tiered
+
+
+def run_evaluator(answers: dict):
+    asked = []
+
+    async def call(name):
+        asked.append(name)
+        return answers[name]
+
+    return asyncio.run(arun_tiered("evaluator", call, grade_problem)), asked
+
+
+def test_small_model_approval_is_confirmed_by_large_model():
+    result, asked = run_evaluator({
+        "evaluator_small": Feedback(grade="good", feedback=""),
+        "evaluator": Feedback(grade="bad", feedback="The deadline in the post is not in the summary."),
+    })
+
+    assert asked == ["evaluator_small", "evaluator"]
+    assert result.grade == "bad"
+
+
+def test_small_model_rejection_with_feedback_is_final():
+    result, asked = run_evaluator({
+        "evaluator_small": Feedback(grade="bad", feedback="Missing disclaimer."),
+    })
+
+    assert asked == ["evaluator_small"]
+    assert result.feedback == "Missing disclaimer."
+
+
+def test_forced_small_tier_keeps_its_approval(monkeypatch):
+    monkeypatch.setenv("MODEL_TIER_EVALUATOR", "small")
+    result, asked = run_evaluator({"evaluator_small": Feedback(grade="good", feedback="")})
+
+    assert asked == ["evaluator_small"]
+    assert result.grade == "good"
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from db import university_cache
+
+URL = "https://ucp.edu.pk"
+ROW = ("2026-10-01T00:00:00+00:00", "blob:summary", None)
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setenv("UNIVERSITY_CACHE", "1")
+    monkeypatch.setenv("UNIVERSITY_CACHE_NOTIFY", "0")
+    university_cache.clear()
+    yield
+    university_cache.clear()
+
+
+def lookup(url: str, row=ROW, during_load=None):
+    loads = []
+
+    async def load():
+        loads.append(url)
+        if during_load:
+            during_load()
+        return row
+
+    return asyncio.run(university_cache.aget(url, load)), loads
+
+
+def test_second_lookup_is_a_hit_under_any_alias():
+    assert lookup(URL) == (ROW, [URL])
+    assert lookup("http://www.UCP.edu.pk/") == (ROW, [])
+
+
+def test_missing_row_is_cached_too():
+    assert lookup(URL, row=None) == (None, [URL])
+    assert lookup(URL, row=None) == (None, [])
+
+
+def test_invalidate_drops_the_entry():
+    lookup(URL)
+    university_cache.invalidate("ucp.edu.pk/")
+
+    assert lookup(URL)[1] == [URL]
+
+
+def test_lookup_that_raced_a_write_is_not_cached():
+    lookup(URL, during_load=lambda: university_cache.invalidate(URL))
+
+    assert lookup(URL)[1] == [URL]
+
+
+def test_lookup_that_raced_a_clear_is_not_cached():
+    lookup(URL, during_load=university_cache.clear)
+
+    assert lookup(URL)[1] == [URL]
+
+
+def test_generation_reset_does_not_let_a_raced_lookup_in(monkeypatch):
+    monkeypatch.setenv("UNIVERSITY_CACHE_SIZE", "1")
+
+    def writes():
+        # Enough invalidations of other URLs to start the generation counts over.
+        for i in range(3):
+            university_cache.invalidate(f"https://other{i}.edu.pk")
+        university_cache.invalidate(URL)
+
+    lookup(URL, during_load=writes)
+
+    assert lookup(URL)[1] == [URL]
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setenv("UNIVERSITY_CACHE_SIZE", "2")
+    lookup("https://a.edu.pk")
+    lookup("https://b.edu.pk")
+    lookup("https://a.edu.pk")
+    lookup("https://c.edu.pk")
+
+    assert lookup("https://a.edu.pk")[1] == []
+    assert lookup("https://b.edu.pk")[1] == ["https://b.edu.pk"]
+
+
+def test_expired_entry_is_reloaded(monkeypatch):
+    monkeypatch.setenv("UNIVERSITY_CACHE_TTL_SECONDS", "0")
+    lookup(URL)
+
+    assert lookup(URL)[1] == [URL]
+
+
+def test_disabled_cache_always_loads(monkeypatch):
+    monkeypatch.setenv("UNIVERSITY_CACHE", "0")
+    lookup(URL)
+
+    assert lookup(URL)[1] == [URL]
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from routes.db_route import is_fresh, route_stale_urls
+from state import merge_url_records
+
+
+def test_merge_url_records_merges_each_url_field_by_field():
+    existing = {
+        "https://a.edu.pk": {"time_stamp": "2026-01-01", "summary": "blob:a", "stale": True},
+        "https://b.edu.pk": {"summary": "blob:b", "stale": False},
+    }
+    # Parallel scrape branches each report only their own URL.
+    update = {"https://a.edu.pk": {"content": "blob:a-page", "stale": False}, "https://c.edu.pk": {"stale": True}}
+
+    merged = merge_url_records(existing, update)
+
+    assert merged == {
+        "https://a.edu.pk": {"time_stamp": "2026-01-01", "summary": "blob:a", "content": "blob:a-page",
+                             "stale": False},
+        "https://b.edu.pk": {"summary": "blob:b", "stale": False},
+        "https://c.edu.pk": {"stale": True},
+    }
+    assert existing["https://a.edu.pk"]["stale"] is True
+
+
+def test_merge_url_records_accepts_missing_sides():
+    assert merge_url_records(None, None) == {}
+    assert merge_url_records(None, {"https://a.edu.pk": {"stale": True}}) == {"https://a.edu.pk": {"stale": True}}
+
+
+def test_route_stale_urls_sends_one_branch_per_stale_url():
+    state = {
+        "URL": ["https://a.edu.pk", "https://b.edu.pk", "https://c.edu.pk"],
+        "url_records": {"https://a.edu.pk": {"stale": False}, "https://b.edu.pk": {"stale": True}},
+    }
+
+    sends = route_stale_urls(state)
+
+    assert [(s.node, s.arg) for s in sends] == [
+        ("scrape_with_jina", {"scrape_url": "https://b.edu.pk"}),
+        ("scrape_with_jina", {"scrape_url": "https://c.edu.pk"}),
+    ]
+
+
+def test_route_stale_urls_goes_to_generation_when_all_fresh():
+    state = {"URL": "https://a.edu.pk", "url_records": {"https://a.edu.pk": {"stale": False}}}
+
+    assert route_stale_urls(state) == "generate_post"
+
+
+def test_is_fresh():
+    now = datetime.now(timezone.utc)
+
+    assert is_fresh((now - timedelta(days=1)).isoformat())
+    assert not is_fresh((now - timedelta(days=3)).isoformat())
+    assert is_fresh((now - timedelta(days=3)).isoformat(), timedelta(days=7))
+    assert not is_fresh("NULL")
+    assert not is_fresh("not a date")
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from db import write_behind
+from db.write_behind import UNIVERSITY, WriteBehind, _Journal
+
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("WRITE_BEHIND_DIR", str(tmp_path))
+    monkeypatch.setenv("WRITE_BEHIND_FSYNC", "0")
+    return tmp_path
+
+
+@pytest.fixture
+def flusher(journal_dir, monkeypatch):
+    delivered = []
+
+    async def deliver(payloads):
+        if any(p.get("bad") for p in payloads):
+            raise ValueError("rejected")
+        delivered.extend(p["n"] for p in payloads)
+
+    monkeypatch.setitem(write_behind.HANDLERS, UNIVERSITY, deliver)
+    wb = WriteBehind()
+    wb._journal = _Journal(str(journal_dir / "journal-test.jsonl"))
+    yield wb, delivered
+    wb._journal.close()
+
+
+def test_journal_replays_puts_without_acks(journal_dir):
+    path = str(journal_dir / "journal-a.jsonl")
+    journal = _Journal(path)
+    journal.put("k1", UNIVERSITY, {"n": 1})
+    journal.put("k2", UNIVERSITY, {"n": 2})
+    journal.ack(["k1"])
+    journal.file.write('{"t": "put", "key": "k3"')  # torn line from a crash mid-write
+    journal.close()
+
+    reopened = _Journal(path)
+    assert reopened.pending == {"k2": (UNIVERSITY, {"n": 2})}
+    reopened.ack(["k2"])
+    assert reopened.pending == {}
+    reopened.close()
+    assert open(path).read() == ""
+
+
+def test_journal_is_owned_by_one_process_at_a_time(journal_dir):
+    path = str(journal_dir / "journal-a.jsonl")
+    owner = _Journal(path)
+    with pytest.raises(BlockingIOError):
+        _Journal(path)
+    owner.close()
+
+
+def _rounds(wb, n):
+    for _ in range(n):
+        wb._backoff = {kind: (attempts, 0.0) for kind, (attempts, _) in wb._backoff.items()}
+        asyncio.run(wb.aflush_once())
+
+
+def test_bad_write_is_isolated_and_dead_lettered(flusher, journal_dir, monkeypatch):
+    monkeypatch.setenv("WRITE_BEHIND_MAX_ATTEMPTS", "2")
+    wb, delivered = flusher
+    for n, bad in enumerate([False, True, False]):
+        wb._journal.put(f"k{n}", UNIVERSITY, {"n": n, "bad": bad})
+
+    _rounds(wb, write_behind.SPLIT_AFTER_ATTEMPTS)
+    assert delivered == [] and len(wb._journal.pending) == 3
+
+    _rounds(wb, 1)  # one write at a time: the good ones go through
+    assert delivered == [0, 2]
+    assert list(wb._journal.pending) == ["k1"]
+
+    _rounds(wb, 1)  # second failure on its own: dead-lettered
+    assert wb._journal.pending == {}
+    dead = [json.loads(line) for line in open(journal_dir / write_behind.DEAD_LETTER_FILE)]
+    assert [(d["key"], d["payload"]["n"]) for d in dead] == [("k1", 1)]
+
+
+def test_flush_delivers_on_the_calling_thread(flusher):
+    wb, delivered = flusher
+    wb._journal.put("k0", UNIVERSITY, {"n": 0})
+    wb._journal.put("k1", UNIVERSITY, {"n": 1})
+    assert wb.flush(2) is True
+    assert delivered == [0, 1]
+
+
+def test_flush_gives_up_after_the_timeout(flusher):
+    wb, delivered = flusher
+    wb._journal.put("k0", UNIVERSITY, {"n": 0, "bad": True})
+    assert wb.flush(0.3) is False
+    assert list(wb._journal.pending) == ["k0"]
@@ -1,25 +1,53 @@
+import asyncio
 import json
-import os
-from dotenv import load_dotenv
 
-from chromadb import PersistentClient
-from langchain_core.tools import tool
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_core.tools import StructuredTool
 
+from utils import cassette
 from utils.BaseModels import RetrievedKnowledge
+from utils.async_utils import run_sync
+from utils.rate_limit import get_governor
+from utils.resources import INTERACTIVE, env, get_llm, registry
 
-load_dotenv(override=True)
 
-api_key = os.getenv("GOOGLE_API_KEY")
+RAG_RESULTS = 4
 
 
-@tool
-def lookup_university_smart(query: str):
+def _query_collection(query_vector):
+    collection = registry.get("chroma_collection")
+
+    return collection.query(
+        query_embeddings=[query_vector],
+        n_results=RAG_RESULTS
+    )
+
+
+async def _asearch(query: str) -> list:
+    """
+    The documents closest to `query`.
+    Recorded as one cassette interaction, so replay needs neither Gemini nor Chroma.
+    """
+    async def search():
+        # Embeddings share the Gemini quota with the reader LLM and ingestion.
+        await get_governor("GOOGLE_API_KEY").aacquire(len(query) / 4 + 1, INTERACTIVE)
+        embeddings = registry.get("rag_embeddings")
+        query_vector = await embeddings.aembed_query(query)
+
+        # Chroma's PersistentClient is synchronous; keep it off the event loop.
+        results = await asyncio.to_thread(_query_collection, query_vector)
+        return list(results.get("documents", [[]])[0])
+
+    request = {"op": "search", "query": query, "n_results": RAG_RESULTS}
+    return await cassette.arecord_or_replay(cassette.RAG, request, search)
+
+
+async def alookup_university_smart(query: str):
     """
     Performs a semantic search in the university knowledge base.
     Uses an internal LLM to analyze retrieved documents and extract the Official URL and Name.
     Use this to find the URL for a university.
     """
+    api_key = env("GOOGLE_API_KEY")
     if api_key:
         print(f"🔴 DEBUG: Key currently in use starts with: {api_key[:30]}...")
         print(f"🔴 DEBUG: Key length: {len(api_key)}")
@@ -30,36 +58,16 @@ def lookup_university_smart(query: str):
 
     try:
 
-        persist_dir = "./chroma_db"
-        collection_name = "university_db"
-
-        chroma_client = PersistentClient(path=persist_dir)
-        collection = chroma_client.get_or_create_collection(name=collection_name)
-
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", api_key=api_key)
-        query_vector = embeddings.embed_query(query)
-
-        results = collection.query(
-            query_embeddings=[query_vector],
-            n_results=4
-        )
-
-        docs = results.get("documents", [[]])[0]
+        docs = await _asearch(query)
         if not docs:
             return json.dumps({"found": False, "reason": "No documents in database."})
 
         raw_context = "\n\n---\n\n".join(docs)
 
-        reader_llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            temperature=0,
-            api_key=api_key
-        )
-
-        structured_reader = reader_llm.with_structured_output(RetrievedKnowledge)
+        structured_reader = get_llm("rag_reader").with_structured_output(RetrievedKnowledge)
 
         rag_prompt = f"""
-        You are a Fact Extraction Agent. 
+        You are a Fact Extraction Agent.
         Analyze the following retrieved context chunks regarding a university.
 
         User Query: {query}
@@ -75,9 +83,22 @@ def lookup_university_smart(query: str):
         If the context is irrelevant to the query, set 'found' to False.
         """
 
-        extraction = structured_reader.invoke(rag_prompt)
+        extraction = await structured_reader.ainvoke(rag_prompt)
 
         return extraction.json()
 
     except Exception as e:
         return json.dumps({"found": False, "error": str(e)})
+
+
+def _lookup_university_smart(query: str):
+    return run_sync(alookup_university_smart(query))
+
+
+# Exposes both entry points so the tool works from .invoke() and .ainvoke().
+lookup_university_smart = StructuredTool.from_function(
+    func=_lookup_university_smart,
+    coroutine=alookup_university_smart,
+    name="lookup_university_smart",
+    description=alookup_university_smart.__doc__.strip(),
+)
@@ -29,4 +29,19 @@ class PostDraft(BaseModel):
 
 class Feedback(BaseModel):
     grade: str = Field(description="The grade of the post: 'good' or 'bad'.")
-    feedback: Optional[str] = Field(description="Specific reasons for rejection if grade is bad. If good, leave empty.")
\ No newline at end of file
+    feedback: Optional[str] = Field(description="Specific reasons for rejection if grade is bad. If good, leave empty.")
+
+
+class Fact(BaseModel):
+    kind: str = Field(description="One of: deadline, date, event, program, fee, scholarship, announcement, "
+                                  "policy, url, contact, other.")
+    label: str = Field(description="What the fact is about, e.g. 'Fall 2026 application deadline'.")
+    value: str = Field(description="The fact itself, as stated in the summary, e.g. '15 July 2026'.")
+    date: Optional[str] = Field(default=None, description="The fact's date as YYYY-MM-DD if the summary gives "
+                                                          "a full date, else None.")
+    url: Optional[str] = Field(default=None, description="A URL the fact points to, if the summary gives one.")
+
+
+class FactSheet(BaseModel):
+    """Compact, typed facts extracted from a summary."""
+    facts: List[Fact] = Field(description="Every date, deadline, program, fee, URL and announcement in the summary.")
@@ -0,0 +1,48 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns a long-lived event loop running in a daemon thread.
+    Async clients (Groq, httpx, psycopg pools) bind to the loop they were first used on,
+    so every sync wrapper shares this single loop instead of creating a new one per call.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="lumina-async", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from synchronous code and returns its result.
+    Safe to call from inside a running event loop (the coroutine runs on the background loop).
+    The caller's contextvars (run config, metrics thread_id) are carried over to the coroutine.
+    """
+    loop = _background_loop()
+    context = contextvars.copy_context()
+    future = concurrent.futures.Future()
+
+    def _start():
+        task = loop.create_task(coro, context=context)
+
+        def _done(t):
+            if t.cancelled():
+                future.cancel()
+            elif t.exception() is not None:
+                future.set_exception(t.exception())
+            else:
+                future.set_result(t.result())
+
+        task.add_done_callback(_done)
+
+    loop.call_soon_threadsafe(_start)
+    return future.result()
@@ -0,0 +1,303 @@
+"""
+Record/replay of a thread's external interactions
+(LLM calls, Jina fetches, SQL lookups, knowledge-base searches, DB and Firestore writes).
+
+    CASSETTE_MODE=record   every interaction made inside a thread is appended to CASSETTE_DIR/<thread_id>.jsonl.gz
+    CASSETTE_MODE=replay   the same interactions are served from the cassette; nothing leaves the process
+    CASSETTE_LATENCY=original|zero   whether replayed calls sleep for as long as the recorded ones took
+
+The driver inputs (initial query, human decisions, fan-out seeds) are recorded too, so
+`python -m bench.replay <thread_id>` can re-run a thread offline exactly as it happened.
+"""
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from utils.metrics import current_thread_id
+from utils.resources import env
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Interaction kinds
+LLM = "llm"
+HTTP = "http"
+SQL = "sql"
+DB = "db"
+FIRESTORE = "firestore"
+RAG = "rag"        # knowledge-base search: query embedding + Chroma lookup
+RUN = "run"        # driver: graph (re)started with an input
+UPDATE = "update"  # driver: update_state(as_node=...)
+
+
+def mode() -> Optional[str]:
+    value = env("CASSETTE_MODE", "").lower()
+    return value if value in (RECORD, REPLAY) else None
+
+
+def _cassette_dir() -> str:
+    return env("CASSETTE_DIR", "./cassettes")
+
+
+def _replay_latency() -> bool:
+    return env("CASSETTE_LATENCY", "original") == "original"
+
+
+def cassette_path(thread_id: str) -> str:
+    return os.path.join(_cassette_dir(), f"{thread_id}.jsonl.gz")
+
+
+# --- ENCODING ---
+def _default(value):
+    if isinstance(value, BaseMessage):
+        return {"__message__": message_to_dict(value)}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def _object_hook(value):
+    if "__message__" in value:
+        return messages_from_dict([value["__message__"]])[0]
+    return value
+
+
+def encode(value) -> str:
+    return json.dumps(value, default=_default, sort_keys=True)
+
+
+def decode(text: str):
+    return json.loads(text, object_hook=_object_hook)
+
+
+def request_key(request) -> str:
+    return hashlib.sha256(encode(request).encode("utf-8")).hexdigest()[:16]
+
+
+class ReplayMiss(LookupError):
+    """The cassette has no recorded interaction left for this request."""
+
+
+class Cassette:
+    """The interactions of one thread, in recorded order."""
+
+    def __init__(self, thread_id: str, entries: List[dict] = None):
+        self.thread_id = thread_id
+        self.entries = entries or []
+        self._by_key = defaultdict(deque)
+        self._by_kind = defaultdict(deque)
+        for entry in self.entries:
+            self._by_key[(entry["kind"], entry["key"])].append(entry)
+            self._by_kind[entry["kind"]].append(entry)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, thread_id: str) -> "Cassette":
+        path = cassette_path(thread_id)
+        if not os.path.exists(path):
+            return cls(thread_id)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(thread_id, [json.loads(line) for line in f if line.strip()])
+
+    def append(self, entry: dict):
+        path = cassette_path(self.thread_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            self.entries.append(entry)
+            # Appending a gzip member per line keeps the file valid if the process dies mid-run.
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def take(self, kind: str, key: str) -> dict:
+        """
+        The next unconsumed entry for this exact request; failing that, the next one of the same kind
+        (prompts may differ in incidental details such as timestamps).
+        """
+        with self._lock:
+            queue = self._by_key.get((kind, key))
+            entry = queue.popleft() if queue else None
+            if entry is None:
+                while self._by_kind[kind] and self._by_kind[kind][0].get("used"):
+                    self._by_kind[kind].popleft()
+                if not self._by_kind[kind]:
+                    raise ReplayMiss(f"No recorded '{kind}' interaction left in cassette {self.thread_id}")
+                entry = self._by_kind[kind].popleft()
+                self._by_key[(kind, entry["key"])].remove(entry)
+            entry["used"] = True
+            return entry
+
+    def driver_steps(self) -> List[dict]:
+        return [e for e in self.entries if e["kind"] in (RUN, UPDATE)]
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+# Set while a recorded call runs, so calls nested inside it (the SQL agent's own LLM turns) aren't recorded twice.
+_inside_call = contextvars.ContextVar("cassette_inside_call", default=False)
+
+
+def get_cassette(thread_id: str) -> Cassette:
+    with _cassettes_lock:
+        cassette = _cassettes.get(thread_id)
+        if cassette is None:
+            cassette = Cassette.load(thread_id) if mode() == REPLAY else Cassette(thread_id)
+            _cassettes[thread_id] = cassette
+        return cassette
+
+
+def _active_cassette() -> Optional[Cassette]:
+    thread_id = current_thread_id.get()
+    if mode() is None or not thread_id or _inside_call.get():
+        return None
+    return get_cassette(thread_id)
+
+
+# --- INTERCEPTION ---
+async def arecord_or_replay(kind: str, request: Any, call, encode_result=None, decode_result=None):
+    """
+    Runs `await call()` and records its result, or serves the recorded result in replay mode.
+    Outside a graph thread, or with CASSETTE_MODE unset, this is just `await call()`.
+    """
+    cassette = _active_cassette()
+    if cassette is None:
+        return await call()
+
+    key = request_key(request)
+
+    if mode() == REPLAY:
+        entry = cassette.take(kind, key)
+        if _replay_latency():
+            await asyncio.sleep(entry["seconds"])
+        if "error" in entry:
+            raise RuntimeError(f"Replayed error: {entry['error']}")
+        result = decode(entry["result"])
+        return decode_result(result) if decode_result else result
+
+    started = time.perf_counter()
+    entry = {"kind": kind, "key": key, "request": request if isinstance(request, str) else None}
+    token = _inside_call.set(True)
+    try:
+        result = await call()
+    except Exception as e:
+        entry.update(seconds=time.perf_counter() - started, error=repr(e))
+        cassette.append(entry)
+        raise
+    finally:
+        _inside_call.reset(token)
+    entry.update(seconds=time.perf_counter() - started,
+                 result=encode(encode_result(result) if encode_result else result))
+    cassette.append(entry)
+    return result
+
+
+def _append_note(kind: str, config: dict, fields: dict):
+    thread_id = config["configurable"]["thread_id"]
+    get_cassette(thread_id).append({"kind": kind, "key": "", "seconds": 0, "result": encode(fields)})
+
+
+def _note(kind: str, config: dict, **fields):
+    if mode() != RECORD:
+        return
+    from db.blob_store import is_blob_ref, resolve_blob
+
+    # Blob refs point into this deployment's store; the cassette carries the text itself.
+    values = fields.get("values")
+    if isinstance(values, dict):
+        fields["values"] = {k: resolve_blob(v) if is_blob_ref(v) else v for k, v in values.items()}
+    _append_note(kind, config, fields)
+
+
+async def _anote(kind: str, config: dict, **fields):
+    """Async version of _note: blob refs are resolved without blocking the event loop."""
+    if mode() != RECORD:
+        return
+    from db.blob_store import aresolve_blob, is_blob_ref
+
+    values = fields.get("values")
+    if isinstance(values, dict):
+        fields["values"] = {k: await aresolve_blob(v) if is_blob_ref(v) else v for k, v in values.items()}
+    _append_note(kind, config, fields)
+
+
+def note_run(config: dict, graph_input: Optional[dict], interrupt_before: list = None):
+    """Records that a driver (re)started the thread, so replay can do the same."""
+    _note(RUN, config, values=graph_input, interrupt_before=interrupt_before)
+
+
+def note_update(config: dict, values: dict, as_node: str):
+    """Records a driver's update_state (human decision, fan-out seed)."""
+    _note(UPDATE, config, values=values, as_node=as_node)
+
+
+async def anote_run(config: dict, graph_input: Optional[dict], interrupt_before: list = None):
+    """Async version of note_run, for drivers running on an event loop."""
+    await _anote(RUN, config, values=graph_input, interrupt_before=interrupt_before)
+
+
+async def anote_update(config: dict, values: dict, as_node: str):
+    """Async version of note_update, for drivers running on an event loop."""
+    await _anote(UPDATE, config, values=values, as_node=as_node)
+
+
+# --- LLM CLIENTS ---
+def _tool_names(kwargs: dict) -> list:
+    names = []
+    for tool in kwargs.get("tools") or []:
+        if isinstance(tool, dict):
+            names.append(tool.get("name") or (tool.get("function") or {}).get("name"))
+        else:
+            names.append(getattr(tool, "name", str(tool)))
+    return names
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Wraps a provider client so every generation goes through the cassette.
+    In replay mode `inner` is None and no provider SDK or API key is needed.
+    """
+
+    inner: Optional[BaseChatModel] = None
+    model_name: str = "cassette"
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def bind_tools(self, tools, **kwargs):
+        if self.inner is not None:
+            # Provider-specific tool formatting; the bound kwargs reach inner._agenerate unchanged.
+            return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _request(self, messages, kwargs) -> dict:
+        return {"model": self.model_name, "messages": [message_to_dict(m) for m in messages],
+                "tools": _tool_names(kwargs)}
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        async def call():
+            return await self.inner._agenerate(messages, stop=stop, **kwargs)
+
+        def to_messages(result: ChatResult):
+            return [g.message for g in result.generations]
+
+        def from_messages(recorded):
+            return ChatResult(generations=[ChatGeneration(message=m) for m in recorded])
+
+        return await arecord_or_replay(LLM, self._request(messages, kwargs), call, to_messages, from_messages)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        from utils.async_utils import run_sync
+        return run_sync(self._agenerate(messages, stop=stop, **kwargs))
@@ -0,0 +1,136 @@
+"""
+Per-run deadlines (RUN_DEADLINE_SECONDS).
+
+A driver puts the run's deadline (epoch seconds) in config["configurable"]["deadline"] (see with_deadline);
+LangGraph passes that config to every node and route, Send branches included. Code then derives its timeouts
+from the time left instead of using fixed ones, and degrades when the deadline gets close (short()):
+
+- check_db_node serves the stored summary of a stale URL instead of re-scraping it,
+- route_internal sends a rejected draft to human review instead of regenerating it,
+- tiered tasks (utils/tiering.py) use only their small model, and Summarize skips fact extraction.
+
+bind() wraps every node: it records how much of the budget each node used ("budget" rows in the run summary,
+lumina_deadline_budget_share) and, with DEADLINE_ENFORCE=1, cancels an async node that runs
+DEADLINE_GRACE_SECONDS past the deadline. Degradations are counted in lumina_deadline_total.
+"""
+import asyncio
+import contextvars
+import inspect
+import time
+from functools import wraps
+from typing import Optional
+
+from utils.metrics import current_node, current_thread_id, metrics
+from utils.resources import env
+
+# Set by bind() for the node that is running; code outside nodes falls back to the run config.
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+SHARE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1)
+
+
+def run_seconds() -> Optional[float]:
+    value = env("RUN_DEADLINE_SECONDS")
+    return float(value) if value else None
+
+
+def after(seconds: Optional[float] = None) -> Optional[float]:
+    """The deadline `seconds` (default RUN_DEADLINE_SECONDS) from now, or None when no budget is set."""
+    seconds = run_seconds() if seconds is None else seconds
+    return time.time() + seconds if seconds else None
+
+
+def with_deadline(config: dict, at: Optional[float]) -> dict:
+    """A copy of the run config carrying deadline `at`; `config` itself when there is none."""
+    if at is None:
+        return config
+    return {**config, "configurable": {**config.get("configurable", {}), "deadline": at}}
+
+
+def _from_config() -> Optional[float]:
+    try:
+        from langgraph.config import get_config
+        return get_config().get("configurable", {}).get("deadline")
+    except Exception:
+        return None
+
+
+def current() -> Optional[float]:
+    at = current_deadline.get()
+    return at if at is not None else _from_config()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the run's deadline (never negative), or None without one."""
+    at = current()
+    return None if at is None else max(at - time.time(), 0.0)
+
+
+def timeout(default: float) -> float:
+    """`default`, cut to the time left. Never below DEADLINE_MIN_TIMEOUT_SECONDS, so a late call still gets a try."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(min(default, left), float(env("DEADLINE_MIN_TIMEOUT_SECONDS", 1)))
+
+
+def short() -> bool:
+    """Whether less than DEADLINE_SHORT_SECONDS are left; optional work is skipped from here on."""
+    left = remaining()
+    return left is not None and left < float(env("DEADLINE_SHORT_SECONDS", 20))
+
+
+def degrade(what: str, node: str = None):
+    """Counts one degradation made to meet the deadline."""
+    node = node or current_node.get() or "graph"
+    metrics.inc("lumina_deadline_total", node=node, outcome=what)
+    metrics.record_run(current_thread_id.get(), "degrade", f"{node}:{what}")
+
+
+# --- NODES ---
+def _record(node: str, at: float, started: float, seconds: float):
+    budget = at - started
+    metrics.record_run(current_thread_id.get(), "budget", node, seconds)
+    if budget > 0:
+        metrics.observe("lumina_deadline_budget_share", min(seconds / budget, 1.0), buckets=SHARE_BUCKETS, node=node)
+    if time.time() > at:
+        metrics.inc("lumina_deadline_total", node=node, outcome="overrun")
+
+
+def bind(node: str, func):
+    """Wraps a sync or async node so it runs under the run's deadline and records its share of the budget."""
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(state, *args, **kwargs):
+            at = _from_config()
+            if at is None:
+                return await func(state, *args, **kwargs)
+            token = current_deadline.set(at)
+            started = time.time()
+            try:
+                if env("DEADLINE_ENFORCE", "0") != "1":
+                    return await func(state, *args, **kwargs)
+                limit = max(at - started, 0) + float(env("DEADLINE_GRACE_SECONDS", 5))
+                try:
+                    return await asyncio.wait_for(func(state, *args, **kwargs), limit)
+                except asyncio.TimeoutError:
+                    metrics.inc("lumina_deadline_total", node=node, outcome="cancelled")
+                    raise asyncio.TimeoutError(f"{node}: run deadline passed") from None
+            finally:
+                _record(node, at, started, time.time() - started)
+                current_deadline.reset(token)
+        return async_wrapper
+
+    @wraps(func)
+    def sync_wrapper(state, *args, **kwargs):
+        at = _from_config()
+        if at is None:
+            return func(state, *args, **kwargs)
+        token = current_deadline.set(at)
+        started = time.time()
+        try:
+            return func(state, *args, **kwargs)
+        finally:
+            _record(node, at, started, time.time() - started)
+            current_deadline.reset(token)
+    return sync_wrapper
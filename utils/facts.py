@@ -0,0 +1,198 @@
+"""
+Structured fact sheets (FACT_SHEETS=1).
+
+Summarize also extracts each summary's facts (dates, deadlines, programs, fees, URLs, ...) as typed fields,
+stored with the summary in the university table and carried per URL in url_records. generate_post then
+prompts with only the facts relevant to the topic instead of the whole summary, and evaluate_post checks
+the draft's dates, URL, disclaimer and required fields against them in code before the LLM grades the rest.
+"""
+import re
+from typing import Dict, FrozenSet, List, Optional
+from urllib.parse import urlparse
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from utils.BaseModels import FactSheet
+from utils.metrics import metrics
+from utils.normalize_urls import normalize_url
+from utils.resources import env
+
+DISCLAIMER = "refer to the official website"
+
+STOPWORDS = {
+    "a", "an", "and", "at", "for", "general", "in", "is", "news", "of", "on", "or", "the", "to",
+    "university", "update", "updates", "with",
+}
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|" \
+         r"oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+# Also matches the date part of ISO timestamps ("2026-07-15T09:30:00").
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})(?!\d)")
+DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"(?:,?\s+(\d{4}))?\b", re.IGNORECASE)
+MONTH_DAY = re.compile(r"\b" + _MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4}))?", re.IGNORECASE)
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})[/.](\d{1,2})[/.](\d{4})\b")
+
+EXTRACTION_PROMPT = """You turn a university update summary into a compact FACT SHEET.
+List every date, deadline, event, program, fee, scholarship, announcement, policy, URL and contact as one fact.
+Copy values exactly as the summary states them; never infer, convert or invent anything.
+Keep each label and value short. Give `date` only when the summary states day, month and year."""
+
+
+def enabled() -> bool:
+    return env("FACT_SHEETS", "0") == "1"
+
+
+def prompt_limit() -> int:
+    return int(env("FACT_SHEET_LIMIT", 20))
+
+
+# --- EXTRACTION ---
+async def aextract_facts(model, summary: str) -> Optional[List[dict]]:
+    """The summary's fact sheet as a list of dicts, or None when extraction fails."""
+    try:
+        sheet = await model.with_structured_output(FactSheet).ainvoke([
+            SystemMessage(content=EXTRACTION_PROMPT),
+            HumanMessage(content=summary),
+        ])
+    except Exception as e:
+        print(f"⚠️ Fact extraction failed ({e}); generation will use the full summary.")
+        return None
+    return [fact.model_dump(exclude_none=True) for fact in sheet.facts]
+
+
+# --- SELECTION ---
+def collect(urls: List[str], records: Dict[str, dict]) -> Optional[List[dict]]:
+    """
+    All facts of the given URLs, each tagged with its source URL.
+    None when any URL with a summary has no fact sheet, so callers fall back to the summaries.
+    """
+    collected = []
+    for url in urls:
+        record = records.get(url) or {}
+        if record.get("facts") is None:
+            if record.get("summary"):
+                return None
+            continue
+        collected.extend(dict(fact, source=url) for fact in record["facts"])
+    return collected or None
+
+
+def _terms(text: str) -> set:
+    # Five-letter prefixes are a crude stemmer: "admissions" and "admission" share "admis".
+    return {word[:5] for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2 and word not in STOPWORDS}
+
+
+def relevant(facts: List[dict], topic: str) -> List[dict]:
+    """The facts sharing terms with the topic, best matches first; all of them when none match."""
+    topic_terms = _terms(topic or "")
+    scored = [
+        (len(topic_terms & _terms(f"{fact.get('kind', '')} {fact.get('label', '')} {fact.get('value', '')}")), i, fact)
+        for i, fact in enumerate(facts)
+    ]
+    matching = [entry for entry in scored if entry[0] > 0]
+    chosen = sorted(matching, key=lambda entry: (-entry[0], entry[1])) if matching else scored
+    return [fact for _, _, fact in chosen[:prompt_limit()]]
+
+
+def format_facts(facts: List[dict], multi_source: bool = False) -> str:
+    """One compact line per fact."""
+    lines = []
+    for fact in facts:
+        line = f"- [{fact.get('kind', 'other')}] {fact.get('label', '')}: {fact.get('value', '')}"
+        if fact.get("date"):
+            line += f" ({fact['date']})"
+        if fact.get("url"):
+            line += f" <{fact['url']}>"
+        if multi_source:
+            line += f" — source: {fact['source']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# --- DETERMINISTIC CHECKS ---
+def _valid(month: int, day: int) -> bool:
+    return 1 <= month <= 12 and 1 <= day <= 31
+
+
+def find_dates(text: str) -> List[FrozenSet[tuple]]:
+    """
+    The dates mentioned in `text`, each as its possible (year or None, month, day) readings.
+    Numeric dates like 05/07/2026 have two readings (day first and month first).
+    """
+    found = []
+    for year, month, day in ISO_DATE.findall(text or ""):
+        if _valid(int(month), int(day)):
+            found.append(frozenset({(int(year), int(month), int(day))}))
+    for day, month, year in DAY_MONTH.findall(text or ""):
+        if _valid(MONTHS[month[:3].lower()], int(day)):
+            found.append(frozenset({(int(year) if year else None, MONTHS[month[:3].lower()], int(day))}))
+    for month, day, year in MONTH_DAY.findall(text or ""):
+        if _valid(MONTHS[month[:3].lower()], int(day)):
+            found.append(frozenset({(int(year) if year else None, MONTHS[month[:3].lower()], int(day))}))
+    for first, second, year in NUMERIC_DATE.findall(text or ""):
+        readings = {(int(year), int(second), int(first)), (int(year), int(first), int(second))}
+        readings = frozenset(r for r in readings if _valid(r[1], r[2]))
+        if readings:
+            found.append(readings)
+    return found
+
+
+def _same_date(a: tuple, b: tuple) -> bool:
+    # A date without a year ("15 July") matches that day in any year.
+    return a[1:] == b[1:] and (a[0] is None or b[0] is None or a[0] == b[0])
+
+
+def _host(url: str) -> str:
+    try:
+        url = normalize_url(url)
+    except ValueError:
+        return ""
+    return urlparse(url).hostname or ""
+
+
+def check_draft(draft: dict, facts: List[dict], source_urls: List[str], summary: str = "",
+                source_dates: List[str] = ()) -> List[str]:
+    """
+    Problems code can find without an LLM: missing fields, a missing disclaimer, dates that appear in
+    neither the facts, the summary nor `source_dates` (the stored/scrape timestamps the generator is given),
+    and a URL on a host no source or fact mentions.
+    """
+    problems = []
+    for field, name in (("university_name", "University name"), ("relevant_url", "URL"), ("timestamp", "Date")):
+        if not (draft.get(field) or "").strip():
+            problems.append(f"{name} is missing.")
+
+    if DISCLAIMER not in (draft.get("post_content") or "")[-200:].lower():
+        problems.append("The content must end with 'Please refer to the official website for more details.'")
+
+    source_text = "\n".join(
+        [summary or ""] + [f"{f.get('value', '')} {f.get('date') or ''}" for f in facts]
+        + [str(d) for d in source_dates if d]
+    )
+    known = {reading for mention in find_dates(source_text) for reading in mention}
+    if known:
+        draft_text = " ".join(draft.get(field) or "" for field in ("post_heading", "post_content", "timestamp"))
+        unsupported = {
+            match.group(0)
+            for pattern in (ISO_DATE, DAY_MONTH, MONTH_DAY, NUMERIC_DATE)
+            for match in pattern.finditer(draft_text)
+            for mention in find_dates(match.group(0))
+            if not any(_same_date(reading, k) for reading in mention for k in known)
+        }
+        if unsupported:
+            problems.append(f"Dates not found in the source: {', '.join(sorted(unsupported))}.")
+
+    url = (draft.get("relevant_url") or "").strip()
+    if url:
+        hosts = {_host(u) for u in source_urls} | {_host(f["url"]) for f in facts if f.get("url")}
+        host = _host(url)
+        same_site = any(h and (host == h or host.endswith("." + h) or h.endswith("." + host)) for h in hosts)
+        if not same_site and url not in (summary or ""):
+            problems.append(f"URL {url} does not belong to the source site.")
+
+    metrics.inc("lumina_fact_checks_total", outcome="rejected" if problems else "passed")
+    return problems
@@ -0,0 +1,67 @@
+from typing import List
+
+from utils import cassette
+
+# Per-post fields. Everything else in State (intake, URL, freshness, summary) is shared upstream work.
+POST_FIELDS = (
+    "post_heading",
+    "post_content",
+    "university_name",
+    "relevant_url",
+    "timestamp",
+    "evaluator_feedback",
+    "grade",
+    "iteration_count",
+    "human_feedback",
+    "approved",
+)
+
+# The shared (parent) thread runs intake -> freshness -> scrape -> summary and stops here.
+FANOUT_NODE = "generate_post"
+
+# Seeding a child "as" Summarize makes its next step generate_post, whichever path the parent took.
+SEED_AS_NODE = "Summarize"
+
+
+def shared_context(values: dict) -> dict:
+    """Strips per-post fields from a parent snapshot so children start from a clean draft."""
+    return {k: v for k, v in values.items() if k not in POST_FIELDS}
+
+
+def child_thread_ids(base_session_id: str, num_posts: int) -> List[str]:
+    return [f"{base_session_id}_post_{i + 1}" for i in range(num_posts)]
+
+
+def seed_post_threads(agent, parent_config: dict, thread_ids: List[str]) -> List[dict]:
+    """
+    Copies the parent's resolved context into one child thread per post.
+    Each child resumes at generate_post, so only generate/evaluate/review/save run per post.
+    """
+    snapshot = agent.get_state(parent_config)
+    shared = shared_context(snapshot.values)
+
+    configs = []
+    for thread_id in thread_ids:
+        config = {"configurable": {"thread_id": thread_id}}
+        cassette.note_update(config, shared, SEED_AS_NODE)
+        agent.update_state(config, shared, as_node=SEED_AS_NODE)
+        configs.append(config)
+
+    print(f"🌱 Seeded {len(configs)} post threads from shared context.")
+    return configs
+
+
+async def aseed_post_threads(agent, parent_config: dict, thread_ids: List[str]) -> List[dict]:
+    """Async version of seed_post_threads."""
+    snapshot = await agent.aget_state(parent_config)
+    shared = shared_context(snapshot.values)
+
+    configs = []
+    for thread_id in thread_ids:
+        config = {"configurable": {"thread_id": thread_id}}
+        await cassette.anote_update(config, shared, SEED_AS_NODE)
+        await agent.aupdate_state(config, shared, as_node=SEED_AS_NODE)
+        configs.append(config)
+
+    print(f"🌱 Seeded {len(configs)} post threads from shared context.")
+    return configs
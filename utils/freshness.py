@@ -0,0 +1,175 @@
+"""
+Adaptive freshness TTL (ADAPTIVE_FRESHNESS=1).
+
+Every successful scrape appends its content hash to scrape_history. How often a URL's hash actually
+changed over FRESHNESS_WINDOW_DAYS gives its mean change interval; the TTL is FRESHNESS_CHANGE_FRACTION
+of that interval, clamped to [FRESHNESS_MIN_HOURS, FRESHNESS_MAX_DAYS]. URLs with fewer than
+FRESHNESS_MIN_SAMPLES scrapes borrow their domain's history, and domains without enough history keep
+the fixed FRESHNESS_THRESHOLD. FRESHNESS_OVERRIDES ("pu.edu.pk=6h,ucp.edu.pk=14d") pins a domain's TTL.
+
+Each decision that differs from the fixed threshold is counted in lumina_freshness_total
+(scrape_avoided / early_refresh), and re-scrapes that found unchanged content as unchanged_rescrape.
+"""
+import hashlib
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from db.operations import afetch_change_stats, arecord_scrape as arecord_scrape_row
+from routes.db_route import FRESHNESS_THRESHOLD, is_fresh
+from utils.metrics import metrics
+from utils.normalize_urls import normalize_url, url_key
+from utils.resources import env
+
+DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*([mhd])")
+DURATION_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+# Per-domain stats are reloaded at most this often.
+STATS_CACHE_SECONDS = 600
+
+_stats = {}  # domain -> (loaded_at, {url: (scrapes, changes, span_seconds)})
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return env("ADAPTIVE_FRESHNESS", "0") == "1"
+
+
+def domain_of(url: str) -> str:
+    try:
+        url = normalize_url(url)
+    except ValueError:
+        pass
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+def _parse_duration(text: str) -> timedelta:
+    """'30m', '6h' or '14d'. Raises ValueError for anything else, zero included (TTLs are divided by)."""
+    match = DURATION.fullmatch(text.strip().lower())
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"not a positive duration: {text!r}")
+    return timedelta(**{DURATION_UNITS[match.group(2)]: float(match.group(1))})
+
+
+def overrides() -> Dict[str, timedelta]:
+    parsed = {}
+    for item in (env("FRESHNESS_OVERRIDES") or "").split(","):
+        if "=" not in item:
+            continue
+        domain, duration = item.split("=", 1)
+        try:
+            if not domain.strip():
+                raise ValueError("no domain")
+            parsed[domain.strip().lower()] = _parse_duration(duration)
+        except ValueError:
+            print(f"⚠️ Ignoring freshness override '{item}'.")
+    return parsed
+
+
+def bounds() -> Tuple[timedelta, timedelta]:
+    return (timedelta(hours=float(env("FRESHNESS_MIN_HOURS", 1))),
+            timedelta(days=float(env("FRESHNESS_MAX_DAYS", 30))))
+
+
+def window() -> timedelta:
+    return timedelta(days=float(env("FRESHNESS_WINDOW_DAYS", 90)))
+
+
+def ttl_from_history(scrapes: int, changes: int, span_seconds: float, urls: int = 1) -> Optional[timedelta]:
+    """The TTL a change history (of `urls` pooled URLs) supports, or None when it is too short to say."""
+    if scrapes < int(env("FRESHNESS_MIN_SAMPLES", 3)) or not span_seconds:
+        return None
+    # No change over a URL's whole span still only says "changes less often than that", hence one extra per URL.
+    mean_change_interval = timedelta(seconds=span_seconds / (changes + urls))
+    ttl = mean_change_interval * float(env("FRESHNESS_CHANGE_FRACTION", 0.5))
+    low, high = bounds()
+    return min(max(ttl, low), high)
+
+
+async def adomain_stats(domain: str) -> Dict[str, tuple]:
+    """{url: (scrapes, changes, span_seconds)} for the domain's recent history, cached for a few minutes."""
+    now = time.monotonic()
+    with _lock:
+        cached = _stats.get(domain)
+    if cached and now - cached[0] < STATS_CACHE_SECONDS:
+        return cached[1]
+
+    rows = await afetch_change_stats(env("DATABASE_URL"), [domain], window())
+    stats = {url: (scrapes, changes, float(span or 0)) for url, _, scrapes, changes, span in rows}
+    with _lock:
+        _stats[domain] = (now, stats)
+    return stats
+
+
+def ttl_for_stats(url: str, domain: str, stats: Dict[str, tuple]) -> Tuple[timedelta, str]:
+    """(TTL, source) where source is 'override', 'url', 'domain' or 'default'."""
+    pinned = overrides().get(domain)
+    if pinned is not None:
+        return pinned, "override"
+
+    ttl = ttl_from_history(*stats[url]) if url in stats else None
+    if ttl is not None:
+        return ttl, "url"
+
+    if stats:
+        ttl = ttl_from_history(
+            sum(s[0] for s in stats.values()),
+            sum(s[1] for s in stats.values()),
+            sum(s[2] for s in stats.values()),
+            urls=len(stats),
+        )
+        if ttl is not None:
+            return ttl, "domain"
+
+    return FRESHNESS_THRESHOLD, "default"
+
+
+async def attl_for(url: str) -> timedelta:
+    """The freshness TTL for `url`: adaptive when enabled, else the fixed FRESHNESS_THRESHOLD."""
+    if not enabled():
+        return FRESHNESS_THRESHOLD
+    try:
+        url = url_key(url)
+    except ValueError:
+        return FRESHNESS_THRESHOLD
+    domain = domain_of(url)
+    try:
+        stats = await adomain_stats(domain)
+    except Exception as e:
+        print(f"⚠️ Could not load change history for {domain} ({e}); using the fixed threshold.")
+        stats = {}
+    return ttl_for_stats(url, domain, stats)[0]
+
+
+async def ais_fresh(url: str, timestamp_str) -> bool:
+    """is_fresh() with the URL's own TTL, counting decisions that differ from the fixed threshold."""
+    fresh = is_fresh(timestamp_str, await attl_for(url))
+    if enabled() and timestamp_str and timestamp_str != "NULL":
+        fixed = is_fresh(timestamp_str)
+        if fresh and not fixed:
+            metrics.inc("lumina_freshness_total", outcome="scrape_avoided")
+        elif fixed and not fresh:
+            metrics.inc("lumina_freshness_total", outcome="early_refresh")
+    return fresh
+
+
+async def arecord_scrape(url: str, page: str):
+    """Adds a successful scrape of `url` to its change history."""
+    if not enabled() or not page:
+        return
+    try:
+        url = url_key(url)
+    except ValueError:
+        return
+    content_hash = hashlib.sha256(page.encode("utf-8")).hexdigest()
+    try:
+        previous = await arecord_scrape_row(env("DATABASE_URL"), url, domain_of(url), content_hash)
+    except Exception as e:
+        print(f"⚠️ Could not record scrape history for {url}: {e}")
+        return
+    if previous is not None:
+        metrics.inc("lumina_freshness_total", outcome="changed" if previous != content_hash else "unchanged_rescrape")
@@ -0,0 +1,408 @@
+import asyncio
+import bisect
+import contextvars
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.resources import env
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# The graph thread the current node/LLM/DB call belongs to. Set by the node wrappers in Graph.py.
+current_thread_id = contextvars.ContextVar("current_thread_id", default=None)
+current_node = contextvars.ContextVar("current_node", default=None)
+
+_json_logger = logging.getLogger("lumina.metrics")
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape_label(value) -> str:
+    """Escapes a label value for the Prometheus text format (backslash, double quote, newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms with labels, rendered in the Prometheus text format.
+    thread_id is deliberately not a label (unbounded cardinality); per-thread numbers live in run summaries.
+    """
+
+    def __init__(self, max_runs: int = 1000):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._help = {}
+        self._runs = OrderedDict()
+        self.max_runs = max_runs
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def counter_values(self, name: str) -> dict:
+        """Label tuple -> value for one counter."""
+        with self._lock:
+            return {labels: value for (n, labels), value in self._counters.items() if n == name}
+
+    # --- PER-RUN AGGREGATES ---
+    def record_run(self, thread_id: str, category: str, name: str, seconds: float = 0.0, **extra):
+        if not thread_id:
+            return
+        with self._lock:
+            run = self._runs.get(thread_id)
+            if run is None:
+                run = self._runs[thread_id] = defaultdict(lambda: defaultdict(float))
+                while len(self._runs) > self.max_runs:
+                    self._runs.popitem(last=False)
+            row = run[(category, name)]
+            row["calls"] += 1
+            row["seconds"] += seconds
+            for k, v in extra.items():
+                if isinstance(v, (int, float)):
+                    row[k] += v
+
+    def run_summary(self, thread_id: str) -> dict:
+        with self._lock:
+            run = self._runs.get(thread_id, {})
+            return {key: dict(row) for key, row in run.items()}
+
+    # --- EXPORT ---
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{fmt(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{name}_sum{fmt(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{fmt(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("lumina_node_duration_seconds", "Wall time per graph node execution.")
+metrics.describe("lumina_node_errors_total", "Graph node executions that raised an exception.")
+metrics.describe("lumina_node_cancelled_total", "Graph node executions that were cancelled.")
+metrics.describe("lumina_llm_call_duration_seconds", "Latency per LLM call.")
+metrics.describe("lumina_llm_tokens_total", "Prompt and completion tokens per model and node.")
+metrics.describe("lumina_llm_calls_total", "LLM calls by outcome.")
+metrics.describe("lumina_db_call_duration_seconds", "Latency per database operation.")
+metrics.describe("lumina_http_call_duration_seconds", "Latency per outbound HTTP call.")
+metrics.describe("lumina_route_decisions_total", "Conditional edge decisions.")
+metrics.describe("lumina_retries_total", "Retries by kind.")
+metrics.describe("lumina_tier_calls_total", "Tiered LLM task answers by model tier and outcome.")
+metrics.describe("lumina_tier_escalations_total", "Tiered LLM task escalations by reason.")
+metrics.describe("lumina_prefetch_total", "Speculative scrapes by outcome.")
+metrics.describe("lumina_freshness_total", "Adaptive freshness decisions and scrape outcomes.")
+metrics.describe("lumina_refresh_total", "Background summary refreshes by outcome.")
+metrics.describe("lumina_write_behind_total", "Write-behind writes queued and delivered, by kind.")
+metrics.describe("lumina_singleflight_total", "Single-flight calls by outcome (leader, shared, shared_across_workers).")
+metrics.describe("lumina_university_cache_total", "University row cache lookups (hit, miss) and invalidations.")
+metrics.describe("lumina_llm_resilience_total", "Hedged and failed-over LLM calls by outcome (which request won).")
+metrics.describe("lumina_fact_checks_total", "Deterministic draft checks against the fact sheet, by outcome.")
+metrics.describe("lumina_deadline_total", "Work skipped or cut short to meet a run deadline, and overruns, by node.")
+metrics.describe("lumina_deadline_budget_share", "Share of the run's remaining deadline budget each node used.")
+
+
+def log_event(event: str, **fields):
+    """Structured JSON log line, tagged with the current thread_id and node."""
+    if not _json_logger.handlers:
+        return
+    record = {
+        "ts": time.time(),
+        "event": event,
+        "thread_id": current_thread_id.get(),
+        "node": current_node.get(),
+    }
+    record.update(fields)
+    _json_logger.info(json.dumps(record, default=str))
+
+
+def configure_json_logs():
+    """Enables JSON metric logs on stderr when METRICS_JSON_LOGS=1."""
+    if env("METRICS_JSON_LOGS", "0") != "1" or _json_logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _json_logger.addHandler(handler)
+    _json_logger.setLevel(logging.INFO)
+    _json_logger.propagate = False
+
+
+configure_json_logs()
+
+
+# --- NODES AND ROUTES ---
+def _thread_id_from_config() -> str:
+    try:
+        from langgraph.config import get_config
+        return get_config().get("configurable", {}).get("thread_id")
+    except Exception:
+        return None
+
+
+def _record_node(node: str, thread_id: str, seconds: float, error: BaseException = None):
+    metrics.observe("lumina_node_duration_seconds", seconds, node=node)
+    metrics.record_run(thread_id, "node", node, seconds)
+    # A cancelled node (client gone, run deadline, shutdown) did not fail; only Exceptions count as errors.
+    if isinstance(error, asyncio.CancelledError):
+        metrics.inc("lumina_node_cancelled_total", node=node)
+        log_event("node_end", seconds=round(seconds, 4), error=None, cancelled=True)
+        return
+    if isinstance(error, Exception):
+        metrics.inc("lumina_node_errors_total", node=node)
+    log_event("node_end", seconds=round(seconds, 4), error=str(error) if error else None)
+
+
+def instrument_node(node: str, func):
+    """Wraps a sync or async node function with wall-time recording tagged by thread_id."""
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(state, *args, **kwargs):
+            thread_token = current_thread_id.set(_thread_id_from_config())
+            node_token = current_node.set(node)
+            started = time.perf_counter()
+            error = None
+            try:
+                return await func(state, *args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _record_node(node, current_thread_id.get(), time.perf_counter() - started, error)
+                current_node.reset(node_token)
+                current_thread_id.reset(thread_token)
+        return async_wrapper
+
+    @wraps(func)
+    def sync_wrapper(state, *args, **kwargs):
+        thread_token = current_thread_id.set(_thread_id_from_config())
+        node_token = current_node.set(node)
+        started = time.perf_counter()
+        error = None
+        try:
+            return func(state, *args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _record_node(node, current_thread_id.get(), time.perf_counter() - started, error)
+            current_node.reset(node_token)
+            current_thread_id.reset(thread_token)
+    return sync_wrapper
+
+
+def _decision_label(decision) -> str:
+    # A fan-out returns a list of Send packets; label it by target node so the label set stays small.
+    if isinstance(decision, (list, tuple)):
+        targets = sorted({getattr(d, "node", str(d)) for d in decision})
+        return "send:" + ",".join(targets)
+    return str(decision)
+
+
+def instrument_route(route: str, func):
+    """Counts the decisions a conditional edge makes."""
+    @wraps(func)
+    def wrapper(state, *args, **kwargs):
+        decision = func(state, *args, **kwargs)
+        label = _decision_label(decision)
+        metrics.inc("lumina_route_decisions_total", route=route, decision=label)
+        metrics.record_run(_thread_id_from_config(), "route", f"{route}->{label}")
+        log_event("route", route=route, decision=label)
+        return decision
+    return wrapper
+
+
+# --- DB / HTTP / RETRIES ---
+@contextmanager
+def timed(kind: str, op: str):
+    """Times a blocking DB or HTTP call. kind is 'db' or 'http'."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_io(kind, op, time.perf_counter() - started)
+
+
+@asynccontextmanager
+async def atimed(kind: str, op: str):
+    """Async version of timed()."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_io(kind, op, time.perf_counter() - started)
+
+
+def _record_io(kind: str, op: str, seconds: float):
+    if kind == "db":
+        metrics.observe("lumina_db_call_duration_seconds", seconds, op=op)
+    else:
+        metrics.observe("lumina_http_call_duration_seconds", seconds, target=op)
+    metrics.record_run(current_thread_id.get(), kind, op, seconds)
+    log_event(f"{kind}_call", op=op, seconds=round(seconds, 4))
+
+
+def count_retry(kind: str):
+    metrics.inc("lumina_retries_total", kind=kind)
+    metrics.record_run(current_thread_id.get(), "retry", kind)
+    log_event("retry", kind=kind)
+
+
+# --- LLM CALLS ---
+class MetricsCallback(BaseCallbackHandler):
+    """Records model, latency and token usage of every LLM call made through a registry client."""
+
+    run_inline = True  # keep contextvars (thread_id, node) visible in async runs
+
+    def __init__(self, client_name: str):
+        self.client_name = client_name
+        self._starts = {}
+
+    def _start(self, run_id, metadata):
+        metadata = metadata or {}
+        self._starts[run_id] = (
+            time.perf_counter(),
+            metadata.get("ls_model_name", self.client_name),
+            metadata.get("thread_id") or current_thread_id.get(),
+            metadata.get("langgraph_node") or current_node.get() or self.client_name,
+        )
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def _finish(self, run_id, status, prompt_tokens=0, completion_tokens=0):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        started, model, thread_id, node = start
+        seconds = time.perf_counter() - started
+
+        metrics.observe("lumina_llm_call_duration_seconds", seconds, model=model, node=node)
+        metrics.inc("lumina_llm_calls_total", model=model, node=node, status=status)
+        if prompt_tokens:
+            metrics.inc("lumina_llm_tokens_total", prompt_tokens, model=model, node=node, kind="prompt")
+        if completion_tokens:
+            metrics.inc("lumina_llm_tokens_total", completion_tokens, model=model, node=node, kind="completion")
+        metrics.record_run(thread_id, "llm", f"{node}:{model}", seconds,
+                           prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        log_event("llm_call", thread_id=thread_id, node=node, model=model, seconds=round(seconds, 4),
+                  status=status, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        self._finish(run_id, "ok", prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+
+# --- REPORTING ---
+def print_run_summary(thread_id: str):
+    """Per-run table: time, calls and tokens per node / LLM / DB / HTTP, plus route decisions and retries."""
+    summary = metrics.run_summary(thread_id)
+    if not summary:
+        return
+
+    print(f"\n📈 RUN SUMMARY ({thread_id})")
+    print(f"{'CATEGORY':<8}{'NAME':<48}{'CALLS':>6}{'SECONDS':>10}{'TOKENS IN/OUT':>18}")
+    print("-" * 90)
+    for (category, name), row in sorted(summary.items(), key=lambda kv: (kv[0][0], -kv[1].get("seconds", 0))):
+        tokens = ""
+        if category == "llm":
+            tokens = f"{int(row.get('prompt_tokens', 0))}/{int(row.get('completion_tokens', 0))}"
+        print(f"{category:<8}{name[:47]:<48}{int(row['calls']):>6}{row['seconds']:>10.3f}{tokens:>18}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int):
+    """Serves /metrics from a daemon thread (for workers that don't run the FastAPI app)."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📊 Metrics on :{port}/metrics")
+    return server
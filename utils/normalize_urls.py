@@ -1,13 +1,69 @@
-from urllib.parse import urlparse
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Query parameters that only track where a click came from; they never change the page.
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl", "igshid", "ref", "ref_src",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking(param: str) -> bool:
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def _canonical_host(host: str) -> str:
+    host = host.strip(".").lower()
+    try:
+        # IDNA: bücher.de and xn--bcher-kva.de are the same host.
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        raise ValueError(f"Invalid host: {host}")
+    # www aliasing: www.ucp.edu.pk and ucp.edu.pk are one site.
+    if host.startswith("www.") and host.count(".") >= 2:
+        host = host[4:]
+    return host
 
 
 def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL, the one that gets fetched: lowercase IDNA host without "www." or the scheme's
+    default port, no trailing slash, tracking parameters (utm_*, gclid, ...) dropped, remaining query parameters
+    sorted, no fragment. The scheme is kept (https when none is given), so plain-HTTP sites stay reachable.
+    So https://UCP.edu.pk/, https://www.ucp.edu.pk:443 and ucp.edu.pk/?utm_source=x all become https://ucp.edu.pk.
+    """
     url = url.strip()
-    if url.startswith("www."):
-        url = "https://" + url
-    if not urlparse(url).scheme:
+    if "://" not in url:
         url = "https://" + url
     parsed = urlparse(url)
-    if not parsed.netloc or "." not in parsed.netloc:
+    scheme = parsed.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
         raise ValueError(f"Invalid URL format: {url}")
-    return url
+    if not parsed.hostname or "." not in parsed.hostname:
+        raise ValueError(f"Invalid URL format: {url}")
+
+    host = _canonical_host(parsed.hostname)
+    try:
+        port = parsed.port
+    except ValueError:
+        raise ValueError(f"Invalid URL format: {url}")
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    path = parsed.path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                             if not _is_tracking(k)))
+
+    return urlunparse((scheme, host, path, parsed.params, query, ""))
+
+
+def url_key(url: str) -> str:
+    """
+    The key URLs are stored, looked up and deduplicated under: normalize_url with http folded into https,
+    so http://ucp.edu.pk and https://ucp.edu.pk share one record. Not for fetching; see normalize_url.
+    Raises ValueError for invalid URLs.
+    """
+    n = normalize_url(url)
+    return "https" + n[len("http"):] if n.startswith("http://") else n
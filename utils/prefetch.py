@@ -0,0 +1,108 @@
+"""
+Speculative scrape prefetch (SPECULATIVE_SCRAPE=1).
+
+check_db_node starts the Jina scrape of each of its thread's URLs before running the freshness lookups.
+URLs whose stored record turns out fresh are cancelled; for stale ones the per-URL scrape_with_jina branch
+picks up the in-flight result instead of starting over, so new URLs don't pay for the DB check and the scrape in series.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils.metrics import metrics
+from utils.resources import env
+from utils.scrape import ascrape_urls_with_jina
+
+# A prefetch nobody picked up within this window (thread interrupted, process busy elsewhere) is dropped.
+PREFETCH_TTL_SECONDS = 300
+
+_inflight = {}  # (thread_id, url) -> (task, started)
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return env("SPECULATIVE_SCRAPE", "0") == "1"
+
+
+def _record(outcome: str):
+    metrics.inc("lumina_prefetch_total", outcome=outcome)
+
+
+def _cancel(task: asyncio.Task):
+    # Cancelling from another thread must go through the task's own loop.
+    loop = task.get_loop()
+    if loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        task.cancel()
+    else:
+        loop.call_soon_threadsafe(task.cancel)
+
+
+def _sweep():
+    now = time.monotonic()
+    with _lock:
+        expired = [k for k, (_, started) in _inflight.items() if now - started > PREFETCH_TTL_SECONDS]
+        tasks = [_inflight.pop(k)[0] for k in expired]
+    for task in tasks:
+        _cancel(task)
+        _record("expired")
+
+
+def start(thread_id: Optional[str], urls: List[str]):
+    """Starts scraping each of `urls` in the background for `thread_id`. No-op unless enabled."""
+    if not enabled() or not thread_id or not urls:
+        return
+    _sweep()
+
+    for url in urls:
+        task = asyncio.ensure_future(ascrape_urls_with_jina([url]))
+        # A discarded prefetch that failed shouldn't log "exception was never retrieved".
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        with _lock:
+            previous = _inflight.pop((thread_id, url), None)
+            _inflight[(thread_id, url)] = (task, time.monotonic())
+        if previous is not None:
+            _cancel(previous[0])
+        _record("started")
+
+
+def discard(thread_id: Optional[str], urls: List[str] = None):
+    """Cancels prefetches whose stored record turned out fresh (all of the thread's when `urls` is None)."""
+    if not thread_id:
+        return
+    with _lock:
+        keys = [k for k in _inflight if k[0] == thread_id and (urls is None or k[1] in urls)]
+        tasks = [_inflight.pop(k)[0] for k in keys]
+    for task in tasks:
+        _cancel(task)
+        _record("discarded")
+
+
+async def take(thread_id: Optional[str], url: str) -> Optional[Dict[str, str]]:
+    """The prefetched scrape of `url` ({normalized_url: content}), or None if there is none to use."""
+    with _lock:
+        entry = _inflight.pop((thread_id, url), None) if thread_id else None
+    if entry is None:
+        return None
+
+    task, _ = entry
+    if task.get_loop() is not asyncio.get_running_loop():
+        _cancel(task)
+        _record("mismatch")
+        return None
+
+    try:
+        result = await task
+    except Exception as e:
+        print(f"⚠️ Speculative scrape of {url} failed ({e}); scraping again.")
+        _record("failed")
+        return None
+    _record("used")
+    return result
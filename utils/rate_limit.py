@@ -0,0 +1,322 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from utils.metrics import count_retry
+from utils.resources import NORMAL, env, registry
+
+# api key env var -> (requests per minute, tokens per minute). Override with RATE_LIMIT_<KEY>_RPM / _TPM.
+DEFAULT_LIMITS = {
+    "GROQ_API_KEY": (30, 12000),
+    "EVALUATOR_API_KEY": (30, 12000),
+    "GOOGLE_API_KEY": (15, 1000000),
+}
+
+WAITER_POLL_SECONDS = 0.05
+
+
+class _LocalBucket:
+    """Two token buckets (requests and tokens) refilled continuously, owned by this process."""
+
+    blocking_io = False
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm, self.tpm = rpm, tpm
+        self.requests, self.tokens = float(rpm), float(tpm)
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def take(self, tokens: float) -> float:
+        """Takes one request and `tokens` if available and returns 0, else returns the seconds to wait."""
+        self._refill()
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        # A single call larger than the whole minute budget may still go once the bucket is full.
+        tokens = min(tokens, self.tpm)
+        if self.requests >= 1 and self.tokens >= tokens:
+            self.requests -= 1
+            self.tokens -= tokens
+            return 0.0
+
+        wait_requests = (1 - self.requests) * 60 / self.rpm if self.requests < 1 else 0
+        wait_tokens = (tokens - self.tokens) * 60 / self.tpm if self.tokens < tokens else 0
+        return max(wait_requests, wait_tokens)
+
+    def adjust(self, tokens_delta: float):
+        self._refill()
+        self.tokens = min(self.tpm, self.tokens - tokens_delta)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _PostgresBucket:
+    """
+    Same buckets, stored in Postgres so every worker process shares one quota per API key.
+    Refill and take happen in a single UPDATE, so concurrent workers can't overspend.
+    """
+
+    blocking_io = True
+
+    SETUP_QUERY = """
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        key TEXT PRIMARY KEY,
+        requests DOUBLE PRECISION NOT NULL,
+        tokens DOUBLE PRECISION NOT NULL,
+        paused_until TIMESTAMPTZ NOT NULL DEFAULT '1970-01-01',
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+    );
+    """
+
+    INIT_QUERY = """
+    INSERT INTO rate_limit_buckets (key, requests, tokens) VALUES (%(key)s, %(rpm)s, %(tpm)s)
+    ON CONFLICT (key) DO NOTHING;
+    """
+
+    TAKE_QUERY = """
+    WITH refilled AS (
+        SELECT key,
+               LEAST(%(rpm)s,
+                     requests + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * %(rpm)s / 60.0) AS requests,
+               LEAST(%(tpm)s,
+                     tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * %(tpm)s / 60.0) AS tokens,
+               paused_until
+        FROM rate_limit_buckets WHERE key = %(key)s
+        FOR UPDATE
+    )
+    UPDATE rate_limit_buckets b
+    SET requests = CASE WHEN ok THEN r.requests - 1 ELSE r.requests END,
+        tokens = CASE WHEN ok THEN r.tokens - %(need)s ELSE r.tokens END,
+        updated_at = clock_timestamp()
+    FROM (
+        SELECT *, (requests >= 1 AND tokens >= %(need)s AND paused_until <= clock_timestamp()) AS ok FROM refilled
+    ) r
+    WHERE b.key = r.key
+    RETURNING r.ok, r.requests, r.tokens, EXTRACT(EPOCH FROM r.paused_until - clock_timestamp());
+    """
+
+    ADJUST_QUERY = "UPDATE rate_limit_buckets SET tokens = LEAST(%s, tokens - %s) WHERE key = %s;"
+
+    PAUSE_QUERY = """
+    UPDATE rate_limit_buckets
+    SET paused_until = GREATEST(paused_until, clock_timestamp() + make_interval(secs => %s))
+    WHERE key = %s;
+    """
+
+    def __init__(self, key: str, rpm: float, tpm: float):
+        self.key, self.rpm, self.tpm = key, rpm, tpm
+        with registry.get("pool").connection() as conn:
+            conn.execute(self.SETUP_QUERY)
+            conn.execute(self.INIT_QUERY, {"key": key, "rpm": rpm, "tpm": tpm})
+
+    def take(self, tokens: float) -> float:
+        tokens = min(tokens, self.tpm)
+        with registry.get("pool").connection() as conn:
+            ok, requests, available, paused = conn.execute(
+                self.TAKE_QUERY, {"key": self.key, "rpm": self.rpm, "tpm": self.tpm, "need": tokens}
+            ).fetchone()
+        if ok:
+            return 0.0
+        if paused and paused > 0:
+            return float(paused)
+        wait_requests = (1 - requests) * 60 / self.rpm if requests < 1 else 0
+        wait_tokens = (tokens - available) * 60 / self.tpm if available < tokens else 0
+        return max(wait_requests, wait_tokens, WAITER_POLL_SECONDS)
+
+    def adjust(self, tokens_delta: float):
+        with registry.get("pool").connection() as conn:
+            conn.execute(self.ADJUST_QUERY, (self.tpm, tokens_delta, self.key))
+
+    def pause(self, seconds: float):
+        with registry.get("pool").connection() as conn:
+            conn.execute(self.PAUSE_QUERY, (seconds, self.key))
+
+
+class RateGovernor:
+    """
+    Process-wide limiter for one API key. Callers queue in priority order (then FIFO);
+    only the head of the queue may take from the bucket, so a batch caller can't starve interactive ones.
+    """
+
+    def __init__(self, key: str, rpm: float, tpm: float, bucket):
+        self.key = key
+        self.rpm, self.tpm = rpm, tpm
+        self._bucket = bucket
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._seq = itertools.count()
+        self.stats = {"granted": 0, "waited_seconds": 0.0, "rate_limited": 0}
+
+    def _poll(self, entry) -> Optional[float]:
+        """None when `entry` acquired its slot, else how long to sleep before polling again."""
+        with self._lock:
+            if self._waiters[0] is not entry:
+                return WAITER_POLL_SECONDS
+            wait = self._bucket.take(entry[2])
+            if wait <= 0:
+                heapq.heappop(self._waiters)
+                self.stats["granted"] += 1
+                return None
+            return min(wait, 1.0)
+
+    def _enqueue(self, tokens: float, priority: int):
+        entry = [priority, next(self._seq), tokens]
+        with self._lock:
+            heapq.heappush(self._waiters, entry)
+        return entry
+
+    def _dequeue(self, entry):
+        with self._lock:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+
+    async def aacquire(self, tokens: float, priority: int = NORMAL):
+        started = time.monotonic()
+        entry = self._enqueue(tokens, priority)
+        try:
+            while True:
+                if self._bucket.blocking_io:
+                    wait = await asyncio.to_thread(self._poll, entry)
+                else:
+                    wait = self._poll(entry)
+                if wait is None:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._dequeue(entry)
+            raise
+        self.stats["waited_seconds"] += time.monotonic() - started
+
+    def acquire(self, tokens: float, priority: int = NORMAL):
+        started = time.monotonic()
+        entry = self._enqueue(tokens, priority)
+        try:
+            while (wait := self._poll(entry)) is not None:
+                time.sleep(wait)
+        except BaseException:
+            self._dequeue(entry)
+            raise
+        self.stats["waited_seconds"] += time.monotonic() - started
+
+    def settle(self, estimated: float, actual: float):
+        """Corrects the token bucket once the real usage of a call is known."""
+        with self._lock:
+            self._bucket.adjust(actual - estimated)
+
+    def penalize(self, seconds: float):
+        """Stops all callers for `seconds` after the provider answered 429."""
+        with self._lock:
+            self.stats["rate_limited"] += 1
+            self._bucket.pause(seconds)
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(key: str) -> RateGovernor:
+    """Returns the shared governor for an API key env var (e.g. 'GROQ_API_KEY')."""
+    governor = _governors.get(key)
+    if governor is not None:
+        return governor
+
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None:
+            default_rpm, default_tpm = DEFAULT_LIMITS.get(key, (30, 12000))
+            rpm = float(env(f"RATE_LIMIT_{key}_RPM", default_rpm))
+            tpm = float(env(f"RATE_LIMIT_{key}_TPM", default_tpm))
+
+            if env("RATE_LIMIT_BACKEND", "local") == "postgres":
+                bucket = _PostgresBucket(key, rpm, tpm)
+            else:
+                bucket = _LocalBucket(rpm, tpm)
+
+            governor = RateGovernor(key, rpm, tpm, bucket)
+            _governors[key] = governor
+    return governor
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    text = str(error).lower()
+    return status == 429 or "429" in text or "rate limit" in text or "resource_exhausted" in text
+
+
+def _retry_after_seconds(error: BaseException, default: float = 10.0) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _usage_tokens(response) -> Optional[int]:
+    """Total tokens of an LLMResult, from usage_metadata or the provider's llm_output."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("total_tokens")
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+
+class GovernedRateLimiter(BaseRateLimiter):
+    """
+    Plugs a RateGovernor into a chat model's `rate_limiter`, so every call through that client
+    (including the ones the SQL agent and structured-output wrappers make) is governed.
+    The token estimate is a running average of what this client actually used.
+    """
+
+    def __init__(self, key: str, priority: int = NORMAL, initial_estimate: float = 1000):
+        self.governor = get_governor(key)
+        self.priority = priority
+        self.estimate = initial_estimate
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        self.governor.acquire(self.estimate, self.priority)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        await self.governor.aacquire(self.estimate, self.priority)
+        return True
+
+    def observe(self, actual_tokens: int):
+        self.governor.settle(self.estimate, actual_tokens)
+        self.estimate = 0.8 * self.estimate + 0.2 * actual_tokens
+
+
+class GovernorCallback(BaseCallbackHandler):
+    """Settles real token usage after each call and backs off the whole key on 429."""
+
+    def __init__(self, limiter: GovernedRateLimiter):
+        self.limiter = limiter
+
+    def on_llm_end(self, response, **kwargs):
+        actual = _usage_tokens(response)
+        if actual:
+            self.limiter.observe(actual)
+
+    def on_llm_error(self, error: BaseException, **kwargs):
+        if is_rate_limit_error(error):
+            seconds = _retry_after_seconds(error)
+            print(f"🚦 {self.limiter.governor.key}: provider returned 429, pausing {seconds:.0f}s.")
+            self.limiter.governor.penalize(seconds)
+            count_retry("llm_rate_limited")
@@ -0,0 +1,216 @@
+"""
+Hedged, failing-over LLM calls (RESILIENT_LLM=1).
+
+Every registry client gets a latency budget for each call (LLM_LATENCY_BUDGETS, LLM_BUDGET_<NODE> or
+LLM_BUDGET_<NAME>, cut to the time left before the run's deadline) and, when its key is set, a secondary model
+on another provider or key (LLM_SECONDARIES).
+
+- Hedging: when a call has not answered within the client's observed p95 latency, a duplicate goes to the
+  secondary (to the same model with LLM_HEDGE_SAME=1 or without a secondary). The first answer wins and the
+  other request is cancelled. Until LLM_HEDGE_MIN_SAMPLES calls have been seen, the hedge fires at half the budget.
+- Failover: a 429, 5xx, timeout or connection error goes straight to the secondary. Provider SDK retries are
+  turned off for clients that have one, so the error surfaces at once instead of after the SDK's own backoff.
+- Budget: when nothing has answered in time, the call raises TimeoutError and both requests are cancelled.
+
+Outcomes are counted in lumina_llm_resilience_total.
+"""
+import asyncio
+import collections
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+from utils import deadline
+from utils.metrics import current_node, metrics
+from utils.rate_limit import is_rate_limit_error
+from utils.resources import LLM_LATENCY_BUDGETS, LLM_SECONDARIES, LLM_SPECS, env
+
+LATENCY_WINDOW = 200
+DEFAULT_BUDGET_SECONDS = 30
+
+_latencies = {}  # client name -> recent successful call durations
+
+
+def enabled() -> bool:
+    return env("RESILIENT_LLM", "0") == "1"
+
+
+def hedging_enabled() -> bool:
+    return env("LLM_HEDGING", "1") == "1"
+
+
+def secondary_spec(name: str) -> Optional[Tuple[str, str, str]]:
+    """(provider, model, key env) of the client's secondary, or None when it has none or its key is missing."""
+    override = env(f"LLM_SECONDARY_{name.upper()}")
+    if override:
+        if override.lower() == "none":
+            return None
+        parts = override.split(":")
+        if len(parts) < 3:
+            print(f"⚠️ Ignoring LLM_SECONDARY_{name.upper()}='{override}' (expected provider:model:KEY_ENV).")
+            return None
+        spec = (parts[0], ":".join(parts[1:-1]), parts[-1])
+    else:
+        spec = LLM_SECONDARIES.get(name)
+    if spec is None or not env(spec[2]):
+        return None
+    return spec
+
+
+def budget(name: str) -> float:
+    """Seconds one call may take: per node, then per client, then the default table; never past the run deadline."""
+    node = current_node.get()
+    for key in ([f"LLM_BUDGET_{node.upper()}"] if node else []) + [f"LLM_BUDGET_{name.upper()}"]:
+        value = env(key)
+        if value:
+            return deadline.timeout(float(value))
+    return deadline.timeout(float(LLM_LATENCY_BUDGETS.get(name, DEFAULT_BUDGET_SECONDS)))
+
+
+def observe(name: str, seconds: float):
+    _latencies.setdefault(name, collections.deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(name: str, limit: float) -> float:
+    """When to send the hedge: the client's p95 latency so far, or half the budget while too few calls were seen."""
+    samples = sorted(_latencies.get(name, ()))
+    if len(samples) < int(env("LLM_HEDGE_MIN_SAMPLES", 20)):
+        return limit / 2
+    return min(samples[int(0.95 * (len(samples) - 1))], limit)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429, 5xx, timeouts and connection errors: worth sending to another model."""
+    if is_rate_limit_error(error):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None) \
+        or getattr(error, "code", None)
+    if isinstance(status, int) and 500 <= status < 600:
+        return True
+    name = type(error).__name__.lower()
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)) or "timeout" in name or "connect" in name
+
+
+def _record(name: str, outcome: str):
+    metrics.inc("lumina_llm_resilience_total", client=name, node=current_node.get() or name, outcome=outcome)
+
+
+async def ahedged_call(name: str, primary: Callable, secondary: Optional[Callable], limit: float):
+    """
+    Runs `primary()` within `limit` seconds, hedging and failing over to `secondary()` (or another `primary()`
+    for the hedge when there is no secondary). Returns the first successful result.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + limit
+    hedge_at = started + hedge_delay(name, limit) if hedging_enabled() else deadline
+    tasks = {}  # task -> (label, started at)
+    hedged = False
+    last_error: Optional[BaseException] = None
+
+    def launch(label: str, call: Callable):
+        tasks[asyncio.ensure_future(call())] = (label, loop.time())
+
+    launch("primary", primary)
+    try:
+        while tasks:
+            now = loop.time()
+            if now >= deadline:
+                _record(name, "timeout")
+                raise asyncio.TimeoutError(f"{name}: no answer within the {limit:g}s budget")
+            wake = deadline if hedged else min(hedge_at, deadline)
+            done, _ = await asyncio.wait(tasks, timeout=max(wake - now, 0), return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                label, task_started = tasks.pop(task)
+                error = task.exception()
+                if error is None:
+                    # p95 tracks the primary model. When another request won, the primary's time so far
+                    # is a lower bound on its latency; leaving it out would drag the p95 down.
+                    primary_started = task_started if label == "primary" else next(
+                        (s for other, s in tasks.values() if other == "primary"), None)
+                    if primary_started is not None:
+                        observe(name, loop.time() - primary_started)
+                    _record(name, f"{label}_won")
+                    return task.result()
+                if not is_retryable(error):
+                    raise error
+                last_error = error
+                if label == "primary" and secondary is not None and not hedged:
+                    # The hedge and the failover are the same request; send it once.
+                    print(f"🔀 {name}: primary failed ({type(error).__name__}); failing over.")
+                    hedged = True
+                    launch("failover", secondary)
+                    _record(name, "failover")
+
+            if not done and not hedged and loop.time() >= hedge_at:
+                hedged = True
+                same = secondary is None or env("LLM_HEDGE_SAME", "0") == "1"
+                launch("hedge", primary if same else secondary)
+                _record(name, "hedged")
+
+        _record(name, "failed")
+        raise last_error
+    finally:
+        # The losing request is cancelled, which closes its HTTP connection.
+        for task in tasks:
+            task.cancel()
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    Wraps a client's primary model (and optional secondary) so every generation goes through ahedged_call.
+    Both inner models keep their own rate limiter and callbacks; this wrapper has none of its own.
+    """
+
+    client: str
+    primary: BaseChatModel
+    secondary: Optional[BaseChatModel] = None
+    bound_tools: Optional[List] = None
+    tool_kwargs: dict = Field(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tools are bound per inner model at call time, so each provider formats them its own way.
+        return self.model_copy(update={"bound_tools": list(tools), "tool_kwargs": kwargs})
+
+    def _runnable(self, model: BaseChatModel):
+        return model.bind_tools(self.bound_tools, **self.tool_kwargs) if self.bound_tools is not None else model
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        def call(model):
+            return lambda: self._runnable(model).ainvoke(messages, stop=stop, **kwargs)
+
+        message = await ahedged_call(
+            self.client, call(self.primary), call(self.secondary) if self.secondary is not None else None,
+            budget(self.client),
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        from utils.async_utils import run_sync
+        return run_sync(self._agenerate(messages, stop=stop, **kwargs))
+
+
+def wrap(name: str, build: Callable):
+    """
+    The registry client `name`. build(provider, model, key_env, **options) makes one provider model;
+    with RESILIENT_LLM=1 the primary and the secondary are both built and wrapped in a ResilientChatModel.
+    """
+    provider, model, key_env, _ = LLM_SPECS[name]
+    if not enabled():
+        return build(provider, model, key_env)
+
+    spec = secondary_spec(name)
+    if spec is None:
+        return ResilientChatModel(client=name, primary=build(provider, model, key_env))
+    return ResilientChatModel(
+        client=name,
+        primary=build(provider, model, key_env, max_retries=0),
+        secondary=build(*spec, max_retries=0),
+    )
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def ensure_env():
+    """Loads .env once per process (instead of once per imported module)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            started = time.perf_counter()
+            load_dotenv(override=True)
+            registry.record_timing("env", time.perf_counter() - started)
+            _env_loaded = True
+
+
+def env(name: str, default=None):
+    """os.getenv after making sure .env has been loaded."""
+    ensure_env()
+    return os.getenv(name, default)
+
+
+class ResourceRegistry:
+    """
+    Lazily built, process-wide resources (pools, LLM clients, Chroma, the SQL agent, the compiled graph).
+    Modules register a factory at import time, which is free; the factory only runs on first get().
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+        self.timings = {}
+
+    def register(self, name: str, factory):
+        self._factories[name] = factory
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                if name not in self._factories:
+                    raise KeyError(f"No resource registered under '{name}'")
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self.record_timing(name, time.perf_counter() - started)
+                self._instances[name] = instance
+        return instance
+
+    def override(self, name: str, instance):
+        """Replaces a resource with a ready-made instance (tests, benchmarks)."""
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, name: str = None):
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def names(self):
+        return list(self._factories)
+
+    def record_timing(self, name: str, seconds: float):
+        self.timings[name] = seconds
+
+
+registry = ResourceRegistry()
+
+
+# --- LLM CLIENTS ---
+# name -> (provider, model, api key env var, temperature)
+LLM_SPECS = {
+    "intake": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY", 0),
+    "sql_agent": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY", 0),
+    "summarizer": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY", 0),
+    "generator": ("groq", "openai/gpt-oss-120b", "EVALUATOR_API_KEY", 0.5),
+    "evaluator": ("groq", "llama-3.3-70b-versatile", "EVALUATOR_API_KEY", 0.1),
+    "rag_reader": ("google", "gemini-1.5-flash", "GOOGLE_API_KEY", 0),
+    # Small tier for simple structured tasks; see utils/tiering.py for when they escalate.
+    "intake_small": ("groq", "llama-3.1-8b-instant", "GROQ_API_KEY", 0),
+    "sql_agent_small": ("groq", "llama-3.1-8b-instant", "GROQ_API_KEY", 0),
+    "evaluator_small": ("groq", "llama-3.1-8b-instant", "EVALUATOR_API_KEY", 0.1),
+}
+
+
+# name -> (provider, model, api key env var) to fail over and hedge to with RESILIENT_LLM=1 (utils/resilience.py).
+# Used only when its key is set. Override per client with LLM_SECONDARY_<NAME>=provider:model:KEY_ENV, or "none".
+LLM_SECONDARIES = {
+    "intake": ("google", "gemini-1.5-flash", "GOOGLE_API_KEY"),
+    "sql_agent": ("google", "gemini-1.5-flash", "GOOGLE_API_KEY"),
+    "summarizer": ("google", "gemini-1.5-flash", "GOOGLE_API_KEY"),
+    "generator": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY"),
+    "evaluator": ("google", "gemini-1.5-flash", "GOOGLE_API_KEY"),
+    "rag_reader": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY"),
+    "intake_small": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY"),
+    "sql_agent_small": ("groq", "llama-3.3-70b-versatile", "GROQ_API_KEY"),
+    "evaluator_small": ("groq", "llama-3.3-70b-versatile", "EVALUATOR_API_KEY"),
+}
+
+# name -> seconds one call may take, hedge and failover included, with RESILIENT_LLM=1.
+# Override per node with LLM_BUDGET_<NODE> (e.g. LLM_BUDGET_GENERATE_POST=30) or per client with LLM_BUDGET_<NAME>.
+LLM_LATENCY_BUDGETS = {
+    "intake": 20,
+    "sql_agent": 30,
+    "summarizer": 60,
+    "generator": 45,
+    "evaluator": 20,
+    "rag_reader": 20,
+    "intake_small": 10,
+    "sql_agent_small": 15,
+    "evaluator_small": 10,
+}
+
+
+# Rate governor priority classes: lower goes first. Interactive intake must not queue behind batch summarization.
+# Defined here so LLM_PRIORITIES can use them; utils/rate_limit.py imports this module.
+INTERACTIVE = 0
+NORMAL = 1
+BATCH = 2
+
+# name -> rate governor priority. Interactive intake goes ahead of batch work.
+LLM_PRIORITIES = {
+    "intake": INTERACTIVE,
+    "sql_agent": INTERACTIVE,
+    "rag_reader": INTERACTIVE,
+    "generator": NORMAL,
+    "evaluator": NORMAL,
+    "summarizer": BATCH,
+    "intake_small": INTERACTIVE,
+    "sql_agent_small": INTERACTIVE,
+    "evaluator_small": NORMAL,
+}
+
+
+def _build_llm(name: str):
+    from utils import cassette, resilience
+    from utils.metrics import MetricsCallback
+    from utils.rate_limit import GovernedRateLimiter, GovernorCallback
+
+    provider, model, key_env, temperature = LLM_SPECS[name]
+
+    # Replayed threads never reach a provider, so no SDK, key or quota is involved.
+    if cassette.mode() == cassette.REPLAY:
+        return cassette.CassetteChatModel(model_name=model, callbacks=[MetricsCallback(name)])
+
+    def governed(key_env: str) -> dict:
+        # Every client sharing an API key draws from the same governor.
+        rate_limiter = GovernedRateLimiter(key_env, priority=LLM_PRIORITIES.get(name, NORMAL))
+        return {"rate_limiter": rate_limiter, "callbacks": [GovernorCallback(rate_limiter), MetricsCallback(name)]}
+
+    if cassette.mode() == cassette.RECORD:
+        inner = resilience.wrap(name, lambda p, m, k, **options: _build_provider_llm(p, m, k, temperature, **options))
+        return cassette.CassetteChatModel(inner=inner, model_name=model, **governed(key_env))
+
+    # With RESILIENT_LLM=1 the client hedges and fails over to its secondary (utils/resilience.py).
+    return resilience.wrap(
+        name, lambda p, m, k, **options: _build_provider_llm(p, m, k, temperature, **options, **governed(k))
+    )
+
+
+def _build_provider_llm(provider: str, model: str, key_env: str, temperature: float, **extra):
+    common = {"api_key": env(key_env), "temperature": temperature, **extra}
+
+    # Provider SDKs are imported on demand; they dominate import time.
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(model=model, **common)
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, **common)
+
+
+def get_llm(name: str):
+    return registry.get(f"llm:{name}")
+
+
+for _llm_name in LLM_SPECS:
+    registry.register(f"llm:{_llm_name}", lambda _name=_llm_name: _build_llm(_name))
+
+
+# --- OTHER SHARED RESOURCES ---
+def _build_rag_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001", api_key=env("GOOGLE_API_KEY"))
+
+
+def _build_chroma_collection():
+    from chromadb import PersistentClient
+    chroma_client = PersistentClient(path="./chroma_db")
+    return chroma_client.get_or_create_collection(name="university_db")
+
+
+def _build_sync_pool():
+    from psycopg_pool import ConnectionPool
+    return ConnectionPool(conninfo=env("DATABASE_URL"), max_size=20)
+
+
+registry.register("rag_embeddings", _build_rag_embeddings)
+registry.register("chroma_collection", _build_chroma_collection)
+registry.register("pool", _build_sync_pool)
+
+
+def print_startup_profile(import_timings: dict = None):
+    """Prints where startup time went: module imports, then each resource's first initialization."""
+    rows = [(f"import {k}", v) for k, v in (import_timings or {}).items()]
+    rows += [(f"init {k}", v) for k, v in registry.timings.items()]
+    total = sum(v for _, v in rows)
+
+    print("\n⏱️  STARTUP PROFILE")
+    print(f"{'STEP':<40}{'SECONDS':>10}{'SHARE':>8}")
+    print("-" * 58)
+    for step, seconds in sorted(rows, key=lambda r: r[1], reverse=True):
+        share = (seconds / total * 100) if total else 0
+        print(f"{step:<40}{seconds:>10.3f}{share:>7.1f}%")
+    print("-" * 58)
+    print(f"{'TOTAL':<40}{total:>10.3f}")
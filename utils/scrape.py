@@ -1,43 +1,104 @@
-import os
+import asyncio
 
-import requests
+import httpx
 from typing import List, Dict
 
+from utils import cassette, deadline, singleflight
+from utils.async_utils import run_sync
+from utils.metrics import atimed
 from utils.normalize_urls import normalize_url
+from utils.resources import env
 
 JINA_READER_PREFIX = "https://r.jina.ai/"
-JINA_API_KEY = os.getenv("JINA_API_KEY")
+JINA_TIMEOUT_SECONDS = 30
+REDIRECT_TIMEOUT_SECONDS = 10
 
+# Content returned in place of a page when the fetch failed.
+SCRAPE_ERROR_PREFIXES = ("[INVALID URL]", "[JINA ERROR]")
 
-def scrape_urls_with_jina(urls: List[str]) -> Dict[str, str]:
-    """
-    Returns a mapping normalized_url -> content (string) or error string
-    """
-    out: Dict[str, str] = {}
-    if not JINA_API_KEY:
-        raise EnvironmentError("JINA_API_KEY not set in environment")
 
-    headers = {
-        "Authorization": f"Bearer {JINA_API_KEY}",
+def _reader_prefix() -> str:
+    # JINA_READER_URL points the scraper at a stand-in reader (see bench/stubs.py).
+    return env("JINA_READER_URL", JINA_READER_PREFIX)
+
+
+def _jina_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {env('JINA_API_KEY')}",
         "X-Engine": "direct",
         "X-Return-Format": "text",
         "X-With-Images-Summary": "all",
         "X-With-Links-Summary": "all"
     }
 
-    for url in urls:
-        try:
-            n = normalize_url(url)
-        except ValueError as e:
-            out[url] = f"[INVALID URL] {e}"
-            continue
 
-        target = f"{JINA_READER_PREFIX}{n}"
+async def _fetch_one(client: httpx.AsyncClient, url: str):
+    """
+    Fetches a single URL through the Jina reader.
+    Returns (key, content) where key is the normalized url (or the raw url if invalid).
+    """
+    try:
+        n = normalize_url(url)
+    except ValueError as e:
+        return url, f"[INVALID URL] {e}"
+
+    async def fetch():
+        target = f"{_reader_prefix()}{n}"
         try:
-            resp = requests.get(target, headers=headers, timeout=30)
+            async with atimed("http", "jina_reader"):
+                resp = await client.get(target)
             resp.raise_for_status()
-            out[n] = resp.text
-        except requests.RequestException as e:
-            out[n] = f"[JINA ERROR] {e}"
+            return resp.text
+        except httpx.HTTPError as e:
+            return f"[JINA ERROR] {e}"
+
+    async def shared_fetch():
+        # Concurrent scrapes of the same page (other threads, prefetch) share one request.
+        return await singleflight.ado(singleflight.key("scrape", n), fetch)
+
+    return n, await cassette.arecord_or_replay(cassette.HTTP, n, shared_fetch)
+
+
+async def aresolve_redirects(url: str) -> str:
+    """
+    The canonical form of wherever `url` lands after following redirects,
+    or of `url` itself when it can't be reached. Raises ValueError for invalid URLs.
+    """
+    n = normalize_url(url)
+
+    async def follow():
+        limit = deadline.timeout(REDIRECT_TIMEOUT_SECONDS)
+        try:
+            async with atimed("http", "resolve_redirects"), \
+                    httpx.AsyncClient(follow_redirects=True, timeout=limit) as client:
+                resp = await client.head(n)
+            return str(resp.url)
+        except httpx.HTTPError:
+            return n
+
+    final = await cassette.arecord_or_replay(cassette.HTTP, {"op": "resolve_redirects", "url": n}, follow)
+    try:
+        return normalize_url(final)
+    except ValueError:
+        return n
+
+
+async def ascrape_urls_with_jina(urls: List[str]) -> Dict[str, str]:
+    """
+    Async version of scrape_urls_with_jina. All URLs are fetched concurrently,
+    each within JINA_TIMEOUT_SECONDS or the time left before the run's deadline, whichever is shorter.
+    """
+    if not env("JINA_API_KEY"):
+        raise EnvironmentError("JINA_API_KEY not set in environment")
+
+    async with httpx.AsyncClient(headers=_jina_headers(), timeout=deadline.timeout(JINA_TIMEOUT_SECONDS)) as client:
+        results = await asyncio.gather(*(_fetch_one(client, url) for url in urls))
+
+    return dict(results)
+
 
-    return out
+def scrape_urls_with_jina(urls: List[str]) -> Dict[str, str]:
+    """
+    Returns a mapping normalized_url -> content (string) or error string
+    """
+    return run_sync(ascrape_urls_with_jina(urls))
@@ -0,0 +1,165 @@
+"""
+Single-flight deduplication of concurrent identical work (SINGLEFLIGHT=0 turns it off).
+
+Concurrent callers passing the same key share one in-flight computation: the first caller runs it,
+the others wait for its result instead of repeating the SQL check, the Jina scrape or the summary.
+Keys are built from the normalized URL, plus a content hash where the work depends on the page (see key()).
+
+With SINGLEFLIGHT_PG_LOCKS=1, calls that pass a `recheck` also serialize across workers on a Postgres
+session-level advisory lock. Whoever gets the lock second runs `recheck` first and reuses the
+result the other worker stored, instead of computing (and inserting) it again.
+
+The lock is held on an autocommit connection from a small pool of its own (SINGLEFLIGHT_LOCK_POOL_SIZE), so
+no transaction stays open during the computation and `recheck`/`call` still get connections from the main
+pool. When no lock connection frees up within LOCK_CHECKOUT_SECONDS the call runs unlocked; the stored
+result is idempotent, so the worst case is computing it twice.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+from psycopg_pool import PoolTimeout
+
+from db.pool import get_async_pool
+from utils.metrics import atimed, metrics
+from utils.normalize_urls import url_key
+from utils.resources import env
+
+ADVISORY_LOCK_QUERY = "SELECT pg_advisory_lock(hashtextextended(%s, 0))"
+ADVISORY_UNLOCK_QUERY = "SELECT pg_advisory_unlock(hashtextextended(%s, 0))"
+LOCK_POOL = "singleflight_locks"
+LOCK_CHECKOUT_SECONDS = 5
+
+_inflight = {}  # key -> _Flight
+_lock = threading.Lock()
+
+
+class _Flight:
+    """One in-flight computation. The result lives in a thread-safe future so callers on any loop can wait."""
+
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+def enabled() -> bool:
+    return env("SINGLEFLIGHT", "1") == "1"
+
+
+def pg_locks_enabled() -> bool:
+    return env("SINGLEFLIGHT_PG_LOCKS", "0") == "1"
+
+
+def key(kind: str, url: str, content: Optional[str] = None) -> str:
+    """'kind:url' or 'kind:url:sha256(content)', with the URL's lookup key so spelling variants share a flight."""
+    try:
+        url = url_key(url)
+    except ValueError:
+        pass
+    parts = [kind, url]
+    if content is not None:
+        parts.append(hashlib.sha256(content.encode("utf-8")).hexdigest())
+    return ":".join(parts)
+
+
+def _record(outcome: str):
+    metrics.inc("lumina_singleflight_total", outcome=outcome)
+
+
+async def _acompute(flight_key: str, call: Callable[[], Awaitable[Any]],
+                    recheck: Optional[Callable[[], Awaitable[Any]]]):
+    if recheck is None or not pg_locks_enabled():
+        return await call()
+
+    pool = await get_async_pool(
+        env("DATABASE_URL"), int(env("SINGLEFLIGHT_LOCK_POOL_SIZE", 5)), name=LOCK_POOL, autocommit=True
+    )
+    try:
+        conn = await pool.getconn(timeout=LOCK_CHECKOUT_SECONDS)
+    except PoolTimeout:
+        _record("lock_unavailable")
+        return await call()
+
+    locked = unlocked = False
+    try:
+        async with atimed("db", "singleflight_lock"):
+            await conn.execute(ADVISORY_LOCK_QUERY, (flight_key,))
+        locked = True
+        found = await recheck()
+        if found is not None:
+            _record("shared_across_workers")
+            return found
+        return await call()
+    finally:
+        try:
+            if locked:
+                await conn.execute(ADVISORY_UNLOCK_QUERY, (flight_key,))
+                unlocked = True
+        finally:
+            if not unlocked:
+                # The lock may still be held (or still being waited for); closing the connection releases it,
+                # and the pool replaces a closed connection instead of handing it out again.
+                await conn.close()
+            await pool.putconn(conn)
+
+
+async def _alead(flight_key: str, flight: _Flight, call, recheck):
+    try:
+        result = await _acompute(flight_key, call, recheck)
+    except asyncio.CancelledError:
+        with _lock:
+            _inflight.pop(flight_key, None)
+        flight.future.cancel()
+        raise
+    except BaseException as e:
+        with _lock:
+            _inflight.pop(flight_key, None)
+        flight.future.set_exception(e)
+        return
+
+    with _lock:
+        _inflight.pop(flight_key, None)
+    flight.future.set_result(result)
+
+
+def _leave(flight: _Flight):
+    # The last waiter to give up cancels the computation; nobody is left to use the result.
+    with _lock:
+        flight.waiters -= 1
+        abandoned = flight.waiters == 0 and not flight.future.done()
+    task = flight.task
+    if abandoned and task is not None and not task.get_loop().is_closed():
+        task.get_loop().call_soon_threadsafe(task.cancel)
+
+
+async def ado(flight_key: str, call: Callable[[], Awaitable[Any]],
+              recheck: Optional[Callable[[], Awaitable[Any]]] = None):
+    """
+    Runs `call()` once for all concurrent callers with the same key and returns its result to each of them.
+    `recheck()` (optional) returns the result another worker already stored, or None; it is only
+    consulted under the cross-worker advisory lock.
+    """
+    if not enabled():
+        return await call()
+
+    with _lock:
+        flight = _inflight.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[flight_key] = _Flight()
+        flight.waiters += 1
+
+    if leader:
+        flight.task = asyncio.ensure_future(_alead(flight_key, flight, call, recheck))
+        _record("leader")
+    else:
+        _record("shared")
+
+    try:
+        # shield: one caller being cancelled must not cancel the computation the others are waiting on.
+        return await asyncio.shield(asyncio.wrap_future(flight.future))
+    finally:
+        _leave(flight)
@@ -0,0 +1,76 @@
+from typing import Awaitable, Callable, List, Optional
+
+from utils import deadline
+from utils.metrics import current_node, current_thread_id, metrics
+from utils.resources import env
+
+# task -> registry names to try, cheapest first. The last entry is the model the task used before tiering.
+# Force a tier per task with MODEL_TIER_<TASK>=small|large (e.g. MODEL_TIER_EVALUATOR=large).
+# Close to the run's deadline (utils/deadline.py) only the small tier runs; there is no time to escalate.
+MODEL_TIERS = {
+    "intake": ["intake_small", "intake"],
+    "sql_agent": ["sql_agent_small", "sql_agent"],
+    "evaluator": ["evaluator_small", "evaluator"],
+}
+
+
+def tiers(task: str) -> List[str]:
+    chain = MODEL_TIERS.get(task, [task])
+    forced = env(f"MODEL_TIER_{task.upper()}", "").lower()
+    if forced == "large":
+        return chain[-1:]
+    if forced == "small":
+        return chain[:1]
+    if len(chain) > 1 and deadline.short():
+        deadline.degrade("small_model")
+        return chain[:1]
+    return chain
+
+
+def _record(task: str, tier: str, outcome: str, reason: str = None):
+    node = current_node.get() or task
+    metrics.inc("lumina_tier_calls_total", task=task, tier=tier, node=node, outcome=outcome)
+    if reason:
+        metrics.inc("lumina_tier_escalations_total", task=task, node=node, reason=reason)
+        metrics.record_run(current_thread_id.get(), "escalate", f"{task}:{reason}")
+
+
+async def arun_tiered(task: str, call: Callable[[str], Awaitable], validate: Callable[[object], Optional[str]]):
+    """
+    Runs `call(name)` on each tier of `task` until `validate(result)` accepts it.
+    validate returns None when the answer is usable, otherwise a short reason ('parse', 'invalid', ...).
+    Errors on a lower tier escalate too; the last tier's answer is returned (or its error raised) as before tiering.
+    """
+    chain = tiers(task)
+    for i, name in enumerate(chain):
+        last = i == len(chain) - 1
+        try:
+            result = await call(name)
+            reason = validate(result)
+        except Exception as e:
+            if last:
+                _record(task, name, "error")
+                raise
+            result, reason = None, f"error:{type(e).__name__}"
+
+        if reason is None or last:
+            _record(task, name, "accepted")
+            return result
+
+        print(f"⬆️ {task}: {name} answer rejected ({reason}); escalating.")
+        _record(task, name, "escalated", reason)
+
+
+def escalation_rates() -> dict:
+    """Share of first-tier answers that had to be escalated, per (task, node)."""
+    calls = metrics.counter_values("lumina_tier_calls_total")
+    totals, escalated = {}, {}
+    for labels, value in calls.items():
+        labels = dict(labels)
+        if labels["tier"] != MODEL_TIERS.get(labels["task"], [labels["tier"]])[0]:
+            continue
+        key = (labels["task"], labels["node"])
+        totals[key] = totals.get(key, 0) + value
+        if labels["outcome"] == "escalated":
+            escalated[key] = escalated.get(key, 0) + value
+    return {key: escalated.get(key, 0) / total for key, total in totals.items() if total}
@@ -0,0 +1,26 @@
+from typing import Dict, List
+
+from db.blob_store import aresolve_blob
+
+
+def as_url_list(urls) -> List[str]:
+    """state['URL'] as a list, whichever shape it arrived in."""
+    if not urls:
+        return []
+    return list(urls) if isinstance(urls, list) else [urls]
+
+
+async def amerge_summaries(urls: List[str], records: Dict[str, dict]) -> str:
+    """
+    The per-URL summaries merged for generation, in the order the URLs were given.
+    A single source is passed through unchanged, so one-URL posts see exactly what they did before.
+    """
+    parts = []
+    for url in urls:
+        summary = await aresolve_blob((records.get(url) or {}).get("summary"))
+        if summary:
+            parts.append((url, summary))
+
+    if len(parts) == 1:
+        return parts[0][1]
+    return "\n\n".join(f"### SOURCE: {url}\n{summary}" for url, summary in parts)
@@ -0,0 +1,233 @@
+"""
+Pulls graph jobs from the Postgres queue (db/job_queue.py) and runs them on the async agent.
+
+Usage:
+    python -m workers.queue_worker run --concurrency 8
+    python -m workers.queue_worker submit "ucp.edu.pk admissions" --posts 3 --deadline-seconds 300
+    python -m workers.queue_worker review <thread_id> --approve | --feedback "Make it shorter"
+    python -m workers.queue_worker answer <thread_id> "https://ucp.edu.pk/admissions"
+    python -m workers.queue_worker stats
+"""
+import argparse
+import asyncio
+import os
+import socket
+import uuid
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+
+from db import job_queue
+from utils import cassette, deadline
+from utils.fanout import FANOUT_NODE, aseed_post_threads, child_thread_ids
+from utils.metrics import start_metrics_server
+from utils.resources import env
+
+LEASE_SECONDS = 120
+IDLE_POLL_SECONDS = 1.0
+
+
+# --- PRODUCER SIDE ---
+async def asubmit(query: str, num_posts: int = 1, deadline_seconds: Optional[float] = None) -> str:
+    """
+    Queues a new run. Multi-post runs resolve shared context once, then fan out (see utils/fanout.py).
+    Each stretch of automated work gets deadline_seconds (default RUN_DEADLINE_SECONDS; see utils/deadline.py).
+    """
+    from Graph import INTERRUPT_BEFORE
+
+    job_id = str(uuid.uuid4())
+    if num_posts <= 1:
+        await job_queue.aenqueue(job_id, f"{job_id}_post_1", job_queue.RUN,
+                                 {"query": query, "deadline_seconds": deadline_seconds})
+    else:
+        await job_queue.aenqueue(job_id, f"{job_id}_shared", job_queue.RUN, {
+            "query": query,
+            "num_posts": num_posts,
+            "interrupt_before": [FANOUT_NODE] + INTERRUPT_BEFORE,
+            "deadline_seconds": deadline_seconds,
+        })
+    return job_id
+
+
+async def aresume(job_id: str, thread_id: str, as_node: str, values: dict = None, message: str = None,
+                  interrupt_before: list = None):
+    """
+    Queues a human decision for a thread released at an interrupt.
+    The thread keeps the fan-out settings of the run that started it, so a shared thread resumed from
+    human_assistance still stops at the fan-out node and forks its posts.
+    """
+    run_payload = await job_queue.arun_payload(thread_id)
+    await job_queue.aenqueue(job_id, thread_id, job_queue.RESUME, {
+        "as_node": as_node,
+        "values": values,
+        "message": message,
+        "interrupt_before": interrupt_before if interrupt_before is not None else run_payload.get("interrupt_before"),
+        "num_posts": run_payload.get("num_posts"),
+        "deadline_seconds": run_payload.get("deadline_seconds"),
+    })
+
+
+def job_id_of(thread_id: str) -> str:
+    """The job a thread belongs to ("<job_id>_post_<n>" or "<job_id>_shared")."""
+    if thread_id.endswith("_shared"):
+        return thread_id[:-len("_shared")]
+    return thread_id.rsplit("_post_", 1)[0]
+
+
+# --- WORKER SIDE ---
+async def _apply_resume(agent, config: dict, payload: dict):
+    snapshot = await agent.aget_state(config)
+    as_node = payload["as_node"]
+
+    # A retried resume may already have applied its update; only apply it while the thread still waits there.
+    if as_node not in snapshot.next:
+        return
+
+    if payload.get("message") is not None:
+        values = {"messages": [HumanMessage(content=payload["message"])]}
+    else:
+        values = payload.get("values") or {}
+    await cassette.anote_update(config, values, as_node)
+    await agent.aupdate_state(config, values, as_node=as_node)
+
+
+async def run_job(agent, job: dict) -> dict:
+    """
+    Drives one thread until it ends or stops at an interrupt.
+    Returns the result stored on the job row; fan-out children are queued from here.
+    """
+    payload = job["payload"] or {}
+    config = {"configurable": {"thread_id": job["thread_id"]}}
+
+    graph_input = None
+    if job["kind"] == job_queue.RESUME:
+        await _apply_resume(agent, config, payload)
+    else:
+        # A retried run resumes from its last checkpoint instead of re-sending the query.
+        snapshot = await agent.aget_state(config)
+        if not snapshot.values and payload.get("query"):
+            graph_input = {"messages": [HumanMessage(content=payload["query"])]}
+
+    # Fan-out children inherit the deadline of the stretch that forked them; anything else starts a new one.
+    run_deadline = payload.get("deadline") or deadline.after(payload.get("deadline_seconds"))
+    await cassette.anote_run(config, graph_input, payload.get("interrupt_before"))
+    await agent.ainvoke(graph_input, deadline.with_deadline(config, run_deadline),
+                        interrupt_before=payload.get("interrupt_before"))
+    snapshot = await agent.aget_state(config)
+
+    if not snapshot.next:
+        return {"next": None, "post_heading": snapshot.values.get("post_heading")}
+
+    next_node = snapshot.next[0]
+    if next_node == FANOUT_NODE:
+        # Only a shared thread stops here. Resumes queued without the fan-out settings look them up.
+        num_posts = payload.get("num_posts") or (await job_queue.arun_payload(job["thread_id"])).get("num_posts") or 1
+        child_ids = child_thread_ids(job["job_id"], num_posts)
+        await aseed_post_threads(agent, config, child_ids)
+        for child_id in child_ids:
+            await job_queue.aenqueue(job["job_id"], child_id, job_queue.RUN,
+                                     {"deadline": run_deadline, "deadline_seconds": payload.get("deadline_seconds")})
+        return {"next": None, "forked": child_ids}
+
+    return {"next": next_node}
+
+
+async def _heartbeat(job: dict, worker_id: str, task: asyncio.Task):
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        if not await job_queue.aheartbeat(job["id"], worker_id, LEASE_SECONDS):
+            print(f"⚠️ Lost lease on job {job['id']}; abandoning it.")
+            task.cancel()
+            return
+
+
+async def worker_loop(worker_id: str):
+    from Graph import aget_agent
+
+    agent = await aget_agent()
+    while True:
+        job = await job_queue.aclaim(worker_id, LEASE_SECONDS)
+        if job is None:
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        print(f"🏃 {worker_id}: {job['kind']} {job['thread_id']} (attempt {job['attempts']})")
+        run_task = asyncio.create_task(run_job(agent, job))
+        heartbeat_task = asyncio.create_task(_heartbeat(job, worker_id, run_task))
+        try:
+            result = await run_task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise  # the worker itself is shutting down
+            continue  # lease lost; the job belongs to someone else now
+        except Exception as e:
+            await job_queue.afail(job, worker_id, str(e))
+            continue
+        finally:
+            heartbeat_task.cancel()
+
+        status = job_queue.INTERRUPTED if result.get("next") else job_queue.DONE
+        await job_queue.afinish(job["id"], worker_id, status, result)
+
+
+async def run_workers(concurrency: int):
+    await job_queue.acreate_queue_tables()
+    if env("METRICS_PORT"):
+        start_metrics_server(int(env("METRICS_PORT")))
+    host = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"🚀 Queue worker {host} running {concurrency} slots.")
+    await asyncio.gather(*(worker_loop(f"{host}-{i}") for i in range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Postgres-backed graph job queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Start worker slots.")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+
+    submit_parser = sub.add_parser("submit", help="Queue a new run.")
+    submit_parser.add_argument("query")
+    submit_parser.add_argument("--posts", type=int, default=1)
+    submit_parser.add_argument("--deadline-seconds", type=float, default=None,
+                               help="Budget per stretch of automated work (default RUN_DEADLINE_SECONDS).")
+
+    review_parser = sub.add_parser("review", help="Approve or reject a post waiting at human_review.")
+    review_parser.add_argument("thread_id")
+    review_group = review_parser.add_mutually_exclusive_group(required=True)
+    review_group.add_argument("--approve", action="store_true")
+    review_group.add_argument("--feedback")
+
+    answer_parser = sub.add_parser("answer", help="Answer the intake question of a thread waiting at human_assistance.")
+    answer_parser.add_argument("thread_id")
+    answer_parser.add_argument("content", help="The answer, usually a URL.")
+
+    sub.add_parser("stats", help="Job counts per status.")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        asyncio.run(run_workers(args.concurrency))
+
+    elif args.command == "submit":
+        async def _submit():
+            await job_queue.acreate_queue_tables()
+            return await asubmit(args.query, args.posts, args.deadline_seconds)
+        print(f"📨 Queued job {asyncio.run(_submit())}")
+
+    elif args.command == "review":
+        values = {"approved": True, "human_feedback": None} if args.approve \
+            else {"approved": False, "human_feedback": args.feedback}
+        asyncio.run(aresume(job_id_of(args.thread_id), args.thread_id, "human_review", values=values))
+        print(f"📨 Queued review for {args.thread_id}")
+
+    elif args.command == "answer":
+        asyncio.run(aresume(job_id_of(args.thread_id), args.thread_id, "human_assistance", message=args.content))
+        print(f"📨 Queued answer for {args.thread_id}")
+
+    else:
+        print(asyncio.run(job_queue.aqueue_stats()))
+
+
+if __name__ == "__main__":
+    main()
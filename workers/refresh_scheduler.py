@@ -0,0 +1,233 @@
+"""
+Keeps tracked universities fresh ahead of time, so user-facing runs almost never wait on a scrape.
+
+The scheduler scans `tracked_urls` (URLs users asked about; check_db_node records them with
+REFRESH_TRACKING=1) for summaries approaching the freshness threshold and re-scrapes and re-summarizes
+them in the background, with bounded concurrency and a cap on refreshes started per minute.
+The summarizer runs at batch priority in the rate governor (utils/rate_limit.py), so refreshes queue behind
+interactive LLM calls.
+
+With STALE_WHILE_REVALIDATE=1, check_db_node also serves a stored summary that is stale but younger than
+SWR_MAX_STALE_DAYS right away, and hands the URL to schedule_refresh() instead of scraping it in line.
+
+Usage:
+    python -m workers.refresh_scheduler run --interval 600 --concurrency 4 --rpm 20
+    python -m workers.refresh_scheduler once
+    python -m workers.refresh_scheduler due
+    python -m workers.refresh_scheduler report
+"""
+import argparse
+import asyncio
+import contextvars
+import time
+from datetime import datetime, timedelta, timezone
+
+from db.db import acreate_tables
+from db.operations import alist_due_for_refresh, alist_scraped_domains
+from nodes.scrape_with_jina import ascrape_page, failed_page
+from nodes.summarization import SUMMARY_ERROR_PREFIX, asummarize_url
+from routes.db_route import FRESHNESS_THRESHOLD, is_fresh
+from utils import freshness, singleflight
+from utils.metrics import metrics, start_metrics_server
+from utils.resources import env, get_llm
+
+# Refresh this long before a record would turn stale.
+DEFAULT_LEAD_HOURS = 12
+# URLs nobody asked about for this long drop off the schedule.
+DEFAULT_TRACK_DAYS = 30
+# Background refreshes triggered by stale-while-revalidate that may run at once in one process.
+BACKGROUND_CONCURRENCY = 4
+
+_background = set()
+_background_slots = {}  # loop -> asyncio.Semaphore
+
+
+def tracking_enabled() -> bool:
+    return env("REFRESH_TRACKING", "0") == "1" or swr_enabled()
+
+
+def swr_enabled() -> bool:
+    return env("STALE_WHILE_REVALIDATE", "0") == "1"
+
+
+def swr_max_stale() -> timedelta:
+    """Oldest stored summary that may still be served while it is refreshed."""
+    return timedelta(days=float(env("SWR_MAX_STALE_DAYS", 7)))
+
+
+def _record(outcome: str):
+    metrics.inc("lumina_refresh_total", outcome=outcome)
+
+
+async def arefresh_url(uni_name: str, url: str) -> str:
+    """
+    Re-scrapes and re-summarizes one URL, storing the new summary. Concurrent refreshes of a URL run once.
+    A failed scrape or summarization raises and leaves the stored summary as it is.
+    """
+    async def refresh():
+        page = await ascrape_page(url)
+        if failed_page(page):
+            raise RuntimeError(f"scrape failed: {page.strip()[:200]}")
+        summary, facts = await asummarize_url(get_llm("summarizer"), uni_name, url, page,
+                                              datetime.now(timezone.utc))
+        if summary.startswith(SUMMARY_ERROR_PREFIX):
+            raise RuntimeError(summary)
+        return summary, facts
+
+    try:
+        summary, _ = await singleflight.ado(singleflight.key("refresh", url), refresh)
+    except Exception as e:
+        print(f"⚠️ Refresh of {url} failed: {e}")
+        _record("failed")
+        raise
+    _record("refreshed")
+    return summary
+
+
+async def _abackground_refresh(uni_name: str, url: str):
+    loop = asyncio.get_running_loop()
+    slots = _background_slots.setdefault(loop, asyncio.Semaphore(BACKGROUND_CONCURRENCY))
+    async with slots:
+        try:
+            await arefresh_url(uni_name, url)
+        except Exception:
+            pass  # already logged; the next request (or the scheduler) tries again
+
+
+def schedule_refresh(uni_name: str, url: str):
+    """
+    Refreshes `url` in the background on the running loop and returns immediately.
+    The task runs in a fresh context so its calls aren't attributed to (or recorded in) the requesting thread.
+    """
+    loop = asyncio.get_running_loop()
+    task = loop.create_task(_abackground_refresh(uni_name, url), context=contextvars.Context())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    _record("scheduled")
+
+
+# --- SCHEDULER ---
+async def alist_due(limit: int = 100):
+    lead = timedelta(hours=float(env("REFRESH_LEAD_HOURS", DEFAULT_LEAD_HOURS)))
+    track_for = timedelta(days=float(env("REFRESH_TRACK_DAYS", DEFAULT_TRACK_DAYS)))
+    if not freshness.enabled():
+        return await alist_due_for_refresh(env("DATABASE_URL"), FRESHNESS_THRESHOLD - lead, track_for, limit)
+
+    # Per-URL TTLs: fetch everything past the shortest possible TTL, then apply each URL's own.
+    shortest, _ = freshness.bounds()
+    candidates = await alist_due_for_refresh(env("DATABASE_URL"), shortest - min(lead, shortest / 4), track_for,
+                                             limit * 10)
+    due = []
+    for uni_name, url, time_stamp in candidates:
+        ttl = await freshness.attl_for(url)
+        if time_stamp is None or not is_fresh(time_stamp.isoformat(), ttl - min(lead, ttl / 4)):
+            due.append((uni_name, url, time_stamp))
+    return due[:limit]
+
+
+async def arun_cycle(concurrency: int, rpm: float, limit: int = 100) -> int:
+    """Refreshes every due URL (up to `limit`). Returns how many were refreshed."""
+    due = await alist_due(limit)
+    if not due:
+        return 0
+
+    slots = asyncio.Semaphore(concurrency)
+    spacing = 60.0 / rpm if rpm > 0 else 0.0
+
+    async def refresh(uni_name: str, url: str) -> bool:
+        async with slots:
+            try:
+                await arefresh_url(uni_name, url)
+                return True
+            except Exception:
+                return False
+
+    tasks = []
+    for i, (uni_name, url, _) in enumerate(due):
+        if i:
+            await asyncio.sleep(spacing)  # at most `rpm` refreshes started per minute
+        tasks.append(asyncio.create_task(refresh(uni_name, url)))
+    refreshed = sum(await asyncio.gather(*tasks))
+    print(f"🔄 Refreshed {refreshed}/{len(due)} due URL(s).")
+    return refreshed
+
+
+async def run_scheduler(interval: float, concurrency: int, rpm: float):
+    await acreate_tables(env("DATABASE_URL"))
+    if env("METRICS_PORT"):
+        start_metrics_server(int(env("METRICS_PORT")))
+    print(f"🚀 Refresh scheduler: every {interval:.0f}s, {concurrency} at a time, {rpm:g}/min.")
+    while True:
+        started = time.monotonic()
+        try:
+            await arun_cycle(concurrency, rpm)
+        except Exception as e:
+            print(f"⚠️ Refresh cycle failed: {e}")
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+# --- REPORT ---
+async def areport():
+    """Per-domain TTL, change rate and scrapes avoided per week compared with the fixed threshold."""
+    window = freshness.window()
+    domains = await alist_scraped_domains(env("DATABASE_URL"), window)
+    week = timedelta(days=7)
+    total_avoided = 0.0
+
+    print(f"{'domain':<32} {'ttl':>10} {'source':>8} {'urls':>5} {'scrapes':>8} {'changes':>8} "
+          f"{'unchanged':>10} {'avoided/wk':>11}")
+    for domain in sorted(domains):
+        stats = await freshness.adomain_stats(domain)
+        scrapes = sum(s[0] for s in stats.values())
+        changes = sum(s[1] for s in stats.values())
+        # Consecutive scrapes of a URL that found the same content.
+        unchanged = scrapes - changes - len(stats)
+
+        avoided = 0.0
+        sources = set()
+        for url in stats:
+            ttl, source = freshness.ttl_for_stats(url, domain, stats)
+            sources.add(source)
+            avoided += week / FRESHNESS_THRESHOLD - week / ttl
+        total_avoided += avoided
+
+        ttl, source = freshness.ttl_for_stats("", domain, stats)
+        print(f"{domain:<32} {str(ttl):>10} {source:>8} {len(stats):>5} {scrapes:>8} {changes:>8} "
+              f"{unchanged / max(scrapes - len(stats), 1):>10.0%} {avoided:>11.1f}")
+
+    print(f"\nEstimated scrapes avoided per week vs. the fixed {FRESHNESS_THRESHOLD}: {total_avoided:.1f}"
+          " (negative: busy pages now refreshed more often)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background refresh of tracked university URLs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Refresh due URLs every --interval seconds.")
+    once_parser = sub.add_parser("once", help="Run a single refresh cycle.")
+    for p in (run_parser, once_parser):
+        p.add_argument("--concurrency", type=int, default=4)
+        p.add_argument("--rpm", type=float, default=20, help="Refreshes started per minute.")
+    run_parser.add_argument("--interval", type=float, default=600)
+
+    sub.add_parser("due", help="List URLs due for a refresh.")
+    sub.add_parser("report", help="Adaptive freshness per domain and scrapes avoided.")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        asyncio.run(run_scheduler(args.interval, args.concurrency, args.rpm))
+
+    elif args.command == "once":
+        asyncio.run(arun_cycle(args.concurrency, args.rpm))
+
+    elif args.command == "report":
+        asyncio.run(areport())
+
+    else:
+        for uni_name, url, time_stamp in asyncio.run(alist_due()):
+            print(f"{time_stamp or 'never'}  {uni_name}  {url}")
+
+
+if __name__ == "__main__":
+    main()